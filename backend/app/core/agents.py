@@ -1,24 +1,42 @@
+import asyncio
+import hashlib
 import json
-import os
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-import httpx
-from dotenv import load_dotenv
 from firebase_admin import firestore
-from firecrawl import FirecrawlApp
-from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from app.core.config import get_settings
 from app.models.persona import PersonaQuestionAnswer
-from app.utils.db import get_firestore_client
+from app.utils.bulkhead import FIRECRAWL, BulkheadFull, bulkheads
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.db import save_persona
+from app.utils.http import PERSONA_WEBHOOK, post_webhook
+from app.utils.metrics import observe_upstream
+from app.utils.scrape_cache import blog_analysis_cache, cache_key
+from app.utils.singleflight import SingleFlight, request_key
+from app.utils.tracing import SPAN_KIND_CLIENT, span
+from app.utils.webhook_decoder import decode_persona_output
 
-load_dotenv(override=True)
+# Firecrawl client, created on first use so importing this module stays cheap
+# and does not need Firecrawl credentials
+app: Optional[Any] = None
 
-# Get Firestore client
-db = get_firestore_client()
-app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+# Upstream name of the Firecrawl extract API in metrics
+FIRECRAWL_EXTRACT = "firecrawl_extract"
+
+# Identical concurrent persona requests share one generation
+persona_flight = SingleFlight("persona")
+
+# Analyses of the same blog share one extraction, prefetched ones included
+blog_flight = SingleFlight("blog")
+
+# Outcomes of a blog prefetch
+PREFETCH_READY = "ready"
+PREFETCH_RUNNING = "running"
+PREFETCH_STARTED = "started"
 
 
 class ExtractSchema(BaseModel):
@@ -28,6 +46,40 @@ class ExtractSchema(BaseModel):
     preferred_formats: List[str]
 
 
+BLOG_ANALYSIS_PROMPT = (
+    "analyse the blogs writing style, tone of voice, values and formats"
+)
+
+# Cached analyses are only reused while the prompt and schema are unchanged
+BLOG_ANALYSIS_VERSION = hashlib.sha256(
+    (
+        BLOG_ANALYSIS_PROMPT
+        + json.dumps(ExtractSchema.model_json_schema(), sort_keys=True)
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+
+def get_firecrawl_app() -> Any:
+    """
+    Return the shared Firecrawl client, creating it on first use.
+
+    Returns:
+        FirecrawlApp: The Firecrawl client
+    """
+    global app
+
+    if app is None:
+        from firecrawl import FirecrawlApp
+
+        settings = get_settings()
+        options = {}
+        if settings.firecrawl_api_url:
+            # A self-hosted Firecrawl, or the stand-in used by load tests
+            options["api_url"] = settings.firecrawl_api_url
+        app = FirecrawlApp(api_key=settings.firecrawl_api_key, **options)
+    return app
+
+
 class LinkedInScraperInput(BaseModel):
     url: str = Field(description="The LinkedIn profile URL to scrape")
 
@@ -44,29 +96,99 @@ class WebhookPersonaRequest(BaseModel):
     )
 
 
-class BlogScrapper(BaseTool):
-    name: str = "blog_scrapper"
-    description: str = "Scrape blog data from a public profile URL"
+class BlogScrapper:
+    name = "blog_scrapper"
+    description = "Scrape blog data from a public profile URL"
 
     def _run(self, url: str) -> Dict[str, Any]:
         """Run the LinkedIn scraper tool on the given URL."""
-        response = app.extract(
-            [
-                url,
-            ],
-            prompt="analyse the blogs writing style, tone of voice, values and formats",
-            schema=ExtractSchema.model_json_schema(),
-        )
+        with span("blog_scrapper.run") as run_span:
+            cached = self._cached(url, run_span)
+            if cached is not None:
+                return cached
+            return self._extract(url)
+
+    def _cached(self, url: str, run_span: Optional[Any]) -> Optional[Dict[str, Any]]:
+        cached = blog_analysis_cache.get(url, BLOG_ANALYSIS_VERSION)
+        if run_span is not None:
+            run_span.set_attribute("cache.hit", cached is not None)
+        return cached
+
+    def _extract(self, url: str) -> Dict[str, Any]:
+        with (
+            span(FIRECRAWL_EXTRACT, kind=SPAN_KIND_CLIENT),
+            observe_upstream(FIRECRAWL_EXTRACT),
+        ):
+            response = get_firecrawl_app().extract(
+                [
+                    url,
+                ],
+                prompt=BLOG_ANALYSIS_PROMPT,
+                schema=ExtractSchema.model_json_schema(),
+            )
+        if response.data:
+            blog_analysis_cache.set(url, BLOG_ANALYSIS_VERSION, response.data)
         return response.data
 
     async def _arun(self, url: str) -> Dict[str, Any]:
-        """Async implementation of the LinkedIn scraper tool."""
-        return self._run(url)
+        """
+        Async implementation of the LinkedIn scraper tool.
+
+        Joins a running extraction of the same blog, such as one started by
+        prefetch_blog_analysis, instead of starting another.
+        """
+        key = cache_key(url, BLOG_ANALYSIS_VERSION)
+        return await blog_flight.do(key, lambda: self._scrape(url))
+
+    async def _scrape(self, url: str) -> Dict[str, Any]:
+        # Firecrawl and the SQLite cache are blocking, keep them off the loop.
+        # Only the extraction takes a Firecrawl slot, cached analyses do not
+        with span("blog_scrapper.run") as run_span:
+            cached = await asyncio.to_thread(self._cached, url, run_span)
+            if cached is not None:
+                return cached
+            async with bulkheads[FIRECRAWL].hold():
+                return await asyncio.to_thread(self._extract, url)
+
+
+async def prefetch_blog_analysis(url: str) -> str:
+    """
+    Start analysing a blog in the background unless it is cached or running.
+
+    The result is stored in the blog analysis cache; a persona request for
+    the same blog that arrives while the extraction runs waits for it.
+
+    Args:
+        url: Blog URL as entered by the user
+
+    Returns:
+        str: PREFETCH_READY, PREFETCH_RUNNING or PREFETCH_STARTED
+    """
+    key = cache_key(url, BLOG_ANALYSIS_VERSION)
+    if blog_flight.is_running(key):
+        return PREFETCH_RUNNING
+
+    cached = await asyncio.to_thread(
+        blog_analysis_cache.get, url, BLOG_ANALYSIS_VERSION
+    )
+    if cached is not None:
+        return PREFETCH_READY
+
+    async def prefetch() -> Dict[str, Any]:
+        try:
+            return await BlogScrapper()._scrape(url)
+        except Exception as e:
+            # Nobody awaits a prefetch; the persona request will try again
+            print(f"Failed to prefetch blog analysis: {str(e)}")
+            raise
+
+    blog_flight.start(key, prefetch)
+    return PREFETCH_STARTED
 
 
-class PersonaCreatorTool(BaseTool):
-    name: str = "persona_creator"
-    description: str = "Generate a professional persona in markdown"
+class PersonaCreatorTool:
+    name = "persona_creator"
+    description = "Generate a professional persona in markdown"
 
     def _run(
         self,
@@ -75,7 +197,24 @@ class PersonaCreatorTool(BaseTool):
         blog_data: Dict[str, Any] = None,
     ) -> str:
         """Create a formatted markdown persona from the profile data."""
+        return asyncio.run(self._arun(initial_data, user_id, blog_data))
+
+    async def _arun(
+        self,
+        initial_data: List[PersonaQuestionAnswer],
+        user_id: str = None,
+        blog_data: Dict[str, Any] = None,
+    ) -> str:
+        """Async implementation of the persona creator tool."""
+        with span("persona_creator.run"):
+            return await self._create_persona(initial_data, user_id, blog_data)
 
+    async def _create_persona(
+        self,
+        initial_data: List[PersonaQuestionAnswer],
+        user_id: str = None,
+        blog_data: Dict[str, Any] = None,
+    ) -> str:
         questionaries_with_question_id = [
             {
                 "question": qa.question,
@@ -89,31 +228,20 @@ class PersonaCreatorTool(BaseTool):
             "blog_data": blog_data,
         }
         # Send persona to Make.com webhook
-        webhook_url = os.getenv("MAKE_WEBHOOK_URL")
+        webhook_url = get_settings().make_webhook_url
 
-        # Since we're in a synchronous method, we need to handle the webhook differently
-        # We can use httpx in synchronous mode
         try:
-            response = httpx.post(webhook_url, json=request_data)
-
-            # Parse the response JSON (removing any surrounding backticks if present)
-            response_text = response.text
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "", 1)
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
+            response = await post_webhook(PERSONA_WEBHOOK, webhook_url, request_data)
 
-            # Strip whitespace and parse JSON
-            response_data = json.loads(response_text.strip())
+            # Find the JSON payload, whatever text or fences surround it
+            with span("persona.decode"):
+                output = decode_persona_output(response.text)
 
             # Store in Firestore
             try:
                 # Generate UUID for document ID
                 doc_id = str(uuid.uuid4())
 
-                # Create a reference in the "personas" collection with the UUID
-                persona_ref = db.collection("personas").document(doc_id)
-
                 if user_id:
                     user_id = user_id
                 else:
@@ -124,18 +252,13 @@ class PersonaCreatorTool(BaseTool):
                     "id": doc_id,  # Also store ID in the document
                     "user_id": user_id,
                     "created_at": firestore.SERVER_TIMESTAMP,
-                    "goals": response_data.get("goals", []),
-                    "target_audience": response_data.get("target_audience"),
-                    "tone_of_voice": response_data.get("tone_of_voice", []),
-                    "key_topics": response_data.get("key_topics", []),
-                    "values": response_data.get("values", []),
-                    "preferred_formats": response_data.get("preferred_formats", []),
-                    "persona_summary": response_data.get("persona_summary", ""),
+                    **output.model_dump(),
                     "raw_questionaries": questionaries_with_question_id,
                 }
 
                 # Set the data
-                persona_ref.set(persona_data)
+                with span("persona.save"):
+                    await save_persona(persona_data)
 
                 # Make a copy for the return value without SERVER_TIMESTAMP
                 response_persona_data = persona_data.copy()
@@ -144,6 +267,9 @@ class PersonaCreatorTool(BaseTool):
                 # Return success with the persona ID
                 return response_persona_data
 
+            except (CircuitOpenError, BulkheadFull):
+                # Storage is unavailable or saturated, not a failed write
+                raise
             except Exception as e:
                 print(f"Failed to store in Firestore: {str(e)}")
                 return {
@@ -151,6 +277,10 @@ class PersonaCreatorTool(BaseTool):
                     "message": str(e),
                 }
 
+        except (CircuitOpenError, BulkheadFull):
+            # Rejected without calling the webhook, the caller maps it to a
+            # 503 or 429
+            raise
         except Exception as e:
             # Log the error but continue with returning the persona
             print(f"Failed to send persona to webhook: {str(e)}")
@@ -159,20 +289,28 @@ class PersonaCreatorTool(BaseTool):
                 "message": str(e),
             }
 
-    async def _arun(
-        self,
-        initial_data: List[PersonaQuestionAnswer],
-        user_id: str = None,
-        blog_data: Dict[str, Any] = None,
-    ) -> str:
-        """Async implementation of the persona creator tool."""
-        return self._run(initial_data, user_id, blog_data)
-
 
 async def generate_persona(
     initial_data: List[PersonaQuestionAnswer], user_id: str = None
 ) -> Dict[str, Any]:
-    """Generate a professional persona by directly invoking the tools."""
+    """
+    Generate a professional persona by directly invoking the tools.
+
+    Identical requests that arrive while one is in flight share its result.
+    """
+    key = request_key(
+        "persona",
+        {"user_id": user_id, "initial_data": [qa.model_dump() for qa in initial_data]},
+    )
+    with span("generate_persona"):
+        return await persona_flight.do(
+            key, lambda: _generate_persona(initial_data, user_id)
+        )
+
+
+async def _generate_persona(
+    initial_data: List[PersonaQuestionAnswer], user_id: str = None
+) -> Dict[str, Any]:
     blog_scrapper = BlogScrapper()
     persona_tool = PersonaCreatorTool()
     blog_data = {}
@@ -193,5 +331,7 @@ async def generate_persona(
             persona_id = persona_result["id"]
 
         return {"persona": persona_result, "id": persona_id}
+    except (CircuitOpenError, BulkheadFull):
+        raise
     except Exception as e:
         raise Exception(f"Error generating persona: {str(e)}")
@@ -0,0 +1,150 @@
+"""Application settings, read from the environment once."""
+
+import os
+from functools import lru_cache
+from typing import Literal, Mapping, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+
+class Settings(BaseModel):
+    """
+    Typed configuration of the backend.
+
+    Every field is read from the environment variable of the same name in
+    upper case, e.g. max_page_size from MAX_PAGE_SIZE. Empty variables count
+    as unset.
+    """
+
+    # Server
+    api_host: str = "0.0.0.0"
+    port: int = 8000
+    api_debug: bool = False
+
+    # Credentials
+    openai_api_key: Optional[str] = None
+    firebase_credentials_path: str = "firebase-credentials.json"
+    firecrawl_api_key: Optional[str] = None
+    firecrawl_api_url: Optional[str] = None
+    testing: bool = False
+
+    # Storage of personas, posts, jobs and idempotency keys
+    storage_backend: Literal["firestore", "memory", "sqlite"] = "firestore"
+    storage_path: str = ".cache/storage.sqlite3"
+
+    # Make.com webhooks
+    make_webhook_url: Optional[str] = None
+    make_webhook_post_url: Optional[str] = None
+    make_webhook_timeout: float = 30.0
+    make_webhook_post_timeout: float = 30.0
+    webhook_breaker_failure_threshold: int = 5
+    webhook_breaker_recovery_timeout: float = 30.0
+    webhook_adaptive_timeout: bool = True
+    webhook_timeout_percentile: float = 99.0
+    webhook_timeout_multiplier: float = 2.0
+    webhook_timeout_min: float = 5.0
+
+    # Concurrent calls and waiting calls per dependency (0 concurrency: no limit)
+    bulkhead_firecrawl_concurrency: int = 4
+    bulkhead_firecrawl_queue: int = 8
+    bulkhead_persona_webhook_concurrency: int = 8
+    bulkhead_persona_webhook_queue: int = 16
+    bulkhead_post_webhook_concurrency: int = 32
+    bulkhead_post_webhook_queue: int = 64
+    bulkhead_storage_concurrency: int = 64
+    bulkhead_storage_queue: int = 256
+    bulkhead_retry_after: int = 1
+
+    # Token-bucket rate limits, e.g. "30/minute"; "0" disables a limit
+    rate_limit_enabled: bool = True
+    rate_limit_backend: Literal["memory", "sqlite"] = "memory"
+    rate_limit_path: str = ".cache/rate_limits.sqlite3"
+    rate_limit_post_per_user: str = "30/minute"
+    rate_limit_post_per_ip: str = "60/minute"
+    rate_limit_persona_per_user: str = "5/minute"
+    rate_limit_persona_per_ip: str = "10/minute"
+    rate_limit_blog_prefetch_per_ip: str = "20/minute"
+    rate_limit_trust_forwarded_for: bool = False
+
+    # Shared outbound HTTP client
+    http_client_timeout: float = 30.0
+    http_client_http2: bool = True
+    http_client_max_connections: int = 100
+    http_client_max_keepalive: int = 20
+    http_client_keepalive_expiry: float = 30.0
+
+    # Caches
+    persona_cache_size: int = 256
+    persona_cache_ttl: float = 300.0
+    blog_cache_path: str = ".cache/blog_analysis.sqlite3"
+    blog_cache_ttl: float = 7 * 24 * 60 * 60
+
+    # Endpoints
+    metrics_enabled: bool = True
+    max_page_size: int = 100
+    post_batch_concurrency: int = 4
+    # Opt-in: serialize with orjson and skip response_model re-validation of
+    # documents the API itself stored
+    fast_json_responses: bool = False
+    idempotency_ttl: float = 86400.0
+    idempotency_lease_seconds: float = 300.0
+
+    # Cache-Control of conditional GETs; stored personas and posts never change
+    persona_cache_control: str = "private, max-age=300"
+    post_cache_control: str = "private, max-age=300"
+    questions_cache_control: str = "public, max-age=300"
+
+    # Tracing
+    trace_sample_rate: float = 0.0
+    trace_export: str = "stdout"
+    # Follow the sampled flag of incoming traceparent headers
+    trace_trust_parent: bool = False
+
+    # Write-behind persistence of generated posts
+    post_write_behind: bool = True
+    post_write_batch_size: int = 100
+    post_write_flush_interval: float = 0.1
+    post_write_queue_size: int = 1000
+
+    # Keep the request sent to the post webhook, persona included, for audits
+    post_audit_raw_requests: bool = False
+
+    # Background persona jobs
+    persona_job_workers: int = 2
+    persona_job_queue_size: int = 100
+    persona_job_lease_seconds: float = 300.0
+    persona_job_sweep_interval: float = 60.0
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str]) -> "Settings":
+        """
+        Build settings from environment variables.
+
+        Args:
+            environ: The environment, usually os.environ
+
+        Returns:
+            Settings: The validated settings
+        """
+        values = {}
+        for name in cls.model_fields:
+            value = environ.get(name.upper())
+            if value:
+                values[name] = value
+        return cls.model_validate(values)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Load the .env file and the environment once and return the settings.
+
+    The file named by the ENV_FILE environment variable is loaded instead of
+    the nearest .env file when it is set.
+
+    Returns:
+        Settings: The process-wide settings
+    """
+    load_dotenv(os.environ.get("ENV_FILE") or None, override=True)
+    return Settings.from_env(os.environ)
@@ -0,0 +1,245 @@
+"""Background persona-creation jobs."""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.agents import generate_persona
+from app.core.config import get_settings
+from app.models.persona import PersonaQuestionAnswer
+from app.utils.bulkhead import BulkheadFull
+from app.utils.db import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    claim_job,
+    list_unfinished_jobs,
+    save_job,
+    update_job,
+)
+from app.utils.tracing import get_tracer
+
+
+class JobQueueFull(Exception):
+    """Raised when no more persona jobs can be accepted."""
+
+
+class PersonaJobRunner:
+    """
+    Runs persona generation in a bounded pool of background workers.
+
+    Jobs are persisted before they are queued and claimed with a lease when
+    a worker picks them up. A periodic sweep re-queues jobs that are still
+    queued, or whose lease expired because the process running them died,
+    so a restart does not lose in-flight work.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 100,
+        lease_seconds: float = 300.0,
+        sweep_interval: float = 60.0,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.lease_seconds = lease_seconds
+        self.sweep_interval = sweep_interval
+        self.worker_id = uuid.uuid4().hex
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[str] = set()
+        self._running: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Start the workers and the recovery sweep."""
+        if self.started:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_loop()))
+
+    async def stop(self) -> None:
+        """Stop the workers and hand unfinished jobs back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Release leases so the next process picks these jobs up immediately
+        for job_id in self._running:
+            try:
+                await update_job(
+                    job_id, {"status": JOB_QUEUED, "lease_expires_at": None}
+                )
+            except Exception as e:
+                print(f"Failed to release persona job {job_id}: {str(e)}")
+        self._running.clear()
+        self._pending.clear()
+        self._queue = None
+
+    async def submit(
+        self, user_email: str, initial_data: List[PersonaQuestionAnswer]
+    ) -> Dict[str, Any]:
+        """
+        Persist a new persona job and queue it.
+
+        Args:
+            user_email: Email of the user the persona is created for
+            initial_data: Question answers of the persona request
+
+        Returns:
+            Dict[str, Any]: The stored job
+
+        Raises:
+            JobQueueFull: If the queue has no room for another job
+        """
+        await self.start()
+        if self._queue.full():
+            raise JobQueueFull("Too many pending persona jobs")
+
+        now = datetime.now().isoformat()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": JOB_QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "user_email": user_email,
+            "initial_data": [qa.model_dump() for qa in initial_data],
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "worker_id": None,
+            "lease_expires_at": None,
+        }
+        await save_job(job)
+        self._enqueue(job["id"])
+        return job
+
+    def _enqueue(self, job_id: str) -> bool:
+        if job_id in self._pending or job_id in self._running:
+            return False
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._pending.add(job_id)
+        return True
+
+    async def recover(self) -> int:
+        """
+        Queue persisted jobs that no live worker is processing.
+
+        Returns:
+            int: Number of jobs queued
+        """
+        now = time.time()
+        recovered = 0
+        for job in await list_unfinished_jobs(limit=self.queue_size):
+            lease_expired = (job.get("lease_expires_at") or 0) <= now
+            if job["status"] == JOB_RUNNING and not lease_expired:
+                continue
+            if self._enqueue(job["id"]):
+                recovered += 1
+        return recovered
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await self.recover()
+            except Exception as e:
+                print(f"Failed to recover persona jobs: {str(e)}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            try:
+                # Jobs outlive the request that queued them, so each is its own trace
+                with get_tracer().trace("persona_job", **{"job.id": job_id}):
+                    await self.run_job(job_id)
+            except Exception as e:
+                print(f"Persona job {job_id} crashed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def run_job(self, job_id: str) -> None:
+        """
+        Claim a job and run persona generation for it.
+
+        Args:
+            job_id: The ID of the job to run
+        """
+        job = await claim_job(job_id, self.worker_id, self.lease_seconds)
+        if job is None:
+            return
+
+        # A cancelled job stays in _running so stop() can release its lease
+        self._running.add(job_id)
+        try:
+            initial_data = [PersonaQuestionAnswer(**qa) for qa in job["initial_data"]]
+            result = await generate_persona(initial_data, job["user_email"])
+        except BulkheadFull:
+            # Shed under load: queue it again for the next recovery sweep
+            self._running.discard(job_id)
+            await update_job(job_id, {"status": JOB_QUEUED, "lease_expires_at": None})
+            return
+        except Exception as e:
+            self._running.discard(job_id)
+            await self._finish(job_id, JOB_FAILED, error=str(e))
+            return
+        self._running.discard(job_id)
+
+        # PersonaCreatorTool reports failures in the result instead of raising
+        persona = result.get("persona")
+        if isinstance(persona, dict) and "error" in persona:
+            error = persona["error"]
+            if persona.get("message"):
+                error = f"{error}: {persona['message']}"
+            await self._finish(job_id, JOB_FAILED, error=error)
+        else:
+            await self._finish(job_id, JOB_SUCCEEDED, result=result)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of queued and running jobs in this process.
+
+        Returns:
+            Dict[str, int]: Gauges of this runner
+        """
+        return {"queued": len(self._pending), "running": len(self._running)}
+
+    async def _finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        await update_job(
+            job_id,
+            {
+                "status": status,
+                "result": result,
+                "error": error,
+                "lease_expires_at": None,
+                "updated_at": datetime.now().isoformat(),
+            },
+        )
+
+
+persona_jobs = PersonaJobRunner(
+    workers=get_settings().persona_job_workers,
+    queue_size=get_settings().persona_job_queue_size,
+    lease_seconds=get_settings().persona_job_lease_seconds,
+    sweep_interval=get_settings().persona_job_sweep_interval,
+)
@@ -1,22 +1,51 @@
-import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Union
 
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.core.config import get_settings
+from app.core.jobs import persona_jobs
 from app.routes.api import router as api_router
+from app.routes.metrics import router as metrics_router
 from app.routes.persona import router as persona_router
 from app.routes.post import router as post_router
 from app.routes.questions import router as questions_router
+from app.utils.bulkhead import BulkheadFull
+from app.utils.http import close_http_client, start_http_client
+from app.utils.idempotency import REPLAYED_HEADER
+from app.utils.metrics import MetricsMiddleware
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.rate_limit import RateLimitCostTooHigh, RateLimitExceeded
+from app.utils.responses import ETAG_HEADER, get_response_class
+from app.utils.tracing import REQUEST_ID_HEADER, TracingMiddleware, get_tracer
+from app.utils.write_behind import post_writes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown."""
+    await start_http_client()
+    await persona_jobs.start()
+    if get_settings().post_write_behind:
+        await post_writes.start()
+    yield
+    await persona_jobs.stop()
+    # Store queued posts before the process exits
+    await post_writes.stop()
+    await close_http_client()
+    await asyncio.to_thread(get_tracer().exporter.flush)
 
-# Load environment variables
-load_dotenv(override=True)
 
 # Create FastAPI app
 app = FastAPI(
     title="Persona Generator API",
     description="An AI-powered persona generator API that generates a persona.",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=get_response_class(),
 )
 
 # Configure CORS
@@ -26,8 +55,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        NEXT_CURSOR_HEADER,
+        REPLAYED_HEADER,
+        REQUEST_ID_HEADER,
+        ETAG_HEADER,
+    ],
 )
 
+# Assigns the request ID before the handlers run; traces only sampled requests
+app.add_middleware(TracingMiddleware)
+
+# Outermost, so request latencies include every other middleware
+if get_settings().metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
 # Include routers
 app.include_router(api_router)
 app.include_router(persona_router)
@@ -35,6 +78,27 @@ app.include_router(questions_router)
 app.include_router(post_router)
 
 
+@app.exception_handler(BulkheadFull)
+@app.exception_handler(RateLimitExceeded)
+async def too_many_requests(
+    request: Request, exc: Union[BulkheadFull, RateLimitExceeded]
+) -> JSONResponse:
+    """Reject requests over a rate limit or shed by a full dependency pool."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimitCostTooHigh)
+async def rate_limit_cost_too_high(
+    request: Request, exc: RateLimitCostTooHigh
+) -> JSONResponse:
+    """Reject requests that no amount of waiting would let through."""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
 @app.get("/", tags=["root"])
 async def root():
     """Root endpoint that returns info about the API."""
@@ -49,8 +113,9 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     # Check if required environment variables are set
+    settings = get_settings()
     required_vars = ["OPENAI_API_KEY"]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = [var for var in required_vars if not getattr(settings, var.lower())]
 
     if missing_vars:
         raise HTTPException(
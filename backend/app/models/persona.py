@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, field_validator
 
 
 class PersonaQuestionAnswer(BaseModel):
@@ -11,3 +13,43 @@ class Trait(BaseModel):
     name: str
     description: str
     value: int
+
+
+class PersonaWebhookOutput(BaseModel):
+    """Persona fields returned by the persona generation webhook."""
+
+    goals: List[str] = []
+    target_audience: Optional[str] = None
+    tone_of_voice: List[str] = []
+    key_topics: List[str] = []
+    values: List[str] = []
+    preferred_formats: List[str] = []
+    persona_summary: str = ""
+
+    @field_validator(
+        "goals",
+        "tone_of_voice",
+        "key_topics",
+        "values",
+        "preferred_formats",
+        mode="before",
+    )
+    @classmethod
+    def coerce_list(cls, value: Any) -> Any:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return value
+
+    @field_validator("target_audience", mode="before")
+    @classmethod
+    def join_audience(cls, value: Any) -> Any:
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value)
+        return value
+
+    @field_validator("persona_summary", mode="before")
+    @classmethod
+    def default_summary(cls, value: Any) -> Any:
+        return "" if value is None else value
@@ -0,0 +1,18 @@
+from typing import Any, List
+
+from pydantic import BaseModel, field_validator
+
+
+class PostWebhookOutput(BaseModel):
+    """Suggestions returned by the post generation webhook."""
+
+    post_suggestions: List[str] = []
+
+    @field_validator("post_suggestions", mode="before")
+    @classmethod
+    def coerce_list(cls, value: Any) -> Any:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return value
@@ -0,0 +1,183 @@
+from typing import Iterable
+
+from fastapi import APIRouter, Response
+
+from app.core.agents import blog_flight, persona_flight
+from app.core.jobs import persona_jobs
+from app.routes.post import post_flight
+from app.utils.bulkhead import bulkheads
+from app.utils.circuit_breaker import STATE_VALUES
+from app.utils.db import persona_cache
+from app.utils.http import upstream_stats
+from app.utils.metrics import CONTENT_TYPE, Family, registry
+from app.utils.scrape_cache import blog_analysis_cache
+from app.utils.write_behind import post_writes
+
+router = APIRouter(tags=["metrics"])
+
+
+def collect_component_stats() -> Iterable[Family]:
+    """Read the counters kept by caches, flight groups and queues."""
+    caches = {
+        "persona": persona_cache.stats(),
+        "blog_analysis": blog_analysis_cache.stats(),
+    }
+    yield (
+        "cache_hits_total",
+        "counter",
+        "Cache lookups that found a fresh entry.",
+        [({"cache": name}, stats["hits"]) for name, stats in caches.items()],
+    )
+    yield (
+        "cache_misses_total",
+        "counter",
+        "Cache lookups that found no fresh entry.",
+        [({"cache": name}, stats["misses"]) for name, stats in caches.items()],
+    )
+    yield (
+        "cache_hit_ratio",
+        "gauge",
+        "Share of cache lookups that were hits since the process started.",
+        [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()],
+    )
+    yield (
+        "cache_entries",
+        "gauge",
+        "Entries held by in-process caches.",
+        [({"cache": "persona"}, caches["persona"]["size"])],
+    )
+    yield (
+        "cache_evictions_total",
+        "counter",
+        "Entries evicted from in-process caches to make room.",
+        [({"cache": "persona"}, caches["persona"]["evictions"])],
+    )
+
+    flights = [
+        flight.stats() | {"group": flight.name}
+        for flight in (post_flight, persona_flight, blog_flight)
+    ]
+    yield (
+        "singleflight_executions_total",
+        "counter",
+        "Generations actually run by a flight group.",
+        [({"group": stats["group"]}, stats["executions"]) for stats in flights],
+    )
+    yield (
+        "singleflight_coalesced_total",
+        "counter",
+        "Requests that shared a generation already in flight.",
+        [({"group": stats["group"]}, stats["coalesced"]) for stats in flights],
+    )
+    yield (
+        "singleflight_in_flight",
+        "gauge",
+        "Generations currently in flight.",
+        [({"group": stats["group"]}, stats["in_flight"]) for stats in flights],
+    )
+
+    writes = post_writes.stats()
+    yield (
+        "write_behind_pending",
+        "gauge",
+        "Posts queued for writing.",
+        [({"queue": "posts"}, writes["pending"])],
+    )
+    yield (
+        "write_behind_written_total",
+        "counter",
+        "Posts written by the write-behind queue.",
+        [({"queue": "posts"}, writes["written"])],
+    )
+    yield (
+        "write_behind_failed_total",
+        "counter",
+        "Posts whose write failed after repeated attempts.",
+        [({"queue": "posts"}, writes["failed"])],
+    )
+    yield (
+        "write_behind_dead_letters",
+        "gauge",
+        "Failed posts kept in memory to be written again.",
+        [({"queue": "posts"}, writes["dead_letters"])],
+    )
+
+    jobs = persona_jobs.stats()
+    yield (
+        "persona_jobs",
+        "gauge",
+        "Persona jobs of this process, by state.",
+        [({"state": state}, count) for state, count in jobs.items()],
+    )
+
+
+def collect_upstream_stats() -> Iterable[Family]:
+    """Read the circuit breaker and timeout of each webhook."""
+    upstreams = upstream_stats()
+    yield (
+        "circuit_breaker_state",
+        "gauge",
+        "Circuit state by upstream: 0 closed, 1 half-open, 2 open.",
+        [
+            ({"upstream": name}, STATE_VALUES[stats["state"]])
+            for name, stats in upstreams.items()
+        ],
+    )
+    yield (
+        "circuit_breaker_opened_total",
+        "counter",
+        "Times the circuit of an upstream opened.",
+        [({"upstream": name}, stats["opened"]) for name, stats in upstreams.items()],
+    )
+    yield (
+        "circuit_breaker_rejected_total",
+        "counter",
+        "Calls rejected without reaching the upstream.",
+        [({"upstream": name}, stats["rejected"]) for name, stats in upstreams.items()],
+    )
+    yield (
+        "upstream_timeout_seconds",
+        "gauge",
+        "Timeout currently applied to calls to an upstream.",
+        [({"upstream": name}, stats["timeout"]) for name, stats in upstreams.items()],
+    )
+
+
+def collect_bulkhead_stats() -> Iterable[Family]:
+    """Read the slots and wait queues of each dependency pool."""
+    pools = {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
+    yield (
+        "bulkhead_active",
+        "gauge",
+        "Calls holding a slot of a dependency pool.",
+        [({"pool": name}, stats["active"]) for name, stats in pools.items()],
+    )
+    yield (
+        "bulkhead_queued",
+        "gauge",
+        "Calls waiting for a slot of a dependency pool.",
+        [({"pool": name}, stats["queued"]) for name, stats in pools.items()],
+    )
+    yield (
+        "bulkhead_queue_capacity",
+        "gauge",
+        "Calls a dependency pool lets wait before shedding.",
+        [({"pool": name}, stats["max_queue"]) for name, stats in pools.items()],
+    )
+    yield (
+        "bulkhead_rejected_total",
+        "counter",
+        "Calls shed because a dependency pool's wait queue was full.",
+        [({"pool": name}, stats["rejected"]) for name, stats in pools.items()],
+    )
+
+
+registry.add_collector(collect_component_stats)
+registry.add_collector(collect_upstream_stats)
+registry.add_collector(collect_bulkhead_stats)
+
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    """Expose process metrics in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
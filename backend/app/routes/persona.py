@@ -1,15 +1,43 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 
-from app.core.agents import generate_persona
-from app.models.persona import PersonaQuestionAnswer
-from app.utils.db import get_persona_by_id
-from app.utils.db import list_personas as db_list_personas
+from app.core.agents import generate_persona, prefetch_blog_analysis
+from app.core.config import get_settings
+from app.core.jobs import JobQueueFull, persona_jobs
+from app.models.persona import PersonaQuestionAnswer, PersonaWebhookOutput
+from app.utils.bulkhead import BulkheadFull
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.db import get_job, get_persona_by_id, list_personas_page
+from app.utils.idempotency import (
+    IdempotencyConflict,
+    IdempotencyKeyReused,
+    idempotency,
+)
+from app.utils.pagination import NEXT_CURSOR_HEADER, clamp_page_size, select_fields
+from app.utils.rate_limit import (
+    BLOG_PREFETCH_ENDPOINT,
+    PERSONA_ENDPOINT,
+    enforce_rate_limit,
+)
+from app.utils.responses import cacheable_response, trusted_response
 
 router = APIRouter(prefix="/persona", tags=["persona"])
 
+# Fields of a stored persona that list requests may select
+PERSONA_FIELDS = [
+    "id",
+    "user_id",
+    "created_at",
+    *PersonaWebhookOutput.model_fields,
+    "raw_questionaries",
+]
+
+# Persona lists leave out the questionnaire answers unless asked for them
+PERSONA_LIST_FIELDS = [name for name in PERSONA_FIELDS if name != "raw_questionaries"]
+
 
 class PersonaRequest(BaseModel):
     user_email: str
@@ -21,52 +49,232 @@ class PersonaResponse(BaseModel):
     id: Optional[str] = None
 
 
-@router.post("/create-persona", response_model=PersonaResponse)
-async def create_persona(request: PersonaRequest) -> Dict[str, Any]:
+class BlogPrefetchRequest(BaseModel):
+    blog_url: str = Field(min_length=1, max_length=2048)
+
+
+class BlogPrefetchResponse(BaseModel):
+    status: Literal["ready", "running", "started"]
+
+
+class PersonaJobResponse(BaseModel):
+    id: str
+    status: str
+    created_at: str
+    updated_at: str
+    attempts: int = 0
+    result: Optional[PersonaResponse] = None
+    error: Optional[str] = None
+
+
+@router.post(
+    "/create-persona",
+    response_model=PersonaResponse,
+    responses={202: {"description": "Persona job accepted (mode=job)"}},
+)
+async def create_persona(
+    request: PersonaRequest,
+    http_request: Request,
+    mode: Literal["sync", "job"] = "sync",
+    idempotency_key: Optional[str] = Header(None),
+) -> Dict[str, Any]:
     """
     Create a professional persona from user data including personality questions.
 
     This endpoint takes user email and initial question answers, then
     generates a formatted professional persona.
+
+    With mode=job the persona is generated in the background: the endpoint
+    returns 202 with a job ID right away, and the result is available from
+    GET /persona/jobs/{job_id}.
+
+    With an Idempotency-Key header, retries of the same request replay the
+    stored response instead of creating another persona or job.
+
+    Requests are rate limited per user_email and per client address;
+    replayed responses are not counted.
     """
+
+    async def create() -> Any:
+        await enforce_rate_limit(PERSONA_ENDPOINT, http_request, request.user_email)
+        return await run_create_persona(request, mode)
+
+    if idempotency_key is None:
+        return await create()
+
+    body = {"mode": mode, **request.model_dump(mode="json")}
+    try:
+        return await idempotency.run(
+            "persona", idempotency_key, body, create, failed=persona_failed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflict as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"Retry-After": "1"}
+        )
+
+
+def persona_failed(result: Any) -> bool:
+    """
+    Tell whether a persona result reports a failed generation.
+
+    PersonaCreatorTool reports webhook and storage failures in the result
+    instead of raising, so such results must not be replayed.
+
+    Args:
+        result: The return value of run_create_persona
+
+    Returns:
+        bool: True if the persona holds an error
+    """
+    persona = result.get("persona") if isinstance(result, dict) else None
+    return isinstance(persona, dict) and "error" in persona
+
+
+async def run_create_persona(request: PersonaRequest, mode: str) -> Any:
+    """
+    Generate a persona, or queue a persona job when mode is "job".
+
+    Args:
+        request: The persona creation request
+        mode: "sync" or "job"
+
+    Returns:
+        Any: The persona, or a 202 response describing the job
+    """
+    if mode == "job":
+        try:
+            job = await persona_jobs.submit(request.user_email, request.initial_data)
+        except JobQueueFull as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": "30"}
+            )
+
+        status_url = f"{router.prefix}/jobs/{job['id']}"
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job["id"],
+                "status": job["status"],
+                "status_url": status_url,
+            },
+            headers={"Location": status_url},
+        )
+
     try:
         result = await generate_persona(request.initial_data, request.user_email)
         return result
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    except BulkheadFull:
+        # Answered with 429 by the application's exception handler
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating persona: {str(e)}"
         )
 
 
+@router.post("/blog-prefetch", response_model=BlogPrefetchResponse, status_code=202)
+async def prefetch_blog(
+    request: BlogPrefetchRequest, http_request: Request
+) -> Dict[str, Any]:
+    """
+    Start analysing a blog before the persona is requested.
+
+    Call this as soon as the blog_url question is answered. The analysis
+    runs in the background and is stored in the blog analysis cache, so a
+    later create-persona request for the same blog uses the finished result
+    or waits for the running one instead of starting from zero.
+
+    The status is "ready" when the analysis is already cached, "running"
+    when it is in progress and "started" when this request started it.
+    """
+    await enforce_rate_limit(BLOG_PREFETCH_ENDPOINT, http_request)
+    return {"status": await prefetch_blog_analysis(request.blog_url)}
+
+
+@router.get("/jobs/{job_id}", response_model=PersonaJobResponse)
+async def get_persona_job(job_id: str) -> Dict[str, Any]:
+    """
+    Get the status, and once finished the result, of a persona job.
+
+    Args:
+        job_id: The ID returned by POST /persona/create-persona?mode=job
+
+    Returns:
+        Dict[str, Any]: The job status
+    """
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.get("/{persona_id}", response_model=Dict[str, Any])
-async def get_persona(persona_id: str) -> Dict[str, Any]:
+async def get_persona(persona_id: str, http_request: Request) -> Response:
     """
     Get a persona by ID.
 
+    The response carries an ETag; a request whose If-None-Match header
+    holds it gets 304 Not Modified without a body.
+
     Args:
         persona_id: The ID of the persona to retrieve
 
     Returns:
-        Dict[str, Any]: The persona data
+        Response: The persona data
     """
     persona = await get_persona_by_id(persona_id)
     if not persona:
         raise HTTPException(status_code=404, detail="Persona not found")
-    return persona
+    return cacheable_response(
+        http_request, persona, get_settings().persona_cache_control
+    )
 
 
 @router.get("", response_model=List[Dict[str, Any]])
 async def list_personas(
-    user_id: Optional[str] = None, limit: int = 10
+    response: Response,
+    user_id: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     List personas, optionally filtered by user_id.
 
+    The cursor of the next page, if any, is returned in the X-Next-Cursor
+    header. Pages are capped at MAX_PAGE_SIZE documents. Only the fields
+    listed in fields are fetched and returned, plus the ID; by default
+    every field except raw_questionaries.
+
     Args:
         user_id: Optional user ID to filter by
         limit: Maximum number of personas to return
+        cursor: Cursor returned with the previous page
+        fields: Comma-separated fields to return, e.g. "persona_summary"
 
     Returns:
         List[Dict[str, Any]]: List of persona documents
     """
-    return await db_list_personas(user_id, limit)
+    try:
+        selected = select_fields(fields, PERSONA_FIELDS, PERSONA_LIST_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        personas, next_cursor = await list_personas_page(
+            user_id, clamp_page_size(limit), cursor, selected
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return trusted_response(personas, response)
@@ -1,20 +1,48 @@
+import asyncio
 import json
-import os
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from firebase_admin import firestore
 from pydantic import BaseModel, Field
 
-from app.utils.db import get_firestore_client
+from app.core.config import get_settings
+from app.utils.bulkhead import BulkheadFull
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.db import get_post_by_id, list_posts_page, save_post, save_posts
+from app.utils.http import POST_WEBHOOK, post_webhook, stream_webhook
+from app.utils.idempotency import (
+    IdempotencyConflict,
+    IdempotencyKeyReused,
+    idempotency,
+)
+from app.utils.pagination import NEXT_CURSOR_HEADER, clamp_page_size, select_fields
+from app.utils.rate_limit import POST_ENDPOINT, enforce_rate_limit
+from app.utils.responses import (
+    cacheable_response,
+    compute_etag,
+    dump_json,
+    get_response_class,
+    trusted_response,
+)
+from app.utils.singleflight import SingleFlight, request_key
+from app.utils.streaming import SuggestionStreamParser
+from app.utils.tracing import span
+from app.utils.webhook_decoder import decode_post_output
+from app.utils.write_behind import post_writes
 
 router = APIRouter(prefix="/post", tags=["post"])
 
-db = get_firestore_client()
+# Upper bound on targets per batch request
+MAX_BATCH_TARGETS = 20
+
+# Identical concurrent generation requests share one webhook call
+post_flight = SingleFlight("post")
 
 
 class PlatformEnum(str, Enum):
@@ -62,6 +90,20 @@ class PostRequest(BaseModel):
     temperature: float = Field(ge=0.1, le=1.0, default=0.75)
 
 
+class PostTarget(BaseModel):
+    platform: PlatformEnum
+    content_type: ContentTypeEnum
+    tone: str
+
+
+class BatchPostRequest(BaseModel):
+    targets: List[PostTarget] = Field(min_length=1, max_length=MAX_BATCH_TARGETS)
+    persona_id: Optional[str] = None
+    core_message: Optional[str] = None
+    number_of_suggestions: int = Field(ge=1, le=5, default=2)
+    temperature: float = Field(ge=0.1, le=1.0, default=0.75)
+
+
 class PostResponse(BaseModel):
     id: str
     suggestions: List[str]
@@ -70,241 +112,685 @@ class PostResponse(BaseModel):
     content_type: str
     tone: str
     persona_id: Optional[str] = None
+    persona_version: Optional[str] = None
     user_id: str
     request_details: Optional[Dict[str, Any]] = None
 
 
-@router.post("", response_model=PostResponse)
-async def create_post(request: PostRequest) -> Dict[str, Any]:
+# Stored post fields that list responses are made of
+POST_FIELDS = list(PostResponse.model_fields)
+
+
+class BatchPostResult(BaseModel):
+    platform: str
+    content_type: str
+    tone: str
+    post: Optional[PostResponse] = None
+    error: Optional[str] = None
+
+
+class BatchPostResponse(BaseModel):
+    results: List[BatchPostResult]
+
+
+async def load_persona(persona_id: Optional[str]) -> Optional[Dict[str, Any]]:
     """
-    Generate post content based on user preferences.
+    Load the persona a post should be written for.
 
-    This endpoint takes platform, content type, tone, persona, and
-    number of suggestions to generate social media content.
+    Args:
+        persona_id: Optional persona ID from the request
+
+    Returns:
+        Optional[Dict[str, Any]]: The persona, or None when no ID was given
+
+    Raises:
+        HTTPException: If a persona ID was given but does not exist
     """
-    try:
-        # Get persona from database if persona_id is provided
-        persona = None
-        if request.persona_id:
-            from app.utils.db import get_persona_by_id
-
-            persona = await get_persona_by_id(request.persona_id)
-            if not persona:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Persona not found with ID: {request.persona_id}",
-                )
-        questionaire = []
-        if persona:
-            # Check if persona is a dictionary and access raw_questionaries as a key
-            if isinstance(persona, dict):
-                questionaire = persona.get("raw_questionaries", [])
-                print(questionaire)
-            else:
-                # Fallback to attribute access if it's an object
-                questionaire = getattr(persona, "raw_questionaries", [])
-
-        user_email = None
-        user_position = None
-        user_company = None
-        for answer in questionaire:
-            if answer["question_id"] == "user_email":
-                user_email = answer["answer"]
-            elif (
-                answer["question_id"] == "current_role"
-                or answer["question_id"] == "job_title"
-            ):
-                user_position = answer["answer"]
-            elif answer["question_id"] == "company_name":
-                user_company = answer["answer"]
-        # Prepare user info
-        user_info = {
-            "email": user_email,
-            "position": user_position,
-            "company": user_company,
-        }
+    if not persona_id:
+        return None
 
-        # Clean up user_info by removing None values
-        user_info = {k: v for k, v in user_info.items() if v is not None}
+    from app.utils.db import get_persona_by_id
 
-        # Prepare request details
-        request_details = {
-            "core_message": request.core_message,
-            "target_platform": request.platform,
-        }
+    persona = await get_persona_by_id(persona_id)
+    if not persona:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Persona not found with ID: {persona_id}",
+        )
+    return persona
 
-        # Clean up request_details by removing None values
-        request_details = {k: v for k, v in request_details.items() if v is not None}
 
-        # Prepare generation parameters
-        generation_parameters = {
-            "variations": request.number_of_suggestions,
-            "temperature": 0.4,
-        }
+async def check_post_rate_limit(
+    http_request: Request, persona: Optional[Dict[str, Any]], cost: int = 1
+) -> None:
+    """
+    Apply the post limits to a request, per persona owner and per client.
 
-        # Prepare context with current date and time
-        context = {
-            "current_date_time": datetime.now().isoformat(),
-            "location": None,  # Optional: You can add location logic if needed
-        }
+    Args:
+        http_request: The incoming request
+        persona: The persona of the request, if any
+        cost: Number of posts the request generates
 
-        # Build the final request object for the webhook
-        webhook_data = {
-            "request": {
-                "request_details": request_details,
-                "user_info": user_info,
-                "generation_parameters": generation_parameters,
-                "context": context,
-            }
-        }
+    Raises:
+        RateLimitExceeded: If the user or the client is over its limit
+    """
+    # Posts carry no user; they are counted for the owner of their persona
+    user = persona.get("user_id") if persona else None
+    await enforce_rate_limit(POST_ENDPOINT, http_request, user, cost)
+
+
+def build_persona_context(persona: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the persona-derived part of the webhook payload.
+
+    The result only depends on the persona, so it can be computed once and
+    reused for several generation requests.
+
+    Args:
+        persona: The persona to write as, if any
 
-        # Add persona to the request if available
-        if persona:
-            # Convert persona to a serializable format
-            if isinstance(persona, dict):
-                # Handle any datetime objects in the persona dictionary
-                serializable_persona = {}
-                for key, value in persona.items():
+    Returns:
+        Dict[str, Any]: "user_info" and, if a persona was given, "persona"
+    """
+    questionaire = []
+    if persona:
+        # Check if persona is a dictionary and access raw_questionaries as a key
+        if isinstance(persona, dict):
+            questionaire = persona.get("raw_questionaries", [])
+        else:
+            # Fallback to attribute access if it's an object
+            questionaire = getattr(persona, "raw_questionaries", [])
+
+    user_email = None
+    user_position = None
+    user_company = None
+    for answer in questionaire:
+        if answer["question_id"] == "user_email":
+            user_email = answer["answer"]
+        elif (
+            answer["question_id"] == "current_role"
+            or answer["question_id"] == "job_title"
+        ):
+            user_position = answer["answer"]
+        elif answer["question_id"] == "company_name":
+            user_company = answer["answer"]
+    # Prepare user info
+    user_info = {
+        "email": user_email,
+        "position": user_position,
+        "company": user_company,
+    }
+
+    # Clean up user_info by removing None values
+    user_info = {k: v for k, v in user_info.items() if v is not None}
+
+    persona_context = {"user_info": user_info}
+
+    # Add persona to the request if available
+    if persona:
+        # Convert persona to a serializable format
+        if isinstance(persona, dict):
+            # Handle any datetime objects in the persona dictionary
+            serializable_persona = {}
+            for key, value in persona.items():
+                if isinstance(value, datetime):
+                    serializable_persona[key] = value.isoformat()
+                else:
+                    serializable_persona[key] = value
+            persona_context["persona"] = serializable_persona
+        else:
+            # If it's an object with attributes, convert to dictionary
+            serializable_persona = {}
+            for key in dir(persona):
+                if not key.startswith("_"):  # Skip private attributes
+                    value = getattr(persona, key)
                     if isinstance(value, datetime):
                         serializable_persona[key] = value.isoformat()
                     else:
                         serializable_persona[key] = value
-                webhook_data["request"]["persona"] = serializable_persona
-            else:
-                # If it's an object with attributes, convert to dictionary
-                serializable_persona = {}
-                for key in dir(persona):
-                    if not key.startswith("_"):  # Skip private attributes
-                        value = getattr(persona, key)
-                        if isinstance(value, datetime):
-                            serializable_persona[key] = value.isoformat()
-                        else:
-                            serializable_persona[key] = value
-                webhook_data["request"]["persona"] = serializable_persona
+            persona_context["persona"] = serializable_persona
 
-        # Send to Make.com webhook
-        webhook_url = os.getenv("MAKE_WEBHOOK_POST_URL")
-        if not webhook_url:
-            raise HTTPException(
-                status_code=500, detail="Missing webhook URL configuration"
-            )
+    return persona_context
 
-        try:
-            response = httpx.post(webhook_url, json=webhook_data, timeout=30.0)
-            response.raise_for_status()
 
-            # Parse the response JSON (removing any surrounding backticks if present)
-            response_text = response.text
-            if response_text.startswith("```json"):
-                response_text = response_text.replace("```json", "", 1)
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
+def build_webhook_payload(
+    request: PostRequest,
+    persona: Optional[Dict[str, Any]],
+    persona_context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Build the request body sent to the post generation webhook.
+
+    Args:
+        request: The post generation request
+        persona: The persona to write as, if any
+        persona_context: Precomputed result of build_persona_context
+
+    Returns:
+        Dict[str, Any]: The webhook payload
+    """
+    if persona_context is None:
+        persona_context = build_persona_context(persona)
+
+    # Prepare request details
+    request_details = {
+        "core_message": request.core_message,
+        "target_platform": request.platform,
+    }
+
+    # Clean up request_details by removing None values
+    request_details = {k: v for k, v in request_details.items() if v is not None}
+
+    # Prepare generation parameters
+    generation_parameters = {
+        "variations": request.number_of_suggestions,
+        "temperature": 0.4,
+    }
+
+    # Prepare context with current date and time
+    context = {
+        "current_date_time": datetime.now().isoformat(),
+        "location": None,  # Optional: You can add location logic if needed
+    }
+
+    # Build the final request object for the webhook
+    webhook_data = {
+        "request": {
+            "request_details": request_details,
+            "user_info": persona_context["user_info"],
+            "generation_parameters": generation_parameters,
+            "context": context,
+        }
+    }
+
+    if "persona" in persona_context:
+        webhook_data["request"]["persona"] = persona_context["persona"]
+
+    return webhook_data
+
+
+def get_post_webhook_url() -> str:
+    """
+    Return the post generation webhook URL.
+
+    Raises:
+        HTTPException: If the webhook URL is not configured
+    """
+    webhook_url = get_settings().make_webhook_post_url
+    if not webhook_url:
+        raise HTTPException(status_code=500, detail="Missing webhook URL configuration")
+    return webhook_url
+
+
+async def request_suggestions(
+    webhook_url: str, webhook_data: Dict[str, Any], content_type: Optional[str] = None
+) -> List[str]:
+    """
+    Call the post generation webhook and return its suggestions.
+
+    Args:
+        webhook_url: The post generation webhook URL
+        webhook_data: The webhook payload
+        content_type: Content type of the post, which has its own timeout
+
+    Returns:
+        List[str]: The generated suggestions
+
+    Raises:
+        httpx.HTTPError: If the webhook call fails
+    """
+    response = await post_webhook(
+        POST_WEBHOOK, webhook_url, webhook_data, variant=content_type
+    )
+    response.raise_for_status()
+
+    return decode_post_output(response.text).post_suggestions
 
-            # Strip whitespace and parse JSON
-            response_data = json.loads(response_text.strip())
 
-            # Extract suggestions from the response
-            suggestions = response_data.get("post_suggestions", [])
+def persona_version(persona: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Return the version of a persona, a hash of its content.
+
+    This is the ETag of GET /persona/{id} without its quotes, so a post can
+    be matched with the exact persona it was written with.
+
+    Args:
+        persona: The persona, if any
+
+    Returns:
+        Optional[str]: The version, None without a persona
+    """
+    if not persona:
+        return None
+    return compute_etag(dump_json(persona)).strip('"')
+
+
+def build_post_document(
+    request: PostRequest,
+    webhook_data: Dict[str, Any],
+    suggestions: List[str],
+    persona: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Build the Firestore document of a generated post.
+
+    The persona is referenced by ID and version rather than copied. The
+    webhook payload, which embeds the persona, is only kept as raw_request
+    with POST_AUDIT_RAW_REQUESTS; storage then moves it out of the post.
+
+    Args:
+        request: The post generation request
+        webhook_data: The payload that was sent to the webhook
+        suggestions: The generated suggestions
+        persona: The persona the post was written as, if any
 
-            # Generate UUID for document ID
-            doc_id = str(uuid.uuid4())
+    Returns:
+        Dict[str, Any]: The post document with a server timestamp
+    """
+    # Generate UUID for document ID
+    doc_id = str(uuid.uuid4())
+
+    user_email = webhook_data["request"]["user_info"].get("email")
+    user_id = user_email or "anonymous"
+
+    post_data = {
+        "id": doc_id,
+        "user_id": user_id,
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "platform": request.platform,
+        "content_type": request.content_type,
+        "tone": request.tone,
+        "persona_id": request.persona_id,
+        "persona_version": persona_version(persona),
+        "suggestions": suggestions,
+        "request_details": webhook_data["request"]["request_details"],
+    }
+    if get_settings().post_audit_raw_requests:
+        post_data["raw_request"] = webhook_data
+    return post_data
 
-            # Store in Firestore
-            post_ref = db.collection("posts").document(doc_id)
 
-            user_id = user_email or "anonymous"
+def to_response(post_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy a post document for the response, with the timestamp as a string.
 
-            post_data = {
-                "id": doc_id,
-                "user_id": user_id,
-                "created_at": firestore.SERVER_TIMESTAMP,
-                "platform": request.platform,
-                "content_type": request.content_type,
-                "tone": request.tone,
-                "persona_id": request.persona_id,
-                "suggestions": suggestions,
-                "raw_request": webhook_data,
-                "request_details": request_details,
-            }
+    The audited raw_request, if any, is left out. A post still in the
+    write-behind queue keeps the time it was queued, so repeated reads
+    return the same body and ETag.
+
+    Args:
+        post_data: The stored post document
+
+    Returns:
+        Dict[str, Any]: JSON serializable post data
+    """
+    response_data = post_data.copy()
+    response_data.pop("raw_request", None)
+    created_at = post_writes.queued_at(post_data["id"]) or datetime.now()
+    response_data["created_at"] = created_at.isoformat()
+    return response_data
+
+
+async def store_post(post_data: Dict[str, Any]) -> None:
+    """
+    Queue a post for write-behind storage, or store it right away.
+
+    Args:
+        post_data: The post document
+    """
+    if not post_writes.enqueue(post_data):
+        await save_post(post_data)
+
+
+async def store_posts(posts: List[Dict[str, Any]]) -> None:
+    """
+    Queue posts for write-behind storage, storing those that do not fit.
+
+    Args:
+        posts: The post documents
+    """
+    await save_posts([post for post in posts if not post_writes.enqueue(post)])
+
+
+async def generate_post(
+    request: PostRequest, persona: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Generate and store a post, raising HTTPException on failure.
+
+    Args:
+        request: The post generation request
+        persona: The already loaded persona, if any
+
+    Returns:
+        Dict[str, Any]: The stored post
+    """
+    try:
+        with span("post.payload_build"):
+            webhook_data = build_webhook_payload(request, persona)
+
+        # Send to Make.com webhook
+        webhook_url = get_post_webhook_url()
+
+        try:
+            with span("post.webhook"):
+                suggestions = await request_suggestions(
+                    webhook_url, webhook_data, request.content_type
+                )
+
+            post_data = build_post_document(request, webhook_data, suggestions, persona)
 
             # Save to Firestore
-            post_ref.set(post_data)
+            with span("post.persist", post_id=post_data["id"]):
+                await store_post(post_data)
 
             # Create response data (with timestamp as string for JSON serialization)
-            response_data = post_data.copy()
-            response_data["created_at"] = datetime.now().isoformat()
-
-            return response_data
+            return to_response(post_data)
 
         except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=500, detail=f"Error communicating with webhook: {str(e)}"
             )
 
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    except BulkheadFull:
+        # Answered with 429 by the application's exception handler
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating post content: {str(e)}"
         )
 
 
+@router.post("", response_model=PostResponse)
+async def create_post(
+    request: PostRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+    """
+    Generate post content based on user preferences.
+
+    This endpoint takes platform, content type, tone, persona, and
+    number of suggestions to generate social media content. Identical
+    requests that arrive while one is in flight share its result.
+
+    With an Idempotency-Key header, retries of the same request replay the
+    stored response instead of generating and storing another post.
+
+    Requests are rate limited per persona owner and per client address;
+    replayed responses are not counted.
+    """
+    # Get persona from database if persona_id is provided
+    with span("post.persona_fetch", persona_id=request.persona_id):
+        persona = await load_persona(request.persona_id)
+    body = request.model_dump(mode="json")
+
+    async def generate() -> Dict[str, Any]:
+        await check_post_rate_limit(http_request, persona)
+        with span("create_post"):
+            return await post_flight.do(
+                request_key("post", body), lambda: generate_post(request, persona)
+            )
+
+    if idempotency_key is None:
+        return await generate()
+
+    try:
+        return await idempotency.run("post", idempotency_key, body, generate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflict as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"Retry-After": "1"}
+        )
+
+
+@router.post("/batch", response_model=BatchPostResponse)
+async def create_posts_batch(
+    request: BatchPostRequest, http_request: Request
+) -> Dict[str, Any]:
+    """
+    Generate posts for several platform/content type/tone targets at once.
+
+    The persona is loaded once, the webhook calls run concurrently with at
+    most POST_BATCH_CONCURRENCY in flight, and all generated posts are stored
+    together in batched writes. Each target reports either its post or the
+    error that prevented it; results are in the same order as the targets.
+    Each target counts as one request against the rate limits.
+    """
+    persona = await load_persona(request.persona_id)
+    await check_post_rate_limit(http_request, persona, cost=len(request.targets))
+    webhook_url = get_post_webhook_url()
+    persona_context = build_persona_context(persona)
+    semaphore = asyncio.Semaphore(get_settings().post_batch_concurrency)
+
+    async def generate(target: PostTarget) -> Dict[str, Any]:
+        post_request = PostRequest(
+            platform=target.platform,
+            content_type=target.content_type,
+            tone=target.tone,
+            persona_id=request.persona_id,
+            core_message=request.core_message,
+            number_of_suggestions=request.number_of_suggestions,
+            temperature=request.temperature,
+        )
+        webhook_data = build_webhook_payload(post_request, persona, persona_context)
+        async with semaphore:
+            suggestions = await request_suggestions(
+                webhook_url, webhook_data, post_request.content_type
+            )
+        return build_post_document(post_request, webhook_data, suggestions, persona)
+
+    outcomes = await asyncio.gather(
+        *(generate(target) for target in request.targets), return_exceptions=True
+    )
+    posts = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+
+    try:
+        await store_posts(posts)
+    except BulkheadFull:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error storing posts: {str(e)}")
+
+    results = []
+    for target, outcome in zip(request.targets, outcomes):
+        result = {
+            "platform": target.platform,
+            "content_type": target.content_type,
+            "tone": target.tone,
+        }
+        if isinstance(outcome, (httpx.HTTPError, CircuitOpenError, BulkheadFull)):
+            result["error"] = f"Error communicating with webhook: {str(outcome)}"
+        elif isinstance(outcome, BaseException):
+            result["error"] = f"Error generating post content: {str(outcome)}"
+        else:
+            result["post"] = to_response(outcome)
+        results.append(result)
+
+    return {"results": results}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event: Event name
+        data: JSON serializable event payload
+
+    Returns:
+        str: The encoded event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_post_events(
+    request: PostRequest,
+    persona: Optional[Dict[str, Any]],
+    webhook_url: str,
+) -> AsyncIterator[str]:
+    """
+    Generate a post and yield its progress as Server-Sent Events.
+
+    Suggestions are emitted as soon as they are complete in the webhook
+    response body, before the rest of the body has arrived.
+
+    Args:
+        request: The post generation request
+        persona: The already loaded persona, if any
+        webhook_url: The post generation webhook URL
+
+    Yields:
+        str: Encoded events
+    """
+    yield format_sse("persona_loaded", {"persona_id": request.persona_id})
+
+    try:
+        webhook_data = build_webhook_payload(request, persona)
+        yield format_sse("generation_started", {"platform": request.platform})
+
+        parser = SuggestionStreamParser()
+        suggestions: List[str] = []
+        body: List[str] = []
+        async with stream_webhook(
+            POST_WEBHOOK, webhook_url, webhook_data, variant=request.content_type
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                body.append(chunk)
+                for suggestion in parser.feed(chunk):
+                    yield format_sse(
+                        "suggestion", {"index": len(suggestions), "text": suggestion}
+                    )
+                    suggestions.append(suggestion)
+
+        # Fall back to the complete body if the incremental parser found nothing
+        if not suggestions:
+            output = decode_post_output("".join(body))
+            for suggestion in output.post_suggestions:
+                yield format_sse(
+                    "suggestion", {"index": len(suggestions), "text": suggestion}
+                )
+                suggestions.append(suggestion)
+
+        post_data = build_post_document(request, webhook_data, suggestions, persona)
+        await store_post(post_data)
+        yield format_sse("done", to_response(post_data))
+
+    except httpx.HTTPError as e:
+        yield format_sse(
+            "error", {"detail": f"Error communicating with webhook: {str(e)}"}
+        )
+    except (CircuitOpenError, BulkheadFull) as e:
+        yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        yield format_sse(
+            "error", {"detail": f"Error generating post content: {str(e)}"}
+        )
+
+
+@router.post("/stream")
+async def create_post_stream(
+    request: PostRequest, http_request: Request
+) -> StreamingResponse:
+    """
+    Generate post content and stream progress as Server-Sent Events.
+
+    Emits "persona_loaded" and "generation_started" progress events, one
+    "suggestion" event per suggestion as soon as it is available, and a
+    final "done" event carrying the stored post. Failures after the stream
+    has started are reported as an "error" event.
+    """
+    persona = await load_persona(request.persona_id)
+    await check_post_rate_limit(http_request, persona)
+    webhook_url = get_post_webhook_url()
+
+    return StreamingResponse(
+        stream_post_events(request, persona, webhook_url),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: str) -> Dict[str, Any]:
+async def get_post(post_id: str, http_request: Request) -> Response:
     """
     Get a post by ID.
 
+    The response carries an ETag; a request whose If-None-Match header
+    holds it gets 304 Not Modified without a body.
+
     Args:
         post_id: The ID of the post to retrieve
 
     Returns:
-        Dict[str, Any]: The post data
+        Response: The post data
     """
-    post_ref = db.collection("posts").document(post_id)
-    post = post_ref.get()
+    cache_control = get_settings().post_cache_control
 
-    if not post.exists:
-        raise HTTPException(status_code=404, detail="Post not found")
+    # Posts still waiting in the write-behind queue are not in Firestore yet
+    pending = post_writes.get(post_id)
+    if pending is not None:
+        return cacheable_response(
+            http_request, to_response(pending), cache_control, model=PostResponse
+        )
 
-    post_data = post.to_dict()
+    post_data = await get_post_by_id(post_id)
 
-    # Convert Firestore timestamp to string
-    if "created_at" in post_data and post_data["created_at"]:
-        post_data["created_at"] = post_data["created_at"].isoformat()
+    if not post_data:
+        raise HTTPException(status_code=404, detail="Post not found")
 
-    return post_data
+    return cacheable_response(
+        http_request, post_data, cache_control, model=PostResponse
+    )
 
 
 @router.get("", response_model=List[PostResponse])
 async def list_posts(
-    user_id: Optional[str] = None, limit: int = 10
+    response: Response,
+    user_id: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     List posts, optionally filtered by user_id.
 
+    The cursor of the next page, if any, is returned in the X-Next-Cursor
+    header. Pages are capped at MAX_PAGE_SIZE documents. With fields, only
+    the listed fields and the ID are fetched and returned.
+
     Args:
         user_id: Optional user ID to filter by
         limit: Maximum number of posts to return
+        cursor: Cursor returned with the previous page
+        fields: Comma-separated fields to return, e.g. "platform,created_at"
 
     Returns:
         List[Dict[str, Any]]: List of post documents
     """
-    query = db.collection("posts")
-
-    if user_id:
-        query = query.where("user_id", "==", user_id)
-
-    query = query.order_by("created_at", direction=firestore.Query.DESCENDING).limit(
-        limit
-    )
-    posts = query.stream()
-
-    result = []
-    for post in posts:
-        post_data = post.to_dict()
-
-        # Convert Firestore timestamp to string
-        if "created_at" in post_data and post_data["created_at"]:
-            post_data["created_at"] = post_data["created_at"].isoformat()
-
-        result.append(post_data)
+    try:
+        selected = select_fields(fields, POST_FIELDS, POST_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return result
+    try:
+        posts, next_cursor = await list_posts_page(
+            user_id, clamp_page_size(limit), cursor, selected
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if fields is not None:
+        # Partial posts do not validate against PostResponse
+        return get_response_class()(posts, headers=dict(response.headers))
+    return trusted_response(posts, response, model=PostResponse)
@@ -1,9 +1,11 @@
-from typing import Any, Dict, List
+from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from pydantic import BaseModel
 
+from app.core.config import get_settings
 from app.core.constants import PERSONA_CREATION_QUESTIONS
+from app.utils.responses import compute_etag, conditional_response, dump_json
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
@@ -21,12 +23,27 @@ class QuestionsResponse(BaseModel):
     questions: List[Question]
 
 
+# The questions never change, so they are validated and serialized once
+QUESTIONS_BODY = dump_json(
+    QuestionsResponse.model_validate(
+        {"questions": PERSONA_CREATION_QUESTIONS}
+    ).model_dump(mode="json")
+)
+QUESTIONS_ETAG = compute_etag(QUESTIONS_BODY)
+
+
 @router.get("", response_model=QuestionsResponse)
-async def get_questions() -> Dict[str, List[Dict[str, Any]]]:
+async def get_questions(request: Request) -> Response:
     """
     Get a list of personality assessment questions related to social media behavior.
 
     Returns a structured list of questions used to assess various personality traits
-    based on social media usage patterns.
+    based on social media usage patterns. The catalog only changes on deploy, so
+    clients revalidate it with If-None-Match and usually get 304 Not Modified.
     """
-    return {"questions": PERSONA_CREATION_QUESTIONS}
+    return conditional_response(
+        request,
+        QUESTIONS_BODY,
+        get_settings().questions_cache_control,
+        etag=QUESTIONS_ETAG,
+    )
@@ -0,0 +1,142 @@
+"""Concurrency limits with bounded wait queues per dependency."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from app.core.config import get_settings
+
+# Pool names, also used as metric labels
+FIRECRAWL = "firecrawl"
+PERSONA_WEBHOOK_POOL = "persona_webhook"
+POST_WEBHOOK_POOL = "post_webhook"
+STORAGE = "storage"
+
+# Settings prefix of each pool: <prefix>_concurrency and <prefix>_queue
+POOL_SETTINGS = {
+    FIRECRAWL: "bulkhead_firecrawl",
+    PERSONA_WEBHOOK_POOL: "bulkhead_persona_webhook",
+    POST_WEBHOOK_POOL: "bulkhead_post_webhook",
+    STORAGE: "bulkhead_storage",
+}
+
+
+class BulkheadFull(Exception):
+    """Raised when a pool has no free slot and its wait queue is full."""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Too many concurrent {name} requests, retry later")
+
+
+class Bulkhead:
+    """
+    Limits the concurrent calls to one dependency.
+
+    Up to max_concurrent calls run at once and up to max_queue more wait
+    for a slot in arrival order. Calls beyond that are rejected at once with
+    BulkheadFull, so a slow dependency cannot tie up every worker. A
+    max_concurrent of 0 disables the limit.
+    """
+
+    def __init__(
+        self, name: str, max_concurrent: int, max_queue: int, retry_after: int = 1
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.rejected = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Take a slot, waiting in the queue if all slots are in use.
+
+        Raises:
+            BulkheadFull: If the wait queue is full
+        """
+        if self.max_concurrent <= 0 or (
+            self.active < self.max_concurrent and not self._waiters
+        ):
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFull(self.name, self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # Cancelled after the slot was handed over, pass it on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        # Hand the slot to the next waiter instead of freeing it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the usage of the pool.
+
+        Returns:
+            Dict[str, int]: Slots in use, waiting calls, limits and rejections
+        """
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+def create_bulkhead(name: str) -> Bulkhead:
+    """
+    Create the pool of a dependency from its settings.
+
+    Args:
+        name: Pool name, a key of POOL_SETTINGS
+
+    Returns:
+        Bulkhead: The configured pool
+    """
+    settings = get_settings()
+    prefix = POOL_SETTINGS[name]
+    return Bulkhead(
+        name,
+        max_concurrent=getattr(settings, f"{prefix}_concurrency"),
+        max_queue=getattr(settings, f"{prefix}_queue"),
+        retry_after=settings.bulkhead_retry_after,
+    )
+
+
+bulkheads: Dict[str, Bulkhead] = {name: create_bulkhead(name) for name in POOL_SETTINGS}
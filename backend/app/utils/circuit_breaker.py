@@ -0,0 +1,158 @@
+"""Circuit breakers and latency-based timeouts for external services."""
+
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric state exported as a gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        # Whole seconds, as sent in the Retry-After header
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"{upstream} is unavailable, retry in {self.retry_after} seconds"
+        )
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after repeated failures.
+
+    The circuit opens after failure_threshold consecutive failures and
+    rejects calls for recovery_timeout seconds. It then lets one trial call
+    through (half-open): a success closes the circuit, a failure opens it
+    again for another recovery_timeout. A trial that never reports back,
+    e.g. because it was cancelled, is replaced after recovery_timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._clock = clock
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+
+    def before_call(self) -> None:
+        """
+        Check that a call may go ahead.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with its
+                trial call still running
+        """
+        now = self._clock()
+        if self.state == OPEN:
+            remaining = self._opened_at + self.recovery_timeout - now
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = HALF_OPEN
+            self._trial_started_at = None
+
+        if self.state == HALF_OPEN:
+            started = self._trial_started_at
+            if started is not None and now - started < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, started + self.recovery_timeout - now)
+            self._trial_started_at = now
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self._opened_at = self._clock()
+            self._trial_started_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the state and counters of the breaker.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures, rejected calls and
+                the number of times the circuit opened
+        """
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+class AdaptiveTimeout:
+    """
+    Derives a call timeout from the recently observed latencies.
+
+    The timeout is a percentile of the last window latencies times a
+    multiplier, kept between minimum and the configured maximum. Until
+    min_samples calls have been observed the maximum is used.
+    """
+
+    def __init__(
+        self,
+        minimum: float = 1.0,
+        percentile: float = 99.0,
+        multiplier: float = 2.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.minimum = minimum
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._latencies: deque = deque(maxlen=window)
+
+    def observe(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def latency_percentile(self) -> Optional[float]:
+        """Return the configured percentile of the window, if it is full enough."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = math.ceil(self.percentile / 100 * len(ordered)) - 1
+        return ordered[min(max(index, 0), len(ordered) - 1)]
+
+    def current(self, maximum: float) -> float:
+        """
+        Return the timeout to use for the next call.
+
+        Args:
+            maximum: Longest allowed timeout in seconds
+
+        Returns:
+            float: Timeout in seconds
+        """
+        latency = self.latency_percentile()
+        if latency is None:
+            return maximum
+        return min(maximum, max(self.minimum, latency * self.multiplier))
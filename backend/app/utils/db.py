@@ -1,50 +1,106 @@
 """Firebase Firestore database utilities."""
 
-import os
+import time
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 from google.cloud.firestore_v1.transforms import Sentinel
 
-# Singleton pattern for Firestore client
+from app.core.config import get_settings
+from app.utils.bulkhead import STORAGE, bulkheads
+from app.utils.cache import TTLCache
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.repository import (  # noqa: F401 - constants are re-exported
+    AUDIT_SUBCOLLECTION,
+    IDEMPOTENCY_COLLECTION,
+    IDEMPOTENCY_COMPLETED,
+    IDEMPOTENCY_IN_PROGRESS,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JOBS_COLLECTION,
+    PERSONAS_COLLECTION,
+    POSTS_COLLECTION,
+    RAW_REQUEST_DOCUMENT,
+    InstrumentedRepository,
+    MemoryRepository,
+    Repository,
+    SQLiteRepository,
+    idempotency_record,
+    job_claim_updates,
+    select,
+    split_raw_request,
+)
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_WRITES = 500
+
+# Singleton pattern for Firestore clients
 _db: Optional[firestore.Client] = None
+_async_db: Optional[firestore_async.AsyncClient] = None
+_repository: Optional[Repository] = None
+
+# Personas rarely change once written, so reads go through a small cache
+persona_cache = TTLCache(
+    maxsize=get_settings().persona_cache_size,
+    ttl=get_settings().persona_cache_ttl,
+)
+
+
+def _initialize_firebase_app() -> None:
+    """Initialize the default Firebase app if it is not initialized yet."""
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        settings = get_settings()
+
+        # In test mode, create a mock instead of requiring the file
+        if settings.testing:
+            firebase_admin.initialize_app()
+        else:
+            # Initialize Firebase app with credentials
+            cred = credentials.Certificate(settings.firebase_credentials_path)
+            firebase_admin.initialize_app(cred)
 
 
 def get_firestore_client() -> firestore.Client:
     """
     Initialize Firebase app if not already initialized and return Firestore client.
 
+    The blocking client is only meant for scripts and synchronous helpers;
+    request handlers should use get_async_firestore_client instead.
+
     Returns:
         firestore.Client: Initialized Firestore client
     """
     global _db
 
     if _db is None:
-        # Check if Firebase app is already initialized
-        try:
-            firebase_admin.get_app()
-        except ValueError:
-            # Get service account key path from environment or use default
-            cred_path = os.environ.get(
-                "FIREBASE_CREDENTIALS_PATH", "firebase-credentials.json"
-            )
-            
-            # In test mode, create a mock instead of requiring the file
-            if os.environ.get("TESTING") == "1":
-                firebase_admin.initialize_app()
-            else:
-                # Initialize Firebase app with credentials
-                cred = credentials.Certificate(cred_path)
-                firebase_admin.initialize_app(cred)
-
-        # Create Firestore client
+        _initialize_firebase_app()
         _db = firestore.client()
 
     return _db
 
 
+def get_async_firestore_client() -> firestore_async.AsyncClient:
+    """
+    Initialize Firebase app if not already initialized and return the async client.
+
+    Returns:
+        firestore_async.AsyncClient: Initialized async Firestore client
+    """
+    global _async_db
+
+    if _async_db is None:
+        _initialize_firebase_app()
+        _async_db = firestore_async.client()
+
+    return _async_db
+
+
 def convert_to_serializable(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Convert Firestore data to a serializable format.
@@ -80,9 +136,11 @@ def convert_to_serializable(data: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
-async def get_persona_by_id(persona_id: str) -> Optional[Dict[str, Any]]:
+def get_persona_by_id_sync(persona_id: str) -> Optional[Dict[str, Any]]:
     """
-    Retrieve a persona by its ID.
+    Synchronous version to retrieve a persona by its ID.
+
+    Always reads from Firestore, whatever STORAGE_BACKEND is configured.
 
     Args:
         persona_id: The ID of the persona to retrieve
@@ -91,7 +149,7 @@ async def get_persona_by_id(persona_id: str) -> Optional[Dict[str, Any]]:
         Optional[Dict[str, Any]]: The persona data if found, None otherwise
     """
     db = get_firestore_client()
-    doc_ref = db.collection("personas").document(persona_id)
+    doc_ref = db.collection(PERSONAS_COLLECTION).document(persona_id)
     doc = doc_ref.get()
 
     if doc.exists:
@@ -99,9 +157,317 @@ async def get_persona_by_id(persona_id: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def get_persona_by_id_sync(persona_id: str) -> Optional[Dict[str, Any]]:
+def build_list_query(
+    collection: Any,
+    user_id: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Any:
     """
-    Synchronous version to retrieve a persona by its ID.
+    Build a newest-first query over a collection, optionally filtered by user.
+
+    Args:
+        collection: Firestore collection reference
+        user_id: Optional user ID to filter by
+        limit: Maximum number of documents to return
+        cursor: Optional cursor of the previous page
+        fields: Optional fields to fetch; Firestore sends only these
+
+    Returns:
+        Any: The Firestore query
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = collection
+
+    if user_id:
+        query = query.where("user_id", "==", user_id)
+
+    # Newest first; documents written in one commit share their created_at,
+    # so ties are broken by document ID
+    query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
+    query = query.order_by("__name__", direction=firestore.Query.DESCENDING)
+
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        position = {"created_at": created_at}
+        if doc_id is not None:
+            position["__name__"] = doc_id
+        query = query.start_after(position)
+
+    if fields is not None:
+        query = query.select(fields)
+
+    return query.limit(limit)
+
+
+def with_cursor_field(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Add id and created_at, which the next page cursor is built from, to a selection.
+
+    Args:
+        fields: Fields to fetch, None for whole documents
+
+    Returns:
+        Optional[List[str]]: The fields to query
+    """
+    if fields is None:
+        return fields
+    return list(dict.fromkeys([*fields, "id", "created_at"]))
+
+
+def next_page_cursor(docs: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """
+    Return the cursor of the page after docs, or None on the last page.
+
+    Args:
+        docs: Raw documents of the current page
+        limit: Page size the documents were queried with
+
+    Returns:
+        Optional[str]: Cursor of the next page
+    """
+    if not docs or len(docs) < limit:
+        return None
+    return encode_cursor(docs[-1].get("created_at"), docs[-1].get("id"))
+
+
+def is_firestore_sentinel(value):
+    """
+    Check if a value is a Firestore Sentinel.
+
+    Args:
+        value: The value to check
+
+    Returns:
+        bool: True if the value is a Firestore Sentinel, False otherwise
+    """
+    return isinstance(value, Sentinel)
+
+
+def convert_post_timestamps(post_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert the Firestore created_at timestamp of a post to an ISO string.
+
+    Args:
+        post_data: Post document data
+
+    Returns:
+        Dict[str, Any]: The same post data with a string created_at
+    """
+    if post_data.get("created_at") and isinstance(post_data["created_at"], datetime):
+        post_data["created_at"] = post_data["created_at"].isoformat()
+    return post_data
+
+
+class FirestoreRepository(Repository):
+    """Repository backed by the async Firestore client."""
+
+    async def get_persona(self, persona_id: str) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        doc = await db.collection(PERSONAS_COLLECTION).document(persona_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def list_personas(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        collection = db.collection(PERSONAS_COLLECTION)
+        query = build_list_query(collection, user_id, limit, cursor, fields)
+        return [doc.to_dict() async for doc in query.stream()]
+
+    async def save_persona(self, persona_data: Dict[str, Any]) -> None:
+        db = get_async_firestore_client()
+        doc_ref = db.collection(PERSONAS_COLLECTION).document(persona_data["id"])
+        await doc_ref.set(persona_data)
+
+    async def get_post(self, post_id: str) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        doc = await db.collection(POSTS_COLLECTION).document(post_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def list_posts(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        query = build_list_query(
+            db.collection(POSTS_COLLECTION), user_id, limit, cursor, fields
+        )
+        return [doc.to_dict() async for doc in query.stream()]
+
+    async def save_post(self, post_data: Dict[str, Any]) -> None:
+        if "raw_request" in post_data:
+            # The post and its audit record are written in one batch
+            await self.save_posts([post_data])
+            return
+
+        db = get_async_firestore_client()
+        doc_ref = db.collection(POSTS_COLLECTION).document(post_data["id"])
+        await doc_ref.set(post_data)
+
+    async def save_posts(self, posts: List[Dict[str, Any]]) -> None:
+        if not posts:
+            return
+
+        db = get_async_firestore_client()
+        collection = db.collection(POSTS_COLLECTION)
+        batch = db.batch()
+        writes = 0
+        for post_data in posts:
+            post_data, audit = split_raw_request(post_data)
+            needed = 1 if audit is None else 2
+            if writes + needed > MAX_BATCH_WRITES:
+                await batch.commit()
+                batch = db.batch()
+                writes = 0
+
+            doc_ref = collection.document(post_data["id"])
+            batch.set(doc_ref, post_data)
+            if audit is not None:
+                audit_ref = doc_ref.collection(AUDIT_SUBCOLLECTION)
+                batch.set(audit_ref.document(RAW_REQUEST_DOCUMENT), audit)
+            writes += needed
+        await batch.commit()
+
+    async def get_post_request(self, post_id: str) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        audit_ref = (
+            db.collection(POSTS_COLLECTION)
+            .document(post_id)
+            .collection(AUDIT_SUBCOLLECTION)
+            .document(RAW_REQUEST_DOCUMENT)
+        )
+        doc = await audit_ref.get()
+        return doc.to_dict() if doc.exists else None
+
+    async def save_job(self, job_data: Dict[str, Any]) -> None:
+        db = get_async_firestore_client()
+        await db.collection(JOBS_COLLECTION).document(job_data["id"]).set(job_data)
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        doc = await db.collection(JOBS_COLLECTION).document(job_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def update_job(self, job_id: str, updates: Dict[str, Any]) -> None:
+        db = get_async_firestore_client()
+        await db.collection(JOBS_COLLECTION).document(job_id).update(updates)
+
+    async def claim_job(
+        self, job_id: str, worker_id: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        doc_ref = db.collection(JOBS_COLLECTION).document(job_id)
+
+        @firestore_async.async_transactional
+        async def claim(transaction):
+            doc = await doc_ref.get(transaction=transaction)
+            if not doc.exists:
+                return None
+
+            job = doc.to_dict()
+            updates = job_claim_updates(job, worker_id, lease_seconds, time.time())
+            if updates is None:
+                return None
+            transaction.update(doc_ref, updates)
+            return {**job, **updates}
+
+        return await claim(db.transaction())
+
+    async def list_unfinished_jobs(self, limit: int = 100) -> List[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        query = (
+            db.collection(JOBS_COLLECTION)
+            .where("status", "in", [JOB_QUEUED, JOB_RUNNING])
+            .limit(limit)
+        )
+        return [doc.to_dict() async for doc in query.stream()]
+
+    async def claim_idempotency_key(
+        self, record_id: str, fingerprint: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        db = get_async_firestore_client()
+        doc_ref = db.collection(IDEMPOTENCY_COLLECTION).document(record_id)
+
+        @firestore_async.async_transactional
+        async def claim(transaction):
+            doc = await doc_ref.get(transaction=transaction)
+            now = time.time()
+            if doc.exists:
+                record = doc.to_dict()
+                if (record.get("expires_at") or 0) > now:
+                    return record
+
+            transaction.set(
+                doc_ref, idempotency_record(record_id, fingerprint, lease_seconds, now)
+            )
+            return None
+
+        return await claim(db.transaction())
+
+    async def complete_idempotency_key(
+        self, record_id: str, response: Dict[str, Any], ttl_seconds: float
+    ) -> None:
+        db = get_async_firestore_client()
+        await (
+            db.collection(IDEMPOTENCY_COLLECTION)
+            .document(record_id)
+            .update(
+                {
+                    "status": IDEMPOTENCY_COMPLETED,
+                    "response": response,
+                    "expires_at": time.time() + ttl_seconds,
+                }
+            )
+        )
+
+    async def release_idempotency_key(self, record_id: str) -> None:
+        db = get_async_firestore_client()
+        await db.collection(IDEMPOTENCY_COLLECTION).document(record_id).delete()
+
+
+def get_repository() -> Repository:
+    """
+    Return the repository selected by STORAGE_BACKEND, creating it on first use.
+
+    Operations of the repository are timed in the storage metrics.
+
+    Returns:
+        Repository: The process-wide repository
+    """
+    global _repository
+
+    if _repository is None:
+        settings = get_settings()
+        if settings.storage_backend == "memory":
+            repository = MemoryRepository()
+        elif settings.storage_backend == "sqlite":
+            repository = SQLiteRepository(settings.storage_path)
+        else:
+            repository = FirestoreRepository()
+        _repository = InstrumentedRepository(
+            repository, settings.storage_backend, bulkheads[STORAGE]
+        )
+
+    return _repository
+
+
+async def get_persona_by_id(persona_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a persona by its ID.
+
+    Results are served from persona_cache when possible. The returned
+    dictionary is shared with the cache and must not be mutated.
 
     Args:
         persona_id: The ID of the persona to retrieve
@@ -109,13 +475,43 @@ def get_persona_by_id_sync(persona_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: The persona data if found, None otherwise
     """
-    db = get_firestore_client()
-    doc_ref = db.collection("personas").document(persona_id)
-    doc = doc_ref.get()
+    cached = persona_cache.get(persona_id)
+    if cached is not None:
+        return cached
+
+    persona = await get_repository().get_persona(persona_id)
+    if persona is not None:
+        persona = convert_to_serializable(persona)
+        persona_cache.set(persona_id, persona)
+    return persona
+
+
+async def list_personas_page(
+    user_id: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List one page of personas, optionally filtered by user_id.
 
-    if doc.exists:
-        return convert_to_serializable(doc.to_dict())
-    return None
+    Args:
+        user_id: Optional user ID to filter by
+        limit: Maximum number of personas to return
+        cursor: Optional cursor returned with the previous page
+        fields: Optional fields to fetch, None for whole documents
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: Personas and next cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    docs = await get_repository().list_personas(
+        user_id, limit, cursor, with_cursor_field(fields)
+    )
+    next_cursor = next_page_cursor(docs, limit)
+    return [convert_to_serializable(select(doc, fields)) for doc in docs], next_cursor
 
 
 async def list_personas(user_id: Optional[str] = None, limit: int = 10) -> list:
@@ -129,29 +525,228 @@ async def list_personas(user_id: Optional[str] = None, limit: int = 10) -> list:
     Returns:
         list: List of persona documents
     """
-    db = get_firestore_client()
-    query = db.collection("personas")
+    personas, _ = await list_personas_page(user_id, limit)
+    return personas
 
-    if user_id:
-        query = query.where("user_id", "==", user_id)
 
-    # Order by created_at descending (newest first)
-    query = query.order_by("created_at", direction=firestore.Query.DESCENDING).limit(
-        limit
+async def save_persona(persona_data: Dict[str, Any]) -> None:
+    """
+    Store a persona document under its own ID.
+
+    Args:
+        persona_data: The persona document, including its "id" key
+    """
+    await get_repository().save_persona(persona_data)
+    persona_cache.invalidate(persona_data["id"])
+
+
+async def get_post_by_id(post_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a post by its ID.
+
+    Args:
+        post_id: The ID of the post to retrieve
+
+    Returns:
+        Optional[Dict[str, Any]]: The post data if found, None otherwise
+    """
+    post = await get_repository().get_post(post_id)
+    if post is not None:
+        return convert_post_timestamps(post)
+    return None
+
+
+async def list_posts_page(
+    user_id: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List one page of posts, optionally filtered by user_id.
+
+    Args:
+        user_id: Optional user ID to filter by
+        limit: Maximum number of posts to return
+        cursor: Optional cursor returned with the previous page
+        fields: Optional fields to fetch, None for whole documents
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: Posts and next cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    docs = await get_repository().list_posts(
+        user_id, limit, cursor, with_cursor_field(fields)
     )
+    next_cursor = next_page_cursor(docs, limit)
+    return [convert_post_timestamps(select(doc, fields)) for doc in docs], next_cursor
 
-    docs = query.stream()
-    return [convert_to_serializable(doc.to_dict()) for doc in docs]
 
+async def list_posts(
+    user_id: Optional[str] = None, limit: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    List posts, optionally filtered by user_id.
 
-def is_firestore_sentinel(value):
+    Args:
+        user_id: Optional user ID to filter by
+        limit: Maximum number of posts to return
+
+    Returns:
+        List[Dict[str, Any]]: List of post documents, newest first
     """
-    Check if a value is a Firestore Sentinel.
+    posts, _ = await list_posts_page(user_id, limit)
+    return posts
+
+
+async def save_post(post_data: Dict[str, Any]) -> None:
+    """
+    Store a post document under its own ID.
 
     Args:
-        value: The value to check
+        post_data: The post document, including its "id" key
+    """
+    await get_repository().save_post(post_data)
+
+
+async def save_posts(posts: List[Dict[str, Any]]) -> None:
+    """
+    Store several post documents with batched writes.
+
+    Args:
+        posts: Post documents, each including its "id" key
+    """
+    await get_repository().save_posts(posts)
+
+
+async def get_post_request(post_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve the audited upstream request of a post.
+
+    Only posts generated with POST_AUDIT_RAW_REQUESTS have one; it is kept
+    apart from the post so that reading posts never loads it.
+
+    Args:
+        post_id: The ID of the post
 
     Returns:
-        bool: True if the value is a Firestore Sentinel, False otherwise
+        Optional[Dict[str, Any]]: The audit record with the raw_request sent
+            to the post webhook, None if there is none
     """
-    return isinstance(value, Sentinel)
+    return await get_repository().get_post_request(post_id)
+
+
+async def save_job(job_data: Dict[str, Any]) -> None:
+    """
+    Store a persona job document under its own ID.
+
+    Args:
+        job_data: The job document, including its "id" key
+    """
+    await get_repository().save_job(job_data)
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve a persona job by its ID.
+
+    Args:
+        job_id: The ID of the job to retrieve
+
+    Returns:
+        Optional[Dict[str, Any]]: The job data if found, None otherwise
+    """
+    return await get_repository().get_job(job_id)
+
+
+async def update_job(job_id: str, updates: Dict[str, Any]) -> None:
+    """
+    Update fields of a persona job.
+
+    Args:
+        job_id: The ID of the job to update
+        updates: Fields to set
+    """
+    await get_repository().update_job(job_id, updates)
+
+
+async def claim_job(
+    job_id: str, worker_id: str, lease_seconds: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically mark a job as running on a worker.
+
+    A job can be claimed when it is queued, or when it is running but the
+    lease of the worker that claimed it has expired.
+
+    Args:
+        job_id: The ID of the job to claim
+        worker_id: ID of the claiming worker process
+        lease_seconds: How long the claim is valid
+
+    Returns:
+        Optional[Dict[str, Any]]: The claimed job, or None if it is not claimable
+    """
+    return await get_repository().claim_job(job_id, worker_id, lease_seconds)
+
+
+async def list_unfinished_jobs(limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    List queued and running persona jobs.
+
+    Args:
+        limit: Maximum number of jobs to return
+
+    Returns:
+        List[Dict[str, Any]]: Unfinished job documents
+    """
+    return await get_repository().list_unfinished_jobs(limit)
+
+
+async def claim_idempotency_key(
+    record_id: str, fingerprint: str, lease_seconds: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically reserve an idempotency key for a new request.
+
+    A key can be claimed when it has no record, when its stored response
+    expired, or when the request holding it stopped renewing its lease.
+
+    Args:
+        record_id: Document ID derived from the key
+        fingerprint: Hash of the request body
+        lease_seconds: How long the reservation is valid
+
+    Returns:
+        Optional[Dict[str, Any]]: None if the key was claimed, otherwise the
+        existing record
+    """
+    return await get_repository().claim_idempotency_key(
+        record_id, fingerprint, lease_seconds
+    )
+
+
+async def complete_idempotency_key(
+    record_id: str, response: Dict[str, Any], ttl_seconds: float
+) -> None:
+    """
+    Store the response of a request so retries can replay it.
+
+    Args:
+        record_id: Document ID derived from the key
+        response: Status code, headers and JSON encoded body of the response
+        ttl_seconds: How long the response is replayed
+    """
+    await get_repository().complete_idempotency_key(record_id, response, ttl_seconds)
+
+
+async def release_idempotency_key(record_id: str) -> None:
+    """
+    Delete an idempotency key so the request can be retried.
+
+    Args:
+        record_id: Document ID derived from the key
+    """
+    await get_repository().release_idempotency_key(record_id)
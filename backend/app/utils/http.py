@@ -0,0 +1,343 @@
+"""Shared outbound HTTP client for the Make.com webhooks."""
+
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import get_settings
+from app.utils.bulkhead import bulkheads
+from app.utils.circuit_breaker import AdaptiveTimeout, CircuitBreaker
+from app.utils.metrics import observe_upstream, record_upstream_status
+from app.utils.tracing import SPAN_KIND_CLIENT, propagation_headers, span
+
+# Upstream names used to look up per-upstream settings
+PERSONA_WEBHOOK = "persona_webhook"
+POST_WEBHOOK = "post_webhook"
+
+# Setting holding the timeout (seconds) of each upstream
+UPSTREAM_TIMEOUT_SETTING = {
+    PERSONA_WEBHOOK: "make_webhook_timeout",
+    POST_WEBHOOK: "make_webhook_post_timeout",
+}
+CONNECT_TIMEOUT = 5.0
+
+# Responses that mean the upstream is failing or overloaded
+FAILURE_STATUS_CODES = {429}
+
+# Application-scoped client, created in the FastAPI lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+# Per-upstream breakers, and latency windows per upstream and variant,
+# created on first use
+_breakers: Dict[str, CircuitBreaker] = {}
+_timeouts: Dict[Tuple[str, Optional[str]], AdaptiveTimeout] = {}
+
+
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    """
+    Return the circuit breaker of an upstream.
+
+    Thresholds come from WEBHOOK_BREAKER_FAILURE_THRESHOLD and
+    WEBHOOK_BREAKER_RECOVERY_TIMEOUT.
+
+    Args:
+        upstream: Name of the upstream, e.g. POST_WEBHOOK
+
+    Returns:
+        CircuitBreaker: The breaker shared by all calls to the upstream
+    """
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        settings = get_settings()
+        breaker = _breakers.setdefault(
+            upstream,
+            CircuitBreaker(
+                upstream,
+                failure_threshold=settings.webhook_breaker_failure_threshold,
+                recovery_timeout=settings.webhook_breaker_recovery_timeout,
+            ),
+        )
+    return breaker
+
+
+def get_adaptive_timeout(
+    upstream: str, variant: Optional[str] = None
+) -> AdaptiveTimeout:
+    """
+    Return the latency window of an upstream.
+
+    Args:
+        upstream: Name of the upstream
+        variant: Kind of call with its own latencies, e.g. a content type
+
+    Returns:
+        AdaptiveTimeout: The window shared by all such calls to the upstream
+    """
+    adaptive = _timeouts.get((upstream, variant))
+    if adaptive is None:
+        settings = get_settings()
+        adaptive = _timeouts.setdefault(
+            (upstream, variant),
+            AdaptiveTimeout(
+                minimum=settings.webhook_timeout_min,
+                percentile=settings.webhook_timeout_percentile,
+                multiplier=settings.webhook_timeout_multiplier,
+            ),
+        )
+    return adaptive
+
+
+def get_upstream_timeout_seconds(upstream: str, variant: Optional[str] = None) -> float:
+    """
+    Return the current timeout of an upstream in seconds.
+
+    The configured timeout is the ceiling. With WEBHOOK_ADAPTIVE_TIMEOUT the
+    timeout follows the observed latency percentile once enough calls have
+    been seen, so a degraded upstream fails calls early instead of holding
+    workers for the full configured time. Each variant, e.g. a content type,
+    learns from its own calls, and calls that timed out count at their
+    timeout, so slow kinds of calls keep a long enough timeout.
+
+    Args:
+        upstream: Name of the upstream, e.g. POST_WEBHOOK
+        variant: Kind of call with its own latencies, e.g. a content type
+
+    Returns:
+        float: Timeout in seconds
+    """
+    settings = get_settings()
+    setting = UPSTREAM_TIMEOUT_SETTING.get(upstream, "http_client_timeout")
+    timeout = getattr(settings, setting)
+    if settings.webhook_adaptive_timeout:
+        timeout = get_adaptive_timeout(upstream, variant).current(timeout)
+    return timeout
+
+
+def get_upstream_timeout(upstream: str, variant: Optional[str] = None) -> httpx.Timeout:
+    """
+    Return the timeout of an upstream.
+
+    Args:
+        upstream: Name of the upstream, e.g. POST_WEBHOOK
+        variant: Kind of call with its own latencies, e.g. a content type
+
+    Returns:
+        httpx.Timeout: Timeout with a short connect phase
+    """
+    timeout = get_upstream_timeout_seconds(upstream, variant)
+    return httpx.Timeout(timeout, connect=min(CONNECT_TIMEOUT, timeout))
+
+
+def upstream_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return breaker state and current timeout of each upstream used so far.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Stats by upstream name
+    """
+    return {
+        upstream: breaker.stats() | {"timeout": get_upstream_timeout_seconds(upstream)}
+        for upstream, breaker in list(_breakers.items())
+    }
+
+
+def _record_response(
+    upstream: str, variant: Optional[str], status_code: int, latency: float
+) -> None:
+    record_upstream_status(upstream, status_code)
+    breaker = get_circuit_breaker(upstream)
+    if status_code >= 500 or status_code in FAILURE_STATUS_CODES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+        get_adaptive_timeout(upstream, variant).observe(latency)
+
+
+def _record_error(
+    upstream: str, variant: Optional[str], error: Exception, timeout: httpx.Timeout
+) -> None:
+    get_circuit_breaker(upstream).record_failure()
+    # The call took at least its timeout; leaving it out of the window would
+    # only let the timeout shrink further
+    if isinstance(error, httpx.TimeoutException):
+        get_adaptive_timeout(upstream, variant).observe(timeout.read)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create a pooled async client with keep-alive and optional HTTP/2.
+
+    Pool sizes come from HTTP_CLIENT_MAX_CONNECTIONS,
+    HTTP_CLIENT_MAX_KEEPALIVE and HTTP_CLIENT_KEEPALIVE_EXPIRY.
+
+    Returns:
+        httpx.AsyncClient: A new client
+    """
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.http_client_max_connections,
+        max_keepalive_connections=settings.http_client_max_keepalive,
+        keepalive_expiry=settings.http_client_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        http2=settings.http_client_http2,
+        limits=limits,
+        timeout=httpx.Timeout(settings.http_client_timeout, connect=CONNECT_TIMEOUT),
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client; called from the application lifespan."""
+    global _client
+
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release pooled connections."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client, creating it if the lifespan has not run.
+
+    Returns:
+        httpx.AsyncClient: The application-scoped client
+    """
+    global _client
+
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+def _bulkhead(upstream: str) -> AsyncContextManager:
+    # Upstream names double as bulkhead pool names
+    pool = bulkheads.get(upstream)
+    return pool.hold() if pool is not None else nullcontext()
+
+
+def _webhook_span(upstream: str, url: str):
+    # Only the host is recorded, webhook paths carry the Make.com secret
+    return span(
+        f"webhook.{upstream}",
+        kind=SPAN_KIND_CLIENT,
+        **{"upstream": upstream, "server.address": urlsplit(url).hostname},
+    )
+
+
+async def post_webhook(
+    upstream: str, url: str, payload: Dict[str, Any], variant: Optional[str] = None
+) -> httpx.Response:
+    """
+    POST a JSON payload to a webhook through the shared client.
+
+    The request ID and trace context of the current request are sent along
+    in the X-Request-ID and traceparent headers. Transport errors, timeouts,
+    429 and 5xx responses count as failures of the upstream's circuit. Calls
+    wait for a slot in the upstream's bulkhead.
+
+    Args:
+        upstream: Name of the upstream, used to pick the timeout and to label
+            the latency and error metrics
+        url: Webhook URL
+        payload: JSON body
+        variant: Kind of call with its own adaptive timeout, e.g. a content type
+
+    Returns:
+        httpx.Response: The webhook response
+
+    Raises:
+        CircuitOpenError: If the upstream's circuit is open
+        BulkheadFull: If too many calls to the upstream are waiting
+    """
+    client = get_http_client()
+    breaker = get_circuit_breaker(upstream)
+    # Inside the slot, so a call shed by the bulkhead never takes the
+    # half-open circuit's trial call
+    async with _bulkhead(upstream):
+        breaker.before_call()
+        timeout = get_upstream_timeout(upstream, variant)
+        start = time.perf_counter()
+        with _webhook_span(upstream, url) as webhook_span, observe_upstream(upstream):
+            try:
+                response = await client.post(
+                    url,
+                    json=payload,
+                    headers=propagation_headers(),
+                    timeout=timeout,
+                )
+            except httpx.TransportError as e:
+                _record_error(upstream, variant, e, timeout)
+                raise
+            if webhook_span is not None:
+                webhook_span.set_attribute("http.status_code", response.status_code)
+        _record_response(
+            upstream, variant, response.status_code, time.perf_counter() - start
+        )
+    return response
+
+
+@asynccontextmanager
+async def stream_webhook(
+    upstream: str, url: str, payload: Dict[str, Any], variant: Optional[str] = None
+) -> AsyncIterator[httpx.Response]:
+    """
+    POST a JSON payload to a webhook and stream the response body.
+
+    Args:
+        upstream: Name of the upstream, used to pick the timeout
+        url: Webhook URL
+        payload: JSON body
+        variant: Kind of call with its own adaptive timeout, e.g. a content type
+
+    Yields:
+        httpx.Response: The response, with the body not yet read
+
+    Raises:
+        CircuitOpenError: If the upstream's circuit is open
+        BulkheadFull: If too many calls to the upstream are waiting
+    """
+    client = get_http_client()
+    breaker = get_circuit_breaker(upstream)
+    # The slot is held until the body is consumed; the circuit is checked
+    # inside it, so a call shed by the bulkhead never takes the trial call
+    async with _bulkhead(upstream):
+        breaker.before_call()
+        timeout = get_upstream_timeout(upstream, variant)
+        start = time.perf_counter()
+        # Timed until the body is consumed, stream errors count as upstream errors
+        with _webhook_span(upstream, url) as webhook_span, observe_upstream(upstream):
+            try:
+                async with client.stream(
+                    "POST",
+                    url,
+                    json=payload,
+                    headers=propagation_headers(),
+                    timeout=timeout,
+                ) as response:
+                    # The adaptive timeout learns from the time to the first byte
+                    _record_response(
+                        upstream,
+                        variant,
+                        response.status_code,
+                        time.perf_counter() - start,
+                    )
+                    if webhook_span is not None:
+                        webhook_span.set_attribute(
+                            "http.status_code", response.status_code
+                        )
+                    yield response
+            except httpx.TransportError as e:
+                _record_error(upstream, variant, e, timeout)
+                raise
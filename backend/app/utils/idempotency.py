@@ -0,0 +1,205 @@
+"""Idempotency-Key handling for endpoints that create documents."""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app.core.config import get_settings
+from app.utils.db import (
+    IDEMPOTENCY_COMPLETED,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+)
+from app.utils.singleflight import request_key
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Headers that are recomputed when a stored response is replayed
+_SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a request with the same key is still being processed."""
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when a key is sent again with a different request body."""
+
+
+def encode_response(result: Any) -> Dict[str, Any]:
+    """
+    Convert an endpoint result into a storable response.
+
+    Args:
+        result: A Response, or a JSON serializable endpoint return value
+
+    Returns:
+        Dict[str, Any]: Status code, headers and JSON encoded body
+    """
+    if isinstance(result, Response):
+        headers = {
+            name: value
+            for name, value in result.headers.items()
+            if name not in _SKIPPED_HEADERS
+        }
+        return {
+            "status_code": result.status_code,
+            "headers": headers,
+            "body": result.body.decode("utf-8"),
+        }
+    return {
+        "status_code": 200,
+        "headers": {},
+        "body": json.dumps(jsonable_encoder(result)),
+    }
+
+
+def replay_response(stored: Dict[str, Any]) -> Response:
+    """
+    Rebuild a stored response, marked as replayed.
+
+    Args:
+        stored: A response produced by encode_response
+
+    Returns:
+        Response: The JSON response to send
+    """
+    return Response(
+        content=stored["body"],
+        status_code=stored["status_code"],
+        headers={**stored.get("headers", {}), REPLAYED_HEADER: "true"},
+        media_type="application/json",
+    )
+
+
+class IdempotencyGuard:
+    """
+    Runs a request at most once per Idempotency-Key.
+
+    Keys are reserved in Firestore, so retries reaching another replica are
+    recognized too. The successful response is stored and replayed for ttl
+    seconds; failed requests, including results the caller reports as
+    failed, release their key so they can be retried. A
+    duplicate arriving while the first request is still running waits for
+    it when both are handled by this process, and is rejected with
+    IdempotencyConflict otherwise.
+    """
+
+    def __init__(self, ttl: float = 86400.0, lease_seconds: float = 300.0):
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self._local: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    @staticmethod
+    def record_id(scope: str, key: str) -> str:
+        return hashlib.sha256(f"{scope}:{key}".encode("utf-8")).hexdigest()
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        payload: Any,
+        fn: Callable[[], Awaitable[Any]],
+        failed: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Run fn once for the key, or replay the response it produced.
+
+        Args:
+            scope: Endpoint the key belongs to, e.g. "post"
+            key: Value of the Idempotency-Key header
+            payload: JSON serializable request body
+            fn: Zero-argument coroutine function handling the request
+            failed: Tells whether a result of fn reports a failure, which is
+                returned but not stored
+
+        Returns:
+            Any: The result of fn, or the replayed Response
+
+        Raises:
+            ValueError: If the key is empty or too long
+            IdempotencyKeyReused: If the key was used with another body
+            IdempotencyConflict: If the key is being processed elsewhere
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError("Invalid Idempotency-Key")
+
+        record_id = self.record_id(scope, key)
+        fingerprint = request_key(scope, payload)
+
+        entry = self._local.get(record_id)
+        if entry is not None:
+            if entry[0] != fingerprint:
+                raise IdempotencyKeyReused("Idempotency-Key reused with another body")
+            _, stored = await asyncio.shield(entry[1])
+            return replay_response(stored)
+
+        task = asyncio.ensure_future(self._execute(record_id, fingerprint, fn, failed))
+        self._local[record_id] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._forget(record_id, done))
+
+        result, stored = await asyncio.shield(task)
+        if result is None:
+            return replay_response(stored)
+        return result
+
+    async def _execute(
+        self,
+        record_id: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[Any]],
+        failed: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Optional[Any], Dict[str, Any]]:
+        existing = await claim_idempotency_key(
+            record_id, fingerprint, self.lease_seconds
+        )
+        if existing is not None:
+            if existing.get("fingerprint") != fingerprint:
+                raise IdempotencyKeyReused("Idempotency-Key reused with another body")
+            if existing.get("status") == IDEMPOTENCY_COMPLETED:
+                return None, existing["response"]
+            raise IdempotencyConflict("A request with this Idempotency-Key is running")
+
+        try:
+            result = await fn()
+        except Exception:
+            await self._release(record_id)
+            raise
+
+        stored = encode_response(result)
+        if failed is not None and failed(result):
+            await self._release(record_id)
+            return result, stored
+        try:
+            await complete_idempotency_key(record_id, stored, self.ttl)
+        except Exception as e:
+            print(f"Failed to store idempotent response {record_id}: {str(e)}")
+        return result, stored
+
+    @staticmethod
+    async def _release(record_id: str) -> None:
+        try:
+            await release_idempotency_key(record_id)
+        except Exception as e:
+            print(f"Failed to release idempotency key {record_id}: {str(e)}")
+
+    def _forget(self, record_id: str, task: asyncio.Task) -> None:
+        entry = self._local.get(record_id)
+        if entry is not None and entry[1] is task:
+            del self._local[record_id]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+
+idempotency = IdempotencyGuard(
+    ttl=get_settings().idempotency_ttl,
+    lease_seconds=get_settings().idempotency_lease_seconds,
+)
@@ -0,0 +1,359 @@
+"""In-process metrics rendered in the Prometheus text format."""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request handling mostly takes milliseconds, webhook calls up to a minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# A collected sample: labels and value
+Sample = Tuple[Dict[str, str], float]
+
+# A collected metric family: name, type, help text and samples
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class _Value:
+    """A single counter or gauge value."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count of one histogram."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """
+    A metric family with optional labels.
+
+    Children are created on first use of a label combination and kept for
+    the lifetime of the process, so label values must come from a small,
+    fixed set such as route templates or upstream names.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        return _Value()
+
+    def labels(self, *values: str) -> Any:
+        """
+        Return the child of a label combination.
+
+        Args:
+            values: One value per label name, in order
+
+        Returns:
+            Any: The child to update
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self, labels: Dict[str, str], child: Any) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._samples(dict(zip(self.labelnames, values)), child))
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """A value that goes up and down."""
+
+    type = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self, labels: Dict[str, str], child: _HistogramValue) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), child.counts):
+            cumulative += count
+            bucket_labels = {**labels, "le": _format_value(bound)}
+            yield f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}"
+        yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of the process and renders them for scraping.
+
+    Values that are already counted elsewhere, such as cache statistics, are
+    read by collectors when the registry is rendered instead of being
+    updated on every operation.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """
+        Register a function returning metric families at scrape time.
+
+        Args:
+            collector: Returns (name, type, help, samples) tuples
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, ending with a newline
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Duration of calls to external services.",
+    ("upstream",),
+    buckets=UPSTREAM_BUCKETS,
+)
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total",
+    "Failed calls to external services, by error status or exception.",
+    ("upstream", "reason"),
+)
+STORAGE_OPERATION_DURATION = registry.histogram(
+    "storage_operation_duration_seconds",
+    "Duration of storage operations.",
+    ("backend", "operation"),
+)
+STORAGE_OPERATION_ERRORS = registry.counter(
+    "storage_operation_errors_total",
+    "Storage operations that raised an exception.",
+    ("backend", "operation"),
+)
+RATE_LIMITED = registry.counter(
+    "rate_limited_total",
+    "Requests rejected by a rate limit, by endpoint and limit.",
+    ("endpoint", "scope"),
+)
+
+
+@contextmanager
+def observe_upstream(upstream: str) -> Iterator[None]:
+    """
+    Time a call to an external service and count it if it raises.
+
+    Args:
+        upstream: Name of the service, e.g. "post_webhook"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(upstream, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(upstream).observe(time.perf_counter() - start)
+
+
+def record_upstream_status(upstream: str, status_code: int) -> None:
+    """
+    Count an error response of an external service.
+
+    Args:
+        upstream: Name of the service
+        status_code: HTTP status of its response
+    """
+    if status_code >= 400:
+        UPSTREAM_ERRORS.labels(upstream, f"http_{status_code}").inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by its route template.
+
+    Requests that match no route share the "unmatched" label, so unknown
+    paths cannot create unbounded numbers of series.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(
+                duration
+            )
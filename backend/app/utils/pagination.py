@@ -0,0 +1,107 @@
+"""Opaque cursor tokens and field selection for paginated list endpoints."""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def clamp_page_size(limit: int) -> int:
+    """
+    Clamp a requested page size to the range 1..MAX_PAGE_SIZE, the largest
+    page any list endpoint returns.
+
+    Args:
+        limit: Page size requested by the client
+
+    Returns:
+        int: The page size to query
+    """
+    return max(1, min(limit, get_settings().max_page_size))
+
+
+def select_fields(
+    fields: Optional[str], allowed: Iterable[str], default: List[str]
+) -> List[str]:
+    """
+    Parse the fields query parameter of a list endpoint.
+
+    The "id" field is always selected, so every item can be fetched in full
+    with the get endpoint.
+
+    Args:
+        fields: Comma-separated field names sent by the client, if any
+        allowed: Fields the client may select
+        default: Fields selected when the client sends none
+
+    Returns:
+        List[str]: The selected fields, in request order
+
+    Raises:
+        ValueError: If a field is not allowed
+    """
+    if fields is None:
+        return default
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    allowed = set(allowed)
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", *requested]))
+
+
+def encode_cursor(created_at: Any, doc_id: Optional[str] = None) -> Optional[str]:
+    """
+    Encode the position after a document as an opaque cursor.
+
+    Documents written in one commit share their created_at, so the ID of the
+    document is included to tell them apart.
+
+    Args:
+        created_at: created_at of the last document on the page
+        doc_id: ID of the last document on the page
+
+    Returns:
+        Optional[str]: The cursor, or None if the timestamp is unusable
+    """
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    if not isinstance(created_at, str):
+        return None
+
+    position = {"created_at": created_at}
+    if doc_id is not None:
+        position["id"] = doc_id
+    payload = json.dumps(position).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Optional[str]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The opaque cursor sent by the client
+
+    Returns:
+        Tuple[datetime, Optional[str]]: created_at and ID of the last document
+            of the previous page; the ID is None in cursors issued without it
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        doc_id = payload.get("id")
+        if doc_id is not None and not isinstance(doc_id, str):
+            raise TypeError("Cursor ID must be a string")
+        return datetime.fromisoformat(payload["created_at"]), doc_id
+    except (ValueError, TypeError, KeyError, AttributeError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
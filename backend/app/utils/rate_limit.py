@@ -0,0 +1,468 @@
+"""Token-bucket rate limits per user and per client IP."""
+
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import get_settings
+from app.utils.metrics import RATE_LIMITED
+
+# Endpoints with their own limits
+POST_ENDPOINT = "post"
+PERSONA_ENDPOINT = "persona"
+BLOG_PREFETCH_ENDPOINT = "blog_prefetch"
+
+USER = "user"
+IP = "ip"
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Users that are not worth a bucket of their own
+ANONYMOUS_USERS = {"", "anonymous"}
+
+# Seconds between removals of refilled buckets from the shared store
+PRUNE_INTERVAL = 60.0
+
+# Bucket state: tokens left and the time they were counted
+BucketState = Tuple[float, float]
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request finds its token bucket empty."""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        # Whole seconds, as sent in the Retry-After header
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"Rate limit per {scope} exceeded, retry in {self.retry_after} seconds"
+        )
+
+
+class RateLimitCostTooHigh(Exception):
+    """Raised when a request needs more tokens than its bucket can hold."""
+
+    def __init__(self, scope: str, cost: int, capacity: int):
+        self.scope = scope
+        self.cost = cost
+        self.capacity = capacity
+        super().__init__(
+            f"Request counts as {cost} requests, more than the rate limit per "
+            f"{scope} of {capacity}"
+        )
+
+
+class Rate:
+    """
+    A bucket of capacity tokens refilled evenly over period seconds.
+
+    The capacity is also the burst: an idle client may spend all of it at
+    once, then one token every period / capacity seconds.
+    """
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+
+    @property
+    def per_second(self) -> float:
+        return self.capacity / self.period
+
+    def __repr__(self) -> str:
+        return f"Rate({self.capacity}, {self.period})"
+
+
+# A bucket a request takes tokens from: its key and rate
+Bucket = Tuple[str, Rate]
+
+# The first bucket without enough tokens: its index and the seconds to wait
+Rejection = Tuple[int, float]
+
+
+def parse_rate(value: str) -> Optional[Rate]:
+    """
+    Parse a rate such as "30/minute".
+
+    Args:
+        value: "<count>/<second|minute|hour|day>", or "0" for no limit
+
+    Returns:
+        Optional[Rate]: The rate, or None if the limit is disabled
+
+    Raises:
+        ValueError: If the value is not a valid rate
+    """
+    count, _, unit = value.strip().partition("/")
+    if int(count) <= 0:
+        return None
+    if unit not in PERIODS:
+        raise ValueError(f"Invalid rate {value!r}, expected e.g. '30/minute'")
+    return Rate(int(count), PERIODS[unit])
+
+
+def take_tokens(
+    state: Optional[BucketState], rate: Rate, cost: int, now: float
+) -> Tuple[BucketState, float]:
+    """
+    Refill a bucket up to now and take tokens from it.
+
+    Args:
+        state: Stored bucket state, None for a new (full) bucket
+        rate: Capacity and refill rate of the bucket
+        cost: Tokens the request needs, at most the capacity
+        now: Current time in seconds
+
+    Returns:
+        Tuple[BucketState, float]: The new state and the seconds until the
+            request could succeed, 0 if the tokens were taken
+
+    Raises:
+        ValueError: If cost is more than the capacity
+    """
+    if cost > rate.capacity:
+        raise ValueError(f"Cost {cost} is more than the capacity of {rate}")
+    if state is None:
+        tokens = float(rate.capacity)
+    else:
+        tokens, updated_at = state
+        elapsed = max(0.0, now - updated_at)
+        tokens = min(float(rate.capacity), tokens + elapsed * rate.per_second)
+
+    if tokens >= cost:
+        return (tokens - cost, now), 0.0
+    return (tokens, now), (cost - tokens) / rate.per_second
+
+
+def full_at(state: BucketState, rate: Rate) -> float:
+    """
+    Return when a bucket is full again, and so no different from a new one.
+
+    Args:
+        state: Stored bucket state
+        rate: Capacity and refill rate of the bucket
+
+    Returns:
+        float: Time in seconds, on the clock of the state
+    """
+    tokens, updated_at = state
+    return updated_at + (rate.capacity - tokens) / rate.per_second
+
+
+def take_from_all(
+    states: List[Optional[BucketState]], rates: List[Rate], cost: int, now: float
+) -> Tuple[List[BucketState], Optional[Rejection]]:
+    """
+    Take tokens from every bucket, or from none of them.
+
+    Args:
+        states: Stored state of each bucket, None for a new bucket
+        rates: Rate of each bucket
+        cost: Tokens the request needs from each bucket
+        now: Current time in seconds
+
+    Returns:
+        Tuple[List[BucketState], Optional[Rejection]]: The states to store,
+            unchanged when rejected, and the first bucket without enough
+            tokens, None if the tokens were taken
+    """
+    taken = []
+    for index, (state, rate) in enumerate(zip(states, rates)):
+        new_state, retry_after = take_tokens(state, rate, cost, now)
+        if retry_after > 0:
+            return [], (index, retry_after)
+        taken.append(new_state)
+    return taken, None
+
+
+class MemoryRateLimitStore:
+    """
+    Buckets kept in this process.
+
+    Each uvicorn worker counts separately, so with N workers a client may
+    get up to N times the configured rate. The least recently used buckets
+    are dropped beyond max_keys; a dropped bucket starts full again.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> float:
+        """
+        Take tokens from the bucket of a key.
+
+        Args:
+            key: Bucket key, e.g. "post:user:alice@example.com"
+            rate: Capacity and refill rate of the bucket
+            cost: Tokens the request needs
+
+        Returns:
+            float: Seconds to wait before retrying, 0 if the request may proceed
+        """
+        rejection = await self.take_all([(key, rate)], cost)
+        return rejection[1] if rejection else 0.0
+
+    async def take_all(
+        self, buckets: List[Bucket], cost: int = 1
+    ) -> Optional[Rejection]:
+        """
+        Take tokens from every bucket, or from none if one is short.
+
+        Args:
+            buckets: Key and rate of each bucket
+            cost: Tokens the request needs from each bucket
+
+        Returns:
+            Optional[Rejection]: The first bucket without enough tokens,
+                None if the request may proceed
+        """
+        keys = [key for key, _ in buckets]
+        states, rejection = take_from_all(
+            [self._buckets.get(key) for key in keys],
+            [rate for _, rate in buckets],
+            cost,
+            time.monotonic(),
+        )
+        for key, state in zip(keys, states):
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return rejection
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class SQLiteRateLimitStore:
+    """
+    Buckets in a SQLite file shared by every worker on the host.
+
+    Each take runs in its own write transaction, so concurrent workers see
+    one consistent count. Operations run in a worker thread. Buckets that
+    have refilled are removed every PRUNE_INTERVAL seconds, so the file only
+    holds the clients seen recently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+        self._pruned_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    full_at REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rate_limits)")}
+            if "full_at" not in columns:
+                # Files written before pruning; their buckets count as full
+                conn.execute(
+                    "ALTER TABLE rate_limits ADD COLUMN full_at REAL NOT NULL DEFAULT 0"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS rate_limits_full_at "
+                "ON rate_limits (full_at)"
+            )
+            self._initialized = True
+        return conn
+
+    def _take_all(self, buckets: List[Bucket], cost: int) -> Optional[Rejection]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            states = [
+                conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                for key, _ in buckets
+            ]
+            # Wall-clock time, the buckets are shared between processes
+            now = time.time()
+            states, rejection = take_from_all(
+                states, [rate for _, rate in buckets], cost, now
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limits "
+                "(key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                [
+                    (key, *state, full_at(state, rate))
+                    for (key, rate), state in zip(buckets, states)
+                ],
+            )
+            if now - self._pruned_at >= PRUNE_INTERVAL:
+                conn.execute("DELETE FROM rate_limits WHERE full_at <= ?", (now,))
+                self._pruned_at = now
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return rejection
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> float:
+        rejection = await self.take_all([(key, rate)], cost)
+        return rejection[1] if rejection else 0.0
+
+    async def take_all(
+        self, buckets: List[Bucket], cost: int = 1
+    ) -> Optional[Rejection]:
+        return await asyncio.to_thread(self._take_all, buckets, cost)
+
+
+class RateLimiter:
+    """
+    Applies the per-user and per-IP limits of each endpoint.
+
+    Both buckets of a request must have enough tokens. Tokens are taken
+    from both or from neither, so a request one bucket rejects does not use
+    up the other's tokens.
+    """
+
+    def __init__(self, store, limits: Dict[str, Dict[str, Optional[Rate]]]):
+        self.store = store
+        self.limits = limits
+
+    async def check(
+        self,
+        endpoint: str,
+        user: Optional[str] = None,
+        client_ip: Optional[str] = None,
+        cost: int = 1,
+    ) -> None:
+        """
+        Take tokens for a request.
+
+        Args:
+            endpoint: POST_ENDPOINT, PERSONA_ENDPOINT or BLOG_PREFETCH_ENDPOINT
+            user: User the request is made for, if known
+            client_ip: Address of the client, if known
+            cost: Tokens the request needs, e.g. one per generated post
+
+        Raises:
+            RateLimitExceeded: If a bucket does not have enough tokens
+            RateLimitCostTooHigh: If the cost is more than a bucket holds
+        """
+        limits = self.limits.get(endpoint, {})
+        scopes = []
+        buckets = []
+        for scope, key in ((IP, client_ip), (USER, user)):
+            rate = limits.get(scope)
+            if rate is None or key is None or key in ANONYMOUS_USERS:
+                continue
+            if cost > rate.capacity:
+                # Waiting would never help, the bucket cannot hold the cost
+                RATE_LIMITED.labels(endpoint, scope).inc()
+                raise RateLimitCostTooHigh(scope, cost, rate.capacity)
+            scopes.append(scope)
+            buckets.append((f"{endpoint}:{scope}:{key}", rate))
+        if not buckets:
+            return
+
+        rejection = await self.store.take_all(buckets, cost)
+        if rejection is not None:
+            index, retry_after = rejection
+            RATE_LIMITED.labels(endpoint, scopes[index]).inc()
+            raise RateLimitExceeded(scopes[index], retry_after)
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    Return the address of the client that sent a request.
+
+    The first X-Forwarded-For address is used only with
+    RATE_LIMIT_TRUST_FORWARDED_FOR, when a proxy that sets it is in front.
+
+    Args:
+        request: The incoming request
+
+    Returns:
+        Optional[str]: The client address, if known
+    """
+    if get_settings().rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for", "")
+        address = forwarded.split(",")[0].strip()
+        if address:
+            return address
+    return request.client.host if request.client else None
+
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Create the rate limiter described by the RATE_LIMIT_* settings.
+
+    Returns:
+        Optional[RateLimiter]: The limiter, or None when rate limiting is off
+    """
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return None
+
+    if settings.rate_limit_backend == "sqlite":
+        store = SQLiteRateLimitStore(settings.rate_limit_path)
+    else:
+        store = MemoryRateLimitStore()
+    limits = {
+        POST_ENDPOINT: {
+            USER: parse_rate(settings.rate_limit_post_per_user),
+            IP: parse_rate(settings.rate_limit_post_per_ip),
+        },
+        PERSONA_ENDPOINT: {
+            USER: parse_rate(settings.rate_limit_persona_per_user),
+            IP: parse_rate(settings.rate_limit_persona_per_ip),
+        },
+        BLOG_PREFETCH_ENDPOINT: {
+            IP: parse_rate(settings.rate_limit_blog_prefetch_per_ip),
+        },
+    }
+    return RateLimiter(store, limits)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+async def enforce_rate_limit(
+    endpoint: str, request: Request, user: Optional[str] = None, cost: int = 1
+) -> None:
+    """
+    Apply the limits of an endpoint to a request.
+
+    Args:
+        endpoint: POST_ENDPOINT, PERSONA_ENDPOINT or BLOG_PREFETCH_ENDPOINT
+        request: The incoming request, for the client address
+        user: User the request is made for, if known
+        cost: Tokens the request needs
+
+    Raises:
+        RateLimitExceeded: If the user or the client is over its limit
+        RateLimitCostTooHigh: If the request counts for more than a limit allows
+    """
+    global _limiter
+
+    if _limiter is None:
+        _limiter = create_rate_limiter()
+        if _limiter is None:
+            return
+    await _limiter.check(endpoint, user, client_ip(request), cost)
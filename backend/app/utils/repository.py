@@ -0,0 +1,704 @@
+"""Storage backends for personas, posts, persona jobs and idempotency keys."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from copy import deepcopy
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.cloud.firestore_v1.transforms import Sentinel
+
+from app.utils.bulkhead import Bulkhead
+from app.utils.metrics import STORAGE_OPERATION_DURATION, STORAGE_OPERATION_ERRORS
+from app.utils.pagination import decode_cursor
+from app.utils.tracing import span
+
+PERSONAS_COLLECTION = "personas"
+POSTS_COLLECTION = "posts"
+JOBS_COLLECTION = "persona_jobs"
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+# Audited upstream requests of posts: Firestore keeps each one in the post's
+# own subcollection (posts/{id}/audit/raw_request), local backends in a
+# collection keyed by post ID
+AUDIT_SUBCOLLECTION = "audit"
+RAW_REQUEST_DOCUMENT = "raw_request"
+POST_AUDIT_COLLECTION = "post_audit"
+
+# Persona job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Idempotency key states
+IDEMPOTENCY_IN_PROGRESS = "in_progress"
+IDEMPOTENCY_COMPLETED = "completed"
+
+DEFAULT_STORAGE_PATH = ".cache/storage.sqlite3"
+
+# Position after the last document of a page: its created_at and ID (None in
+# cursors issued without it)
+Position = Tuple[datetime, Optional[str]]
+
+# Receives the current document (or None) and returns the replacement
+# document (or None to keep it) and the value to hand back to the caller
+Modifier = Callable[[Optional[Dict[str, Any]]], Tuple[Optional[Dict[str, Any]], Any]]
+
+
+def job_claim_updates(
+    job: Dict[str, Any], worker_id: str, lease_seconds: float, now: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the fields that mark a job as claimed, if it can be claimed.
+
+    A job can be claimed when it is queued, or when it is running but the
+    lease of the worker that claimed it has expired.
+
+    Args:
+        job: The stored job
+        worker_id: ID of the claiming worker process
+        lease_seconds: How long the claim is valid
+        now: Current time as a Unix timestamp
+
+    Returns:
+        Optional[Dict[str, Any]]: Fields to update, or None
+    """
+    lease_expired = (job.get("lease_expires_at") or 0) <= now
+    if job["status"] == JOB_QUEUED or (job["status"] == JOB_RUNNING and lease_expired):
+        return {
+            "status": JOB_RUNNING,
+            "worker_id": worker_id,
+            "lease_expires_at": now + lease_seconds,
+            "attempts": job.get("attempts", 0) + 1,
+            "updated_at": datetime.now().isoformat(),
+        }
+    return None
+
+
+def idempotency_record(
+    record_id: str, fingerprint: str, lease_seconds: float, now: float
+) -> Dict[str, Any]:
+    """
+    Build the record reserving an idempotency key for a new request.
+
+    Args:
+        record_id: Document ID derived from the key
+        fingerprint: Hash of the request body
+        lease_seconds: How long the reservation is valid
+        now: Current time as a Unix timestamp
+
+    Returns:
+        Dict[str, Any]: The in-progress record
+    """
+    return {
+        "id": record_id,
+        "fingerprint": fingerprint,
+        "status": IDEMPOTENCY_IN_PROGRESS,
+        "created_at": datetime.now().isoformat(),
+        "expires_at": now + lease_seconds,
+    }
+
+
+def split_raw_request(
+    post_data: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Separate the audited upstream request from a post document.
+
+    Args:
+        post_data: A post document, with a raw_request when auditing is on
+
+    Returns:
+        Tuple[Dict[str, Any], Optional[Dict[str, Any]]]: The post without its
+            raw_request, and the audit record if it had one
+    """
+    if "raw_request" not in post_data:
+        return post_data, None
+
+    post = {key: value for key, value in post_data.items() if key != "raw_request"}
+    audit = {
+        "id": post["id"],
+        "created_at": post.get("created_at"),
+        "raw_request": post_data["raw_request"],
+    }
+    return post, audit
+
+
+def select(document: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Keep only the given fields of a document.
+
+    Args:
+        document: A stored document
+        fields: Fields to keep, None for all of them
+
+    Returns:
+        Dict[str, Any]: The fields of the document that it has
+    """
+    if fields is None:
+        return document
+    return {name: document[name] for name in fields if name in document}
+
+
+def is_after(key: Tuple[datetime, str], position: Position) -> bool:
+    """
+    Check whether a document comes after a page position, newest first.
+
+    Args:
+        key: created_at and ID of the document
+        position: Position from a pagination cursor
+
+    Returns:
+        bool: True if the document belongs to a later page
+    """
+    created_at, doc_id = position
+    if doc_id is None:
+        return key[0] < created_at
+    return key < (created_at, doc_id)
+
+
+def as_utc(value: Any) -> Optional[datetime]:
+    """
+    Interpret a created_at value as an aware UTC datetime.
+
+    Args:
+        value: A datetime or an ISO 8601 string; naive values count as UTC
+
+    Returns:
+        Optional[datetime]: The timestamp, or None if value is neither
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class Repository(ABC):
+    """
+    Storage of the documents of the application.
+
+    Documents are dictionaries keyed by their "id". Returned documents are
+    fresh copies the caller may modify. List methods return documents that
+    have a created_at, newest first, optionally filtered by user_id and
+    starting after the created_at encoded in a pagination cursor; given
+    fields, they return only those fields of each document. The raw_request
+    of a post is stored apart from it, see split_raw_request, and only read
+    by get_post_request.
+
+    Backends implement every method; one that misses a method cannot be
+    instantiated.
+    """
+
+    @abstractmethod
+    async def get_persona(self, persona_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def list_personas(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def save_persona(self, persona_data: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def get_post(self, post_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def list_posts(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def save_post(self, post_data: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def save_posts(self, posts: List[Dict[str, Any]]) -> None: ...
+
+    @abstractmethod
+    async def get_post_request(self, post_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def save_job(self, job_data: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def update_job(self, job_id: str, updates: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def claim_job(
+        self, job_id: str, worker_id: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def list_unfinished_jobs(self, limit: int = 100) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def claim_idempotency_key(
+        self, record_id: str, fingerprint: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def complete_idempotency_key(
+        self, record_id: str, response: Dict[str, Any], ttl_seconds: float
+    ) -> None: ...
+
+    @abstractmethod
+    async def release_idempotency_key(self, record_id: str) -> None: ...
+
+
+class MemoryRepository(Repository):
+    """
+    Repository keeping every document in process memory.
+
+    Meant for tests, benchmarks and load tests without a Firebase project.
+    Firestore sentinels such as SERVER_TIMESTAMP are replaced by the current
+    UTC time when a document is written, as the Firestore server would do.
+    All operations go through a few storage primitives, which subclasses
+    override to keep the documents elsewhere.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return fn(*args)
+
+    # Storage primitives
+
+    def _get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        document = self._collections.get(collection, {}).get(doc_id)
+        return deepcopy(document) if document is not None else None
+
+    def _put(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        stored = self._collections.setdefault(collection, {})
+        for document in documents:
+            stored[document["id"]] = self._resolve(document)
+
+    def _delete(self, collection: str, doc_id: str) -> None:
+        self._collections.get(collection, {}).pop(doc_id, None)
+
+    def _modify(self, collection: str, doc_id: str, fn: Modifier) -> Any:
+        document, result = fn(self._get(collection, doc_id))
+        if document is not None:
+            self._put(collection, [document])
+        return result
+
+    def _query(
+        self,
+        collection: str,
+        user_id: Optional[str],
+        limit: int,
+        start_after: Optional[Position],
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        matches = []
+        for doc_id, document in self._collections.get(collection, {}).items():
+            created_at = as_utc(document.get("created_at"))
+            if created_at is None:
+                continue
+            if user_id and document.get("user_id") != user_id:
+                continue
+            if start_after is not None and not is_after(
+                (created_at, doc_id), start_after
+            ):
+                continue
+            matches.append((created_at, doc_id, document))
+
+        matches.sort(key=lambda match: match[:2], reverse=True)
+        return [
+            deepcopy(select(document, fields)) for _, _, document in matches[:limit]
+        ]
+
+    def _where_in(
+        self, collection: str, field: str, values: List[Any], limit: int
+    ) -> List[Dict[str, Any]]:
+        documents = self._collections.get(collection, {}).values()
+        matches = [document for document in documents if document.get(field) in values]
+        return deepcopy(matches[:limit])
+
+    @staticmethod
+    def _resolve(document: Dict[str, Any]) -> Dict[str, Any]:
+        document = deepcopy(document)
+        for key, value in document.items():
+            if isinstance(value, Sentinel):
+                document[key] = datetime.now(timezone.utc)
+        return document
+
+    async def _list(
+        self,
+        collection: str,
+        user_id: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        start_after = None
+        if cursor:
+            created_at, doc_id = decode_cursor(cursor)
+            start_after = (as_utc(created_at), doc_id)
+        return await self._call(
+            self._query, collection, user_id, limit, start_after, fields
+        )
+
+    # Personas and posts
+
+    async def get_persona(self, persona_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self._get, PERSONAS_COLLECTION, persona_id)
+
+    async def list_personas(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._list(PERSONAS_COLLECTION, user_id, limit, cursor, fields)
+
+    async def save_persona(self, persona_data: Dict[str, Any]) -> None:
+        await self._call(self._put, PERSONAS_COLLECTION, [persona_data])
+
+    async def get_post(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self._get, POSTS_COLLECTION, post_id)
+
+    async def list_posts(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._list(POSTS_COLLECTION, user_id, limit, cursor, fields)
+
+    async def save_post(self, post_data: Dict[str, Any]) -> None:
+        await self.save_posts([post_data])
+
+    async def save_posts(self, posts: List[Dict[str, Any]]) -> None:
+        if not posts:
+            return
+
+        split = [split_raw_request(post_data) for post_data in posts]
+        audits = [audit for _, audit in split if audit is not None]
+        if audits:
+            await self._call(self._put, POST_AUDIT_COLLECTION, audits)
+        await self._call(self._put, POSTS_COLLECTION, [post for post, _ in split])
+
+    async def get_post_request(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self._get, POST_AUDIT_COLLECTION, post_id)
+
+    # Persona jobs
+
+    async def save_job(self, job_data: Dict[str, Any]) -> None:
+        await self._call(self._put, JOBS_COLLECTION, [job_data])
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self._get, JOBS_COLLECTION, job_id)
+
+    async def update_job(self, job_id: str, updates: Dict[str, Any]) -> None:
+        def update(job):
+            if job is None:
+                raise LookupError(f"Persona job {job_id} does not exist")
+            return {**job, **updates}, None
+
+        await self._call(self._modify, JOBS_COLLECTION, job_id, update)
+
+    async def claim_job(
+        self, job_id: str, worker_id: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        def claim(job):
+            if job is None:
+                return None, None
+            updates = job_claim_updates(job, worker_id, lease_seconds, time.time())
+            if updates is None:
+                return None, None
+            claimed = {**job, **updates}
+            return claimed, claimed
+
+        return await self._call(self._modify, JOBS_COLLECTION, job_id, claim)
+
+    async def list_unfinished_jobs(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._call(
+            self._where_in, JOBS_COLLECTION, "status", [JOB_QUEUED, JOB_RUNNING], limit
+        )
+
+    # Idempotency keys
+
+    async def claim_idempotency_key(
+        self, record_id: str, fingerprint: str, lease_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        def claim(record):
+            now = time.time()
+            if record is not None and (record.get("expires_at") or 0) > now:
+                return None, record
+            return idempotency_record(record_id, fingerprint, lease_seconds, now), None
+
+        return await self._call(self._modify, IDEMPOTENCY_COLLECTION, record_id, claim)
+
+    async def complete_idempotency_key(
+        self, record_id: str, response: Dict[str, Any], ttl_seconds: float
+    ) -> None:
+        def complete(record):
+            if record is None:
+                raise LookupError(f"Idempotency key {record_id} does not exist")
+            updates = {
+                "status": IDEMPOTENCY_COMPLETED,
+                "response": response,
+                "expires_at": time.time() + ttl_seconds,
+            }
+            return {**record, **updates}, None
+
+        await self._call(self._modify, IDEMPOTENCY_COLLECTION, record_id, complete)
+
+    async def release_idempotency_key(self, record_id: str) -> None:
+        await self._call(self._delete, IDEMPOTENCY_COLLECTION, record_id)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+class SQLiteRepository(MemoryRepository):
+    """
+    Repository keeping documents in a SQLite file.
+
+    Documents survive restarts and can be shared by several worker processes
+    on one machine. Operations run in worker threads with a connection each,
+    and read-modify-write operations such as claims run in an immediate
+    transaction, so they are atomic across processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORAGE_PATH):
+        super().__init__()
+        self.path = path
+        self._initialized = False
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    user_id TEXT,
+                    created_at REAL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS documents_by_user
+                ON documents (collection, user_id, created_at)
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS documents_by_time
+                ON documents (collection, created_at)
+                """
+            )
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def _row(collection: str, document: Dict[str, Any]) -> Tuple[Any, ...]:
+        created_at = as_utc(document.get("created_at"))
+        user_id = document.get("user_id")
+        return (
+            collection,
+            document["id"],
+            user_id if isinstance(user_id, str) else None,
+            created_at.timestamp() if created_at is not None else None,
+            json.dumps(document, default=_encode_value),
+        )
+
+    @staticmethod
+    def _load(data: str) -> Dict[str, Any]:
+        return json.loads(data, object_hook=_decode_object)
+
+    def _get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND id = ?",
+                (collection, doc_id),
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._load(row[0]) if row is not None else None
+
+    def _put(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        rows = [
+            self._row(collection, self._resolve(document)) for document in documents
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)", rows
+                )
+        finally:
+            conn.close()
+
+    def _delete(self, collection: str, doc_id: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM documents WHERE collection = ? AND id = ?",
+                (collection, doc_id),
+            )
+        finally:
+            conn.close()
+
+    def _modify(self, collection: str, doc_id: str, fn: Modifier) -> Any:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT data FROM documents WHERE collection = ? AND id = ?",
+                    (collection, doc_id),
+                ).fetchone()
+                document, result = fn(self._load(row[0]) if row is not None else None)
+                if document is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                        self._row(collection, self._resolve(document)),
+                    )
+        finally:
+            conn.close()
+        return result
+
+    def _query(
+        self,
+        collection: str,
+        user_id: Optional[str],
+        limit: int,
+        start_after: Optional[Position],
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT data FROM documents WHERE collection = ? AND created_at IS NOT NULL"
+        )
+        params: List[Any] = [collection]
+        if user_id:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        if start_after is not None:
+            created_at, doc_id = start_after
+            if doc_id is None:
+                sql += " AND created_at < ?"
+                params.append(created_at.timestamp())
+            else:
+                sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+                params.extend([created_at.timestamp(), created_at.timestamp(), doc_id])
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [select(self._load(row[0]), fields) for row in rows]
+
+    def _where_in(
+        self, collection: str, field: str, values: List[Any], limit: int
+    ) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in values)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT data FROM documents WHERE collection = ? "
+                f"AND json_extract(data, ?) IN ({placeholders}) LIMIT ?",
+                (collection, f"$.{field}", *values, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._load(row[0]) for row in rows]
+
+
+@Repository.register
+class InstrumentedRepository:
+    """
+    Wraps a repository to time its operations and count their errors.
+
+    Each public method of the wrapped repository is reported under its own
+    name in the storage_operation_* metrics, labelled with the backend, and
+    as a "storage.<operation>" span of sampled traces. With a bulkhead, each
+    operation first waits for one of its slots; time spent waiting is not
+    counted as storage time.
+    """
+
+    def __init__(
+        self, repository: Repository, backend: str, bulkhead: Optional[Bulkhead] = None
+    ):
+        self.repository = repository
+        self.backend = backend
+        self.bulkhead = bulkhead
+        for name in Repository.__abstractmethods__:
+            setattr(self, name, self._instrument(name))
+
+    def _instrument(self, operation: str) -> Callable[..., Any]:
+        method = getattr(self.repository, operation)
+        duration = STORAGE_OPERATION_DURATION.labels(self.backend, operation)
+        errors = STORAGE_OPERATION_ERRORS.labels(self.backend, operation)
+
+        @wraps(method)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            if self.bulkhead is not None:
+                await self.bulkhead.acquire()
+            start = time.perf_counter()
+            try:
+                with span(f"storage.{operation}", **{"db.system": self.backend}):
+                    return await method(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - start)
+                if self.bulkhead is not None:
+                    self.bulkhead.release()
+
+        return call
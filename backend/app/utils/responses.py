@@ -0,0 +1,193 @@
+"""Fast JSON serialization and conditional GET responses."""
+
+import hashlib
+from typing import Any, Dict, Optional, Type
+
+import orjson
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+
+ETAG_HEADER = "ETag"
+
+
+def _default(value: Any) -> Any:
+    # Types orjson does not know natively, e.g. Pydantic models
+    return jsonable_encoder(value)
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Serialize content to compact JSON bytes with orjson.
+
+    Args:
+        content: JSON serializable content
+
+    Returns:
+        bytes: The encoded content
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def get_response_class() -> Type[JSONResponse]:
+    """
+    Return the default response class of the application.
+
+    Returns:
+        Type[JSONResponse]: FastJSONResponse if FAST_JSON_RESPONSES is set
+    """
+    return FastJSONResponse if get_settings().fast_json_responses else JSONResponse
+
+
+def project(document: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Keep only the fields a response model declares.
+
+    Missing optional fields get their defaults, as validation would add them.
+
+    Args:
+        document: A stored document
+        model: The response model of the route
+
+    Returns:
+        Dict[str, Any]: The document restricted to the model fields
+    """
+    projected = {}
+    for name, field in model.model_fields.items():
+        if name in document:
+            projected[name] = document[name]
+        elif not field.is_required():
+            projected[name] = field.get_default(call_default_factory=True)
+    return projected
+
+
+def trusted_response(
+    content: Any,
+    response: Optional[Response] = None,
+    model: Optional[Type[BaseModel]] = None,
+) -> Any:
+    """
+    Send stored documents without response_model re-validation.
+
+    Unless FAST_JSON_RESPONSES is set the content is returned unchanged, so
+    FastAPI validates and encodes it as usual. Otherwise the content is
+    projected onto the model fields and rendered with orjson directly.
+
+    Args:
+        content: A document or a list of documents
+        response: The route's Response parameter, whose headers are kept
+        model: Response model of a single document
+
+    Returns:
+        Any: The content, or a FastJSONResponse
+    """
+    if not get_settings().fast_json_responses:
+        return content
+
+    if model is not None:
+        if isinstance(content, list):
+            content = [project(document, model) for document in content]
+        else:
+            content = project(content, model)
+
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, headers=headers)
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Compute a strong entity tag for a response body.
+
+    Args:
+        body: The encoded response body
+
+    Returns:
+        str: The quoted tag, e.g. '"9f86d081884c7d65..."'
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against the current entity tag.
+
+    Uses the weak comparison the header calls for, so a W/ prefix added by a
+    proxy still matches.
+
+    Args:
+        if_none_match: Value of the If-None-Match header, if any
+        etag: Current entity tag of the resource
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    cache_control: str,
+    etag: Optional[str] = None,
+) -> Response:
+    """
+    Send a JSON body, or 304 Not Modified if the client already has it.
+
+    Args:
+        request: The incoming request, for its If-None-Match header
+        body: The encoded JSON body
+        cache_control: Value of the Cache-Control header
+        etag: Entity tag of the body, computed from it if not given
+
+    Returns:
+        Response: The body with ETag and Cache-Control, or a bodyless 304
+    """
+    headers = {ETAG_HEADER: etag or compute_etag(body), "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), headers[ETAG_HEADER]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cacheable_response(
+    request: Request,
+    content: Any,
+    cache_control: str,
+    model: Optional[Type[BaseModel]] = None,
+) -> Response:
+    """
+    Send a stored document with an ETag computed from its content.
+
+    The document is serialized here rather than by FastAPI so the tag can be
+    derived from the exact bytes sent. With a model it is validated against
+    the model, or only projected onto it if FAST_JSON_RESPONSES is set.
+
+    Args:
+        request: The incoming request, for its If-None-Match header
+        content: The stored document
+        cache_control: Value of the Cache-Control header
+        model: Response model of the route, if any
+
+    Returns:
+        Response: The document, or a bodyless 304 if the client has it
+    """
+    if model is not None:
+        if get_settings().fast_json_responses:
+            content = project(content, model)
+        else:
+            content = model.model_validate(content).model_dump(mode="json")
+    return conditional_response(request, dump_json(content), cache_control)
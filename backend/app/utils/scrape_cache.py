@@ -0,0 +1,195 @@
+"""Disk-backed cache for blog analysis results."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.core.config import get_settings
+
+DEFAULT_CACHE_PATH = ".cache/blog_analysis.sqlite3"
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a blog URL so equivalent spellings share one cache entry.
+
+    The scheme and host are lower-cased, default ports, fragments and
+    trailing slashes are dropped and query parameters are sorted.
+
+    Args:
+        url: The URL as entered by the user
+
+    Returns:
+        str: The normalized URL
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def cache_key(url: str, version: str) -> str:
+    """
+    Build the content address of an analysis.
+
+    Args:
+        url: Blog URL, normalized or not
+        version: Version of the extraction schema and prompt
+
+    Returns:
+        str: Hex digest identifying the analysis
+    """
+    material = f"{normalize_url(url)}\n{version}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class BlogAnalysisCache:
+    """
+    SQLite-backed cache of blog analysis results.
+
+    A connection is opened per operation, so the cache can be used from worker
+    threads and shared by several processes through the same database file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blog_analysis (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, url: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a fresh cached analysis for the URL.
+
+        Args:
+            url: Blog URL
+            version: Version of the extraction schema and prompt
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached analysis, or None
+        """
+        if not self.enabled:
+            return None
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT data, created_at FROM blog_analysis WHERE key = ?",
+                (cache_key(url, version),),
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None or row[1] + self.ttl <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, url: str, version: str, data: Dict[str, Any]) -> None:
+        """
+        Store an analysis, replacing any previous one for the same key.
+
+        Args:
+            url: Blog URL
+            version: Version of the extraction schema and prompt
+            data: The analysis result
+        """
+        if not self.enabled:
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO blog_analysis VALUES (?, ?, ?, ?, ?)",
+                (
+                    cache_key(url, version),
+                    normalize_url(url),
+                    version,
+                    json.dumps(data),
+                    time.time(),
+                ),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters of this process.
+
+        Returns:
+            Dict[str, Any]: Cache statistics
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def purge_expired(self) -> int:
+        """
+        Delete entries older than the TTL.
+
+        Returns:
+            int: Number of deleted entries
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM blog_analysis WHERE created_at <= ?",
+                (time.time() - self.ttl,),
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+blog_analysis_cache = BlogAnalysisCache(
+    path=get_settings().blog_cache_path,
+    ttl=get_settings().blog_cache_ttl,
+)
@@ -0,0 +1,104 @@
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(namespace: str, payload: Any) -> str:
+    """
+    Build a canonical key for a request body.
+
+    Args:
+        namespace: Kind of request, so different endpoints never share keys
+        payload: JSON serializable request body
+
+    Returns:
+        str: Hex digest that is equal for equal bodies, whatever the key order
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{namespace}:{canonical}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Share one execution between concurrent calls with the same key.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight wait for the same task and receive the same result
+    or exception. The task is shielded, so a caller that disconnects does
+    not cancel the call for the others. Results are shared and must be
+    treated as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn, or join the in-flight call with the same key.
+
+        Args:
+            key: Request key, usually from request_key
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            T: The result of the shared call
+        """
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: str, fn: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        """
+        Start fn in the background, or return the in-flight call with the key.
+
+        Callers of do() with the same key join the call until it finishes.
+
+        Args:
+            key: Request key, usually from request_key
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            asyncio.Task: The shared call
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def is_running(self, key: str) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return execution and coalescing counters.
+
+        Returns:
+            Dict[str, int]: Counters of this flight group
+        """
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
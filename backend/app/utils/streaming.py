@@ -0,0 +1,73 @@
+"""Incremental parsing of streamed webhook responses."""
+
+import json
+import re
+from typing import List
+
+_ARRAY_START = re.compile(r'"post_suggestions"\s*:\s*\[')
+
+
+class SuggestionStreamParser:
+    """
+    Extract "post_suggestions" strings from a JSON body as it arrives.
+
+    Feed the body chunk by chunk; every call returns the suggestions that
+    were completed by that chunk. Only arrays of strings are understood; any
+    other element makes the parser stop, and callers should then fall back to
+    parsing the complete body.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_array = False
+        self._in_string = False
+        self._escaped = False
+        self._current: List[str] = []
+        self.done = False
+        self.failed = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Consume a chunk of the response body.
+
+        Args:
+            chunk: Next piece of the body
+
+        Returns:
+            List[str]: Suggestions completed by this chunk
+        """
+        if self.done:
+            return []
+
+        if not self._in_array:
+            self._buffer += chunk
+            match = _ARRAY_START.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            chunk = self._buffer[match.end() :]
+            self._buffer = ""
+
+        completed = []
+        for char in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    completed.append(json.loads('"' + "".join(self._current) + '"'))
+                    self._current = []
+                    continue
+                self._current.append(char)
+            elif char == '"':
+                self._in_string = True
+            elif char == "]":
+                self.done = True
+                break
+            elif not (char.isspace() or char == ","):
+                self.done = True
+                self.failed = True
+                break
+        return completed
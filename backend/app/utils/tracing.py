@@ -0,0 +1,422 @@
+"""Lightweight span tracing with OTLP-JSON export."""
+
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.core.config import get_settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACEPARENT_HEADER = "traceparent"
+SERVICE_NAME = "segmint-backend"
+
+# Span kinds and status codes of the OTLP data model
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """Spans of one trace, exported together when the root span ends."""
+
+    def __init__(self, trace_id: str, exporter: "OTLPJSONExporter"):
+        self.trace_id = trace_id
+        self.exporter = exporter
+        self.finished: List["Span"] = []
+        self.exported = False
+
+
+class Span:
+    """
+    A timed operation within a sampled trace.
+
+    Only sampled requests create spans; elsewhere span() yields None and
+    costs a context variable lookup.
+    """
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent_span_id: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ""
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def traceparent(self) -> str:
+        """Return the W3C traceparent header value for calls made in this span."""
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def end(self) -> None:
+        self.end_time = time.time_ns()
+        trace = self.trace
+        if trace.exported:
+            # Finished after its root, e.g. work shared with another request
+            trace.exporter.export([self])
+        else:
+            trace.finished.append(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or self.start_time),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            "status": {"code": self.status},
+        }
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class OTLPJSONExporter:
+    """
+    Writes finished traces as OTLP-JSON, one ExportTraceServiceRequest per line.
+
+    The destination is "stdout" or a file path that is appended to, so the
+    output can be inspected offline or replayed into a collector. Lines are
+    written by a background thread, so ending a span never waits on I/O;
+    flush() waits until everything exported so far is written.
+    """
+
+    def __init__(self, destination: str = "stdout"):
+        self.destination = destination
+        self._lock = threading.Lock()
+        self._lines: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Span]) -> None:
+        if not spans:
+            return
+
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {
+                                    "key": "service.name",
+                                    "value": {"stringValue": SERVICE_NAME},
+                                }
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "app.utils.tracing"},
+                                "spans": [span.to_otlp() for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            default=str,
+        )
+        self._lines.put(line)
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_lines, name="trace-export", daemon=True
+                )
+                self._writer.start()
+
+    def flush(self) -> None:
+        """Wait until every exported trace is written."""
+        self._lines.join()
+
+    def _write_lines(self) -> None:
+        while True:
+            # Write whatever is queued at once, opening the file once
+            lines = [self._lines.get()]
+            while True:
+                try:
+                    lines.append(self._lines.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write("".join(line + "\n" for line in lines))
+            except Exception as e:
+                print(f"Failed to export {len(lines)} traces: {str(e)}")
+            finally:
+                for _ in lines:
+                    self._lines.task_done()
+
+    def _write(self, text: str) -> None:
+        if self.destination == "stdout":
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            return
+
+        directory = os.path.dirname(self.destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.destination, "a", encoding="utf-8") as output:
+            output.write(text)
+
+
+class Tracer:
+    """
+    Starts traces for a sampled share of requests and background jobs.
+
+    A trace is sampled with probability sample_rate and joins the trace of
+    an incoming traceparent header. The caller's sampling decision is only
+    followed with trust_parent, since clients could otherwise have every
+    request they send traced.
+    """
+
+    def __init__(
+        self,
+        exporter: OTLPJSONExporter,
+        sample_rate: float = 0.0,
+        trust_parent: bool = False,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.trust_parent = trust_parent
+        self._random = random.Random()
+
+    def _sampled(self, traceparent: Optional[str]) -> tuple:
+        trace_id, parent_span_id = secrets.token_hex(16), None
+        match = _TRACEPARENT_PATTERN.match(traceparent or "")
+        if match:
+            trace_id, parent_span_id, flags = match.groups()
+            if self.trust_parent:
+                return int(flags, 16) & 1 == 1, trace_id, parent_span_id
+        sampled = self.sample_rate > 0 and self._random.random() < self.sample_rate
+        return sampled, trace_id, parent_span_id
+
+    @contextmanager
+    def trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes: Any,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Run a block as the root span of a new trace, if it is sampled.
+
+        Args:
+            name: Name of the root span
+            traceparent: Incoming W3C traceparent header, if any
+            kind: OTLP span kind of the root span
+            attributes: Attributes of the root span
+
+        Yields:
+            Optional[Span]: The root span, or None if the trace is not sampled
+        """
+        sampled, trace_id, parent_span_id = self._sampled(traceparent)
+        if not sampled:
+            token = _current_span.set(None)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        root = Span(
+            Trace(trace_id, self.exporter), name, parent_span_id, kind, attributes
+        )
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            root.trace.exported = True
+            self.exporter.export(root.trace.finished)
+
+
+@contextmanager
+def span(
+    name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any
+) -> Iterator[Optional[Span]]:
+    """
+    Run a block as a child of the current span, when the trace is sampled.
+
+    Exceptions leaving the block mark the span as failed and propagate.
+
+    Args:
+        name: Name of the span, e.g. "post.webhook"
+        kind: OTLP span kind
+        attributes: Attributes of the span
+
+    Yields:
+        Optional[Span]: The span, or None outside a sampled trace
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def current_span() -> Optional[Span]:
+    """Return the active span, or None outside a sampled trace."""
+    return _current_span.get()
+
+
+def get_request_id() -> Optional[str]:
+    """Return the ID of the request being handled, if any."""
+    return _request_id.get()
+
+
+def propagation_headers() -> Dict[str, str]:
+    """
+    Return the headers that carry the request ID and trace context upstream.
+
+    Returns:
+        Dict[str, str]: X-Request-ID and, inside a sampled trace, traceparent
+    """
+    headers = {}
+    request_id = _request_id.get()
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    active = _current_span.get()
+    if active is not None:
+        headers[TRACEPARENT_HEADER] = active.traceparent()
+    return headers
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware assigning request IDs and tracing sampled requests.
+
+    The X-Request-ID header of the request is reused when it is well formed
+    and a new ID is generated otherwise; either way it is returned in the
+    response and forwarded to the webhooks.
+    """
+
+    def __init__(self, app: Callable, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        request_id = headers.get(REQUEST_ID_HEADER.lower(), "")
+        if not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = secrets.token_hex(16)
+        token = _request_id.set(request_id)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode()),
+                ]
+                if root is not None:
+                    root.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        tracer = self.tracer or get_tracer()
+        try:
+            with tracer.trace(
+                f"{scope['method']} {scope['path']}",
+                traceparent=headers.get(TRACEPARENT_HEADER),
+                kind=SPAN_KIND_SERVER,
+                **{"http.method": scope["method"], "request.id": request_id},
+            ) as root:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = getattr(scope.get("route"), "path", None)
+                    if root is not None and route:
+                        root.name = f"{scope['method']} {route}"
+                        root.set_attribute("http.route", route)
+        finally:
+            _request_id.reset(token)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Return the tracer configured by the TRACE_* settings.
+
+    Returns:
+        Tracer: The process-wide tracer
+    """
+    global _tracer
+
+    if _tracer is None:
+        settings = get_settings()
+        _tracer = Tracer(
+            OTLPJSONExporter(settings.trace_export),
+            sample_rate=settings.trace_sample_rate,
+            trust_parent=settings.trace_trust_parent,
+        )
+    return _tracer
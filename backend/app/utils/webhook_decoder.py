@@ -0,0 +1,296 @@
+"""Tolerant decoding of the JSON returned by the Make.com webhooks."""
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+from app.models.persona import PersonaWebhookOutput
+from app.models.post import PostWebhookOutput
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Give up repairing a truncated body after dropping this many trailing values
+MAX_REPAIR_ATTEMPTS = 16
+
+
+class WebhookDecodeError(ValueError):
+    """Raised when a webhook response holds no usable JSON payload."""
+
+
+def loads(text: str) -> Any:
+    """
+    Parse JSON with orjson.
+
+    Args:
+        text: JSON document
+
+    Returns:
+        Any: The decoded value
+    """
+    return orjson.loads(text)
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[str], bool, List[int]]:
+    """
+    Walk a JSON value from its opening bracket.
+
+    Returns the end of the value (None if the text ends first), the closers
+    still open, whether the text ends inside a string, and the positions of
+    commas and opening brackets outside strings.
+    """
+    stack: List[str] = []
+    separators: List[int] = []
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            separators.append(index)
+        elif char in "}]":
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                return index + 1, [], False, separators
+        elif char == ",":
+            separators.append(index)
+    return None, stack, in_string, separators
+
+
+def _next_start(text: str, position: int) -> int:
+    """Return the index of the next "{" or "[" at or after position, or -1."""
+    starts = [
+        index
+        for index in (text.find("{", position), text.find("[", position))
+        if index != -1
+    ]
+    return min(starts) if starts else -1
+
+
+def strip_trailing_commas(text: str) -> str:
+    """
+    Remove commas directly followed by a closing bracket.
+
+    Args:
+        text: JSON text, possibly with trailing commas
+
+    Returns:
+        str: The text without trailing commas
+    """
+    out: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "}]":
+            end = len(out)
+            while end and out[end - 1].isspace():
+                end -= 1
+            if end and out[end - 1] == ",":
+                del out[end - 1]
+        out.append(char)
+    return "".join(out)
+
+
+def _drop_last_member(fragment: str, separators: List[int]) -> str:
+    """Cut a fragment back to the comma or bracket before its last member."""
+    last = separators[-1]
+    return fragment[: last + 1] if fragment[last] in _CLOSERS else fragment[:last]
+
+
+def _close(fragment: str) -> str:
+    """Close the brackets left open by a truncated fragment."""
+    _, _, in_string, separators = _scan(fragment, 0)
+    # A cut-off string or a key without its value is dropped, not completed
+    if in_string or fragment.rstrip().endswith(":"):
+        fragment = _drop_last_member(fragment, separators)
+    fragment = fragment.rstrip()
+    if fragment.endswith(","):
+        fragment = fragment[:-1]
+    _, stack, _, _ = _scan(fragment, 0)
+    return fragment + "".join(reversed(stack))
+
+
+def _repair(fragment: str) -> Any:
+    """Decode a value cut off before its end, dropping broken trailing items."""
+    for _ in range(MAX_REPAIR_ATTEMPTS):
+        try:
+            return loads(strip_trailing_commas(_close(fragment)))
+        except ValueError:
+            pass
+        _, _, _, separators = _scan(fragment, 0)
+        commas = [index for index in separators if fragment[index] == ","]
+        if not commas:
+            break
+        fragment = fragment[: commas[-1]]
+    raise WebhookDecodeError("Webhook response JSON is truncated beyond repair")
+
+
+def iter_json(text: str) -> Iterator[Any]:
+    """
+    Yield the JSON values a webhook response may hold, in order.
+
+    The whole body comes first. Otherwise each object or array in the body
+    is decoded in turn, skipping Markdown fences and any surrounding prose,
+    with trailing commas and truncation at the end of the body repaired.
+
+    Args:
+        text: Raw response body
+
+    Yields:
+        Any: Each decoded value
+
+    Raises:
+        WebhookDecodeError: If no JSON value can be recovered
+    """
+    stripped = text.strip()
+    try:
+        yield loads(stripped)
+        return
+    except ValueError:
+        pass
+
+    start = _next_start(text, 0)
+    if start == -1:
+        raise WebhookDecodeError("Webhook response contains no JSON")
+
+    # Bracketed prose such as "[Note]" does not decode and is skipped
+    found = False
+    error = "no JSON value found"
+    for _ in range(MAX_REPAIR_ATTEMPTS):
+        end, _, _, _ = _scan(text, start)
+        if end is None:
+            yield _repair(text[start:])
+            return
+
+        fragment = text[start:end]
+        try:
+            value = loads(strip_trailing_commas(fragment))
+        except ValueError as e:
+            error = str(e)
+        else:
+            found = True
+            yield value
+
+        start = _next_start(text, end)
+        if start == -1:
+            break
+    if not found:
+        raise WebhookDecodeError(f"Invalid JSON in webhook response: {error}")
+
+
+def decode_json(text: str) -> Any:
+    """
+    Find and decode the JSON payload of a webhook response.
+
+    Returns the first value found by iter_json().
+
+    Args:
+        text: Raw response body
+
+    Returns:
+        Any: The decoded value
+
+    Raises:
+        WebhookDecodeError: If no JSON value can be recovered
+    """
+    return next(iter_json(text))
+
+
+def _validate(data: Any, schema: Type[ModelT]) -> ModelT:
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise WebhookDecodeError(f"Unexpected webhook response: {str(e)}")
+
+
+def decode_webhook_response(
+    text: str,
+    schema: Type[ModelT],
+    prepare: Optional[Callable[[Any], Any]] = None,
+) -> ModelT:
+    """
+    Decode a webhook response and validate it against a schema.
+
+    Every schema field has a default, so only objects holding at least one
+    of the fields are candidates; prose around the payload may hold JSON of
+    its own, such as "[1]" or {"ref": 1}. The first candidate that
+    validates is returned.
+
+    Args:
+        text: Raw response body
+        schema: Pydantic model describing the expected output
+        prepare: Adjusts each decoded value before validation
+
+    Returns:
+        ModelT: The validated output
+
+    Raises:
+        WebhookDecodeError: If the body cannot be decoded or validated
+    """
+    error: Optional[WebhookDecodeError] = None
+    for data in iter_json(text):
+        if prepare is not None:
+            data = prepare(data)
+        if not isinstance(data, dict) or data.keys().isdisjoint(schema.model_fields):
+            continue
+        try:
+            return _validate(data, schema)
+        except WebhookDecodeError as e:
+            error = error or e
+    if error is not None:
+        raise error
+    fields = ", ".join(schema.model_fields)
+    raise WebhookDecodeError(f"Webhook response has none of the fields {fields}")
+
+
+def _suggestions_from_list(data: Any) -> Any:
+    return {"post_suggestions": data} if isinstance(data, list) else data
+
+
+def decode_post_output(text: str) -> PostWebhookOutput:
+    """
+    Decode the response of the post generation webhook.
+
+    A bare array is accepted as the list of suggestions.
+
+    Args:
+        text: Raw response body
+
+    Returns:
+        PostWebhookOutput: The generated suggestions
+    """
+    return decode_webhook_response(text, PostWebhookOutput, _suggestions_from_list)
+
+
+def decode_persona_output(text: str) -> PersonaWebhookOutput:
+    """
+    Decode the response of the persona generation webhook.
+
+    Args:
+        text: Raw response body
+
+    Returns:
+        PersonaWebhookOutput: The generated persona fields
+    """
+    return decode_webhook_response(text, PersonaWebhookOutput)
@@ -0,0 +1,217 @@
+"""Write-behind persistence of generated documents."""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.utils.db import save_posts
+
+
+class WriteBehindQueue:
+    """
+    Buffers documents in memory and stores them in batches.
+
+    Documents are flushed once batch_size of them are queued or
+    flush_interval seconds after the first one arrived, whichever comes
+    first. Queued documents stay readable through get(), and the time they
+    were queued through queued_at(), until they are written, and stop()
+    writes everything still pending. While the queue is not started, or when
+    it is full, enqueue() refuses documents so callers write them directly.
+
+    A batch that still fails after max_attempts is kept as dead letters:
+    its documents stay readable and are written again after the next batch
+    that succeeds, and on stop(). Up to max_pending dead letters are kept;
+    beyond that enqueue() refuses documents.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        batch_size: int = 100,
+        flush_interval: float = 0.1,
+        max_pending: int = 1000,
+        max_attempts: int = 3,
+        retry_delay: float = 0.5,
+    ):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._queued_at: Dict[str, datetime] = {}
+        self._dead_letters: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def dead_letters(self) -> int:
+        return len(self._dead_letters)
+
+    async def start(self) -> None:
+        """Start the background flusher."""
+        if self.started:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write every pending document."""
+        if not self.started:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+
+        # Includes a batch whose write was interrupted and the dead letters;
+        # writes are idempotent
+        documents = list(self._pending.values())
+        for start in range(0, len(documents), self.batch_size):
+            await self._write(documents[start : start + self.batch_size])
+        if self._dead_letters:
+            ids = ", ".join(self._dead_letters)
+            print(f"Lost {self.dead_letters} documents at shutdown: {ids}")
+
+    def enqueue(self, document: Dict[str, Any]) -> bool:
+        """
+        Queue a document for writing.
+
+        Args:
+            document: The document, including its "id" key
+
+        Returns:
+            bool: False if the caller has to write the document itself
+        """
+        if not self.started or self.dead_letters >= self.max_pending:
+            return False
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            return False
+        self._pending[document["id"]] = document
+        self._queued_at[document["id"]] = datetime.now()
+        return True
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a queued document that is not written yet.
+
+        Args:
+            doc_id: The ID of the document
+
+        Returns:
+            Optional[Dict[str, Any]]: The document, or None
+        """
+        return self._pending.get(doc_id)
+
+    def queued_at(self, doc_id: str) -> Optional[datetime]:
+        """
+        Return when a document that is not written yet was queued.
+
+        Args:
+            doc_id: The ID of the document
+
+        Returns:
+            Optional[datetime]: The time it was queued, or None
+        """
+        return self._queued_at.get(doc_id)
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                async with asyncio.timeout_at(loop.time() + self.flush_interval):
+                    while len(batch) < self.batch_size:
+                        batch.append(await self._queue.get())
+            except TimeoutError:
+                pass
+            if await self._write(batch):
+                await self._retry_dead_letters()
+
+    async def _retry_dead_letters(self) -> None:
+        """Write the dead letters again, stopping at the first failed batch."""
+        documents = list(self._dead_letters.values())
+        for start in range(0, len(documents), self.batch_size):
+            if not await self._write(documents[start : start + self.batch_size]):
+                return
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        """
+        Write a batch, retrying failures, and release what was written.
+
+        Args:
+            batch: The documents to write
+
+        Returns:
+            bool: False if the batch was kept as dead letters
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.flush(batch)
+                self.written += len(batch)
+                break
+            except Exception as e:
+                print(
+                    f"Failed to write {len(batch)} documents "
+                    f"(attempt {attempt} of {self.max_attempts}): {str(e)}"
+                )
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(self.retry_delay * attempt)
+        else:
+            self.batches += 1
+            for document in batch:
+                if document["id"] not in self._dead_letters:
+                    self.failed += 1
+                self._dead_letters[document["id"]] = document
+            ids = ", ".join(document["id"] for document in batch)
+            print(f"Keeping documents as dead letters after retries: {ids}")
+            return False
+
+        self.batches += 1
+        for document in batch:
+            if self._dead_letters.get(document["id"]) is document:
+                del self._dead_letters[document["id"]]
+            if self._pending.get(document["id"]) is document:
+                del self._pending[document["id"]]
+                self._queued_at.pop(document["id"], None)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return write counters.
+
+        Returns:
+            Dict[str, int]: Counters of this queue
+        """
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "failed": self.failed,
+            "dead_letters": self.dead_letters,
+            "batches": self.batches,
+        }
+
+
+post_writes = WriteBehindQueue(
+    save_posts,
+    batch_size=get_settings().post_write_batch_size,
+    flush_interval=get_settings().post_write_flush_interval,
+    max_pending=get_settings().post_write_queue_size,
+)
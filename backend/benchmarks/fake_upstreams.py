@@ -0,0 +1,189 @@
+"""
+Local stand-ins for the Make.com webhooks and the Firecrawl API.
+
+Serves the post and persona generation webhooks and the Firecrawl extract
+endpoints with configurable latency, error rate and payload size, so the
+backend can be load tested without network access or API costs.
+
+Run from the backend directory:
+
+    python -m benchmarks.fake_upstreams --port 9100 --webhook-latency lognormal:800,0.4
+
+Latency specs are "fixed:MS", "uniform:LOW_MS,HIGH_MS",
+"exponential:MEAN_MS" or "lognormal:MEDIAN_MS,SIGMA".
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+POST_WEBHOOK_PATH = "/webhook/post"
+PERSONA_WEBHOOK_PATH = "/webhook/persona"
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """
+    Build a latency sampler from a spec such as "lognormal:800,0.4".
+
+    Args:
+        spec: Distribution name and its parameters in milliseconds
+        rng: Random number generator to sample with
+
+    Returns:
+        Callable[[], float]: Function returning a latency in seconds
+    """
+    name, _, raw = spec.partition(":")
+    params = [float(value) for value in raw.split(",") if value]
+
+    if name == "fixed" and len(params) == 1:
+        return lambda: params[0] / 1000
+    if name == "uniform" and len(params) == 2:
+        return lambda: rng.uniform(params[0], params[1]) / 1000
+    if name == "exponential" and len(params) == 1:
+        return lambda: rng.expovariate(1 / params[0]) / 1000 if params[0] else 0.0
+    if name == "lognormal" and len(params) == 2:
+        mu = math.log(params[0])
+        return lambda: rng.lognormvariate(mu, params[1]) / 1000
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+@dataclass
+class UpstreamProfile:
+    """Behaviour of one fake upstream."""
+
+    latency: Callable[[], float]
+    error_rate: float = 0.0
+
+    async def respond(self, rng: random.Random) -> bool:
+        """Wait for the sampled latency and return False to simulate a failure."""
+        await asyncio.sleep(self.latency())
+        return rng.random() >= self.error_rate
+
+
+def create_app(
+    webhook: UpstreamProfile,
+    firecrawl: UpstreamProfile,
+    suggestion_length: int = 1200,
+    summary_length: int = 3000,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Create the fake upstream application.
+
+    Args:
+        webhook: Behaviour of both Make.com webhooks
+        firecrawl: Behaviour of the Firecrawl extract endpoint
+        suggestion_length: Characters per generated post suggestion
+        summary_length: Characters of the generated persona summary
+        seed: Seed of the error sampling
+
+    Returns:
+        FastAPI: The application
+    """
+    app = FastAPI(title="Fake upstreams")
+    rng = random.Random(seed)
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+
+    def text(length: int) -> str:
+        return (filler * (length // len(filler) + 1))[:length]
+
+    def failure() -> PlainTextResponse:
+        return PlainTextResponse("Simulated upstream failure", status_code=500)
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.post(POST_WEBHOOK_PATH)
+    async def post_webhook(request: Request) -> Any:
+        payload = await request.json()
+        if not await webhook.respond(rng):
+            return failure()
+
+        parameters = payload.get("request", {}).get("generation_parameters", {})
+        variations = parameters.get("variations") or 2
+        return {"post_suggestions": [text(suggestion_length)] * variations}
+
+    @app.post(PERSONA_WEBHOOK_PATH)
+    async def persona_webhook(request: Request) -> Any:
+        await request.body()
+        if not await webhook.respond(rng):
+            return failure()
+
+        return {
+            "goals": ["Thought Leadership", "Brand Awareness"],
+            "target_audience": "Engineering leaders",
+            "tone_of_voice": ["Professional"],
+            "key_topics": ["Software delivery"],
+            "values": ["Quality"],
+            "preferred_formats": ["Articles"],
+            "persona_summary": text(summary_length),
+        }
+
+    # Both SDK generations start an extract job and then poll its status
+    @app.post("/v1/extract")
+    @app.post("/v2/extract")
+    async def start_extract(request: Request) -> Any:
+        await request.body()
+        if not await firecrawl.respond(rng):
+            return JSONResponse(
+                {"success": False, "error": "Simulated upstream failure"},
+                status_code=500,
+            )
+        return {"success": True, "id": str(uuid.uuid4())}
+
+    @app.get("/v1/extract/{job_id}")
+    @app.get("/v2/extract/{job_id}")
+    async def extract_status(job_id: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "status": "completed",
+            "data": {
+                "writing_style": "Concise",
+                "tone_of_voice": "Friendly",
+                "values": ["Craft"],
+                "preferred_formats": ["Blog posts"],
+            },
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--webhook-latency", default="lognormal:800,0.4")
+    parser.add_argument("--webhook-error-rate", type=float, default=0.0)
+    parser.add_argument("--firecrawl-latency", default="lognormal:1500,0.5")
+    parser.add_argument("--firecrawl-error-rate", type=float, default=0.0)
+    parser.add_argument("--suggestion-length", type=int, default=1200)
+    parser.add_argument("--summary-length", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = create_app(
+        UpstreamProfile(
+            parse_latency(args.webhook_latency, rng), args.webhook_error_rate
+        ),
+        UpstreamProfile(
+            parse_latency(args.firecrawl_latency, rng), args.firecrawl_error_rate
+        ),
+        suggestion_length=args.suggestion_length,
+        summary_length=args.summary_length,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
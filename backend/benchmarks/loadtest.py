@@ -0,0 +1,486 @@
+"""
+End-to-end load test of the API at fixed request rates.
+
+Starts the fake upstreams and the real application under uvicorn, with the
+in-memory storage backend and every outbound call pointed at the fakes,
+seeds personas and posts, and then drives each scenario open-loop at a
+fixed request rate. Latencies are measured from the moment a request was
+scheduled, so a slow server is not hidden by a client that waits for it.
+
+Run from the backend directory:
+
+    python -m benchmarks.loadtest --duration 30 --output results.json
+    python -m benchmarks.loadtest --scenarios post:20,list_posts:200 \\
+        --baseline results.json
+
+Scenarios are post (POST /post), persona (POST /persona/create-persona),
+list_posts (GET /post) and list_personas (GET /persona), optionally with a
+per-scenario rate as NAME:RATE. The JSON report holds p50/p95/p99 latency,
+throughput and error counts per scenario, plus the commit it was run on.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fake_upstreams import PERSONA_WEBHOOK_PATH, POST_WEBHOOK_PATH
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+LOAD_TEST_USER = "loadtest@example.com"
+
+
+@dataclass
+class Scenario:
+    """One endpoint driven at a fixed rate."""
+
+    name: str
+    method: str
+    path: str
+    body: Optional[Callable[[int], Dict[str, Any]]] = None
+    params: Optional[Dict[str, Any]] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.method} {self.path}"
+
+
+def persona_answers(number: int, blog: bool) -> List[Dict[str, str]]:
+    """Build the question answers of persona request number."""
+    answers = [
+        {"question_id": "user_email", "question": "Email", "answer": LOAD_TEST_USER},
+        {"question_id": "current_role", "question": "Role", "answer": "CTO"},
+        {"question_id": "company_name", "question": "Company", "answer": "Acme"},
+        {
+            "question_id": "goals",
+            "question": "What are your goals?",
+            "answer": f"Thought leadership, request {number}",
+        },
+    ]
+    if blog:
+        answers.append(
+            {
+                "question_id": "blog_url",
+                "question": "Blog",
+                "answer": f"https://blog.example.com/{number}",
+            }
+        )
+    return answers
+
+
+def build_scenarios(persona_id: str, blog: bool) -> Dict[str, Scenario]:
+    """Build the available scenarios; request bodies differ per request."""
+    return {
+        "post": Scenario(
+            "post",
+            "POST",
+            "/post",
+            body=lambda number: {
+                "platform": "LinkedIn",
+                "content_type": "Post",
+                "tone": "Professional",
+                "persona_id": persona_id,
+                "core_message": f"We shipped release {number}",
+            },
+        ),
+        "persona": Scenario(
+            "persona",
+            "POST",
+            "/persona/create-persona",
+            body=lambda number: {
+                "user_email": LOAD_TEST_USER,
+                "initial_data": persona_answers(number, blog),
+            },
+        ),
+        "list_posts": Scenario(
+            "list_posts", "GET", "/post", params={"user_id": LOAD_TEST_USER}
+        ),
+        "list_personas": Scenario(
+            "list_personas", "GET", "/persona", params={"user_id": LOAD_TEST_USER}
+        ),
+    }
+
+
+def parse_scenarios(spec: str, default_rate: float) -> List[Tuple[str, float]]:
+    """Parse "post:20,list_posts" into scenario names and request rates."""
+    result = []
+    for item in spec.split(","):
+        name, _, rate = item.strip().partition(":")
+        result.append((name, float(rate) if rate else default_rate))
+    return result
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Return the nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(fraction * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def request_failed(response: httpx.Response) -> bool:
+    """Check a response for HTTP errors and errors reported in the body."""
+    if response.status_code >= 400:
+        return True
+    # Persona creation reports webhook and storage failures with status 200
+    if response.request.url.path.endswith("/create-persona"):
+        persona = response.json().get("persona")
+        return isinstance(persona, dict) and "error" in persona
+    return False
+
+
+async def send(
+    client: httpx.AsyncClient, scenario: Scenario, number: int
+) -> httpx.Response:
+    body = scenario.body(number) if scenario.body else None
+    return await client.request(
+        scenario.method, scenario.path, json=body, params=scenario.params
+    )
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    rate: float,
+    duration: float,
+    warmup: float,
+    counter: "itertools.count[int]",
+) -> Dict[str, Any]:
+    """
+    Send requests at a fixed rate and summarize the measured ones.
+
+    Args:
+        client: Client connected to the application
+        scenario: The scenario to run
+        rate: Requests per second
+        duration: Seconds of measured load
+        warmup: Seconds of load sent before measuring
+        counter: Source of request numbers, so request bodies never repeat
+
+    Returns:
+        Dict[str, Any]: The scenario report
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measured_from = start + warmup
+
+    async def one(scheduled: float) -> None:
+        key = None
+        try:
+            response = await send(client, scenario, next(counter))
+            if request_failed(response):
+                key = str(response.status_code)
+        except httpx.TimeoutException:
+            key = "timeout"
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+
+        if scheduled < measured_from:
+            return
+        if key is None:
+            latencies.append(loop.time() - scheduled)
+        else:
+            errors[key] = errors.get(key, 0) + 1
+
+    tasks = []
+    total = int((warmup + duration) * rate)
+    for index in range(total):
+        scheduled = start + index / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - measured_from
+
+    latencies.sort()
+    failed = sum(errors.values())
+    return {
+        "endpoint": scenario.endpoint,
+        "rate": rate,
+        "duration": duration,
+        "requests": len(latencies) + failed,
+        "ok": len(latencies),
+        "errors": failed,
+        "error_codes": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("max", latencies[-1] if latencies else None),
+                (
+                    "mean",
+                    sum(latencies) / len(latencies) if latencies else None,
+                ),
+            )
+        },
+    }
+
+
+async def create_persona(client: httpx.AsyncClient, blog: bool) -> str:
+    """Create the persona posts are written for, retrying simulated failures."""
+    body = {"user_email": LOAD_TEST_USER, "initial_data": persona_answers(0, blog)}
+    for _ in range(10):
+        response = await client.post("/persona/create-persona", json=body)
+        if not request_failed(response):
+            return response.json()["id"]
+    raise SystemExit(f"Could not create a persona: {response.text}")
+
+
+async def seed(
+    client: httpx.AsyncClient, scenarios: Dict[str, Scenario], posts: int
+) -> None:
+    """Create the posts listed by list_posts, a few at a time."""
+    semaphore = asyncio.Semaphore(16)
+
+    async def create(number: int) -> None:
+        async with semaphore:
+            # Failures only leave fewer posts to list
+            await send(client, scenarios["post"], -number)
+
+    await asyncio.gather(*(create(number) for number in range(1, posts + 1)))
+
+
+async def drive(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    """Seed the application and run every requested scenario in turn."""
+    limits = httpx.Limits(
+        max_connections=args.max_connections, max_keepalive_connections=100
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        scenarios = build_scenarios(await create_persona(client, args.blog), args.blog)
+        await seed(client, scenarios, args.seed_posts)
+
+        counter = itertools.count(1)
+        results = {}
+        for name, rate in parse_scenarios(args.scenarios, args.rate):
+            if name not in scenarios:
+                raise SystemExit(f"Unknown scenario: {name}")
+            print(f"Running {name} at {rate:g} req/s", file=sys.stderr)
+            results[name] = await run_scenario(
+                client, scenarios[name], rate, args.duration, args.warmup, counter
+            )
+        return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Process serving {url} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"{url} did not become healthy within {timeout:g}s")
+
+
+def write_env_file(args: argparse.Namespace, upstream_url: str) -> str:
+    """
+    Write the settings of the application under test.
+
+    The application loads this file with override=True instead of the
+    developer's .env, so no real webhook or API key is ever used.
+    """
+    env = {
+        "TESTING": "1",
+        "STORAGE_BACKEND": args.storage,
+        "OPENAI_API_KEY": "sk-loadtest",
+        "FIRECRAWL_API_KEY": "fc-loadtest",
+        "FIRECRAWL_API_URL": upstream_url,
+        "MAKE_WEBHOOK_URL": upstream_url + PERSONA_WEBHOOK_PATH,
+        "MAKE_WEBHOOK_POST_URL": upstream_url + POST_WEBHOOK_PATH,
+        "BLOG_CACHE_TTL": "0",
+        "MAX_PAGE_SIZE": "100",
+        # Every request comes from one client, per-client limits would cap the rate
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    for item in args.app_env:
+        name, _, value = item.partition("=")
+        env[name] = value
+
+    handle, path = tempfile.mkstemp(prefix="loadtest-", suffix=".env")
+    with os.fdopen(handle, "w") as env_file:
+        env_file.writelines(f"{name}={value}\n" for name, value in env.items())
+    return path
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the relative change of each scenario against a baseline report."""
+    print(f"Compared with {baseline.get('commit')}:", file=sys.stderr)
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][metric], result["latency_ms"][metric]
+            if old and new is not None:
+                changes.append(f"{metric} {(new - old) / old:+.1%}")
+        if before.get("throughput") and result["throughput"] is not None:
+            change = (result["throughput"] - before["throughput"]) / before[
+                "throughput"
+            ]
+            changes.append(f"throughput {change:+.1%}")
+        changes.append(f"errors {before['errors']} -> {result['errors']}")
+        print(f"  {name:<14} " + ", ".join(changes), file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--scenarios", default="post,persona,list_posts,list_personas")
+    parser.add_argument("--rate", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed-posts", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument(
+        "--no-blog", dest="blog", action="store_false", help="Skip Firecrawl"
+    )
+    parser.add_argument(
+        "--app-env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Extra setting of the application, e.g. FAST_JSON_RESPONSES=true",
+    )
+    parser.add_argument("--webhook-latency", default="lognormal:800,0.4")
+    parser.add_argument("--webhook-error-rate", type=float, default=0.0)
+    parser.add_argument("--firecrawl-latency", default="lognormal:1500,0.5")
+    parser.add_argument("--firecrawl-error-rate", type=float, default=0.0)
+    parser.add_argument("--suggestion-length", type=int, default=1200)
+    parser.add_argument("--summary-length", type=int, default=3000)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    args = parser.parse_args()
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    env_path = write_env_file(args, upstream_url)
+
+    upstream_command = [
+        sys.executable,
+        "-m",
+        "benchmarks.fake_upstreams",
+        "--port",
+        str(upstream_port),
+        "--webhook-latency",
+        args.webhook_latency,
+        "--webhook-error-rate",
+        str(args.webhook_error_rate),
+        "--firecrawl-latency",
+        args.firecrawl_latency,
+        "--firecrawl-error-rate",
+        str(args.firecrawl_error_rate),
+        "--suggestion-length",
+        str(args.suggestion_length),
+        "--summary-length",
+        str(args.summary_length),
+    ]
+    app_command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.main:app",
+        "--port",
+        str(app_port),
+        "--workers",
+        str(args.workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(upstream_command, cwd=BACKEND_DIR))
+        wait_until_healthy(f"{upstream_url}/health", processes[-1], 30)
+        processes.append(
+            subprocess.Popen(
+                app_command,
+                cwd=BACKEND_DIR,
+                env={**os.environ, "ENV_FILE": env_path},
+            )
+        )
+        wait_until_healthy(f"{app_url}/health", processes[-1], 60)
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        results = asyncio.run(drive(args, app_url))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        os.unlink(env_path)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "config": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "baseline")
+        },
+        "scenarios": results,
+    }
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n")
+    else:
+        print(rendered)
+
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
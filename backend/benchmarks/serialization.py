@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of the JSON response paths.
+
+Compares FastAPI's default handling of a stored document list (response
+model validation, JSON-mode dump and stdlib rendering) with the trusted
+orjson path used when FAST_JSON_RESPONSES is set, and the per-request
+serialization of the persona questions with the cached body.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization
+"""
+
+import argparse
+import timeit
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+from app.core.constants import PERSONA_CREATION_QUESTIONS
+from app.routes.post import PostResponse
+from app.routes.questions import QUESTIONS_BODY, QuestionsResponse
+from app.utils.responses import FastJSONResponse, project
+
+
+def make_posts(count: int, suggestion_length: int) -> List[dict]:
+    """Build stored post documents with long suggestions."""
+    suggestion = "Lorem ipsum dolor sit amet. " * (suggestion_length // 28 + 1)
+    return [
+        {
+            "id": f"post-{index}",
+            "user_id": "user@example.com",
+            "created_at": "2025-01-01T12:00:00",
+            "platform": "LinkedIn",
+            "content_type": "Article",
+            "tone": "Professional",
+            "persona_id": "persona-1",
+            "suggestions": [suggestion[:suggestion_length] for _ in range(5)],
+            "request_details": {"core_message": "Launch", "temperature": 0.75},
+            "raw_request": {"request": {"user_info": {"email": "user@example.com"}}},
+        }
+        for index in range(count)
+    ]
+
+
+def measure(name: str, fn: Callable[[], object], number: int) -> float:
+    """Run fn number times and print the mean duration."""
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{name:<40} {seconds * 1e6:>10.1f} us")
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--suggestion-length", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.suggestion_length)
+    adapter = TypeAdapter(List[PostResponse])
+
+    def validated() -> bytes:
+        value = adapter.validate_python(posts)
+        return JSONResponse(adapter.dump_python(value, mode="json")).body
+
+    def trusted() -> bytes:
+        return FastJSONResponse([project(post, PostResponse) for post in posts]).body
+
+    print(f"list_posts: {args.posts} posts, {args.suggestion_length} chars/suggestion")
+    before = measure("response_model + JSONResponse", validated, args.number)
+    after = measure("trusted projection + FastJSONResponse", trusted, args.number)
+    print(f"{'speedup':<40} {before / after:>10.1f} x")
+
+    questions = {"questions": PERSONA_CREATION_QUESTIONS}
+
+    def questions_per_request() -> bytes:
+        value = QuestionsResponse.model_validate(questions)
+        return JSONResponse(jsonable_encoder(value)).body
+
+    def questions_cached() -> bytes:
+        return Response(content=QUESTIONS_BODY, media_type="application/json").body
+
+    print("\nGET /questions")
+    before = measure("response_model + JSONResponse", questions_per_request, 1000)
+    after = measure("cached body", questions_cached, 1000)
+    print(f"{'speedup':<40} {before / after:>10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
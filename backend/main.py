@@ -1,13 +1,13 @@
-import os
-
 import uvicorn
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+from app.core.config import get_settings
 
 if __name__ == "__main__":
-    host = os.getenv("API_HOST", "0.0.0.0")
-    port = int(os.getenv("PORT", "8000"))
-    debug = os.getenv("API_DEBUG", "false").lower() == "true"
-
-    uvicorn.run("app.main:app", host=host, port=port, reload=debug)
+    settings = get_settings()
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.api_host,
+        port=settings.port,
+        reload=settings.api_debug,
+    )
@@ -0,0 +1,137 @@
+"""
+Migrate stored posts to the slim document format.
+
+Posts generated before personas were referenced by ID and version embed
+the whole webhook payload, persona included, as raw_request. This removes
+raw_request from every post in the Firestore posts collection, optionally
+keeping it in the post's audit subcollection, and fills in the
+persona_version of posts written as a persona. Personas do not change once
+stored, so their current version is the one the post was written with.
+
+Posts that are already slim are left alone, so the migration can be
+interrupted and run again. Run from the backend directory with the Firebase
+credentials configured:
+
+    python -m scripts.slim_posts --dry-run
+    python -m scripts.slim_posts --audit
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict, Optional
+
+from firebase_admin import firestore
+
+from app.routes.post import persona_version
+from app.utils.db import (
+    AUDIT_SUBCOLLECTION,
+    MAX_BATCH_WRITES,
+    POSTS_COLLECTION,
+    RAW_REQUEST_DOCUMENT,
+    get_async_firestore_client,
+    get_persona_by_id,
+    split_raw_request,
+)
+
+# Fields read from each post; everything else stays on the server
+MIGRATION_FIELDS = ["raw_request", "created_at", "persona_id", "persona_version"]
+
+
+def slim_updates(
+    post: Dict[str, Any], version: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the updates that make a post slim.
+
+    Args:
+        post: The migration fields of a stored post
+        version: Version of the post's persona, if it has one
+
+    Returns:
+        Optional[Dict[str, Any]]: Field updates, None if the post is slim
+    """
+    updates: Dict[str, Any] = {}
+    if "raw_request" in post:
+        updates["raw_request"] = firestore.DELETE_FIELD
+    if version and not post.get("persona_version"):
+        updates["persona_version"] = version
+    return updates or None
+
+
+async def slim_posts(
+    page_size: int = 200, audit: bool = False, dry_run: bool = False
+) -> int:
+    """
+    Slim every stored post, one page of posts per write batch.
+
+    Args:
+        page_size: Posts read and written per batch
+        audit: Keep each raw_request in the post's audit subcollection
+        dry_run: Count the posts to migrate without writing
+
+    Returns:
+        int: Number of posts that were (or would be) migrated
+    """
+    db = get_async_firestore_client()
+    # A post may take two writes, its update and its audit record
+    page_size = max(1, min(page_size, MAX_BATCH_WRITES // 2))
+    query = db.collection(POSTS_COLLECTION).select(MIGRATION_FIELDS).limit(page_size)
+    versions: Dict[str, Optional[str]] = {}
+    migrated = 0
+    last = None
+
+    while True:
+        page = query.start_after(last) if last is not None else query
+        docs = [doc async for doc in page.stream()]
+        if not docs:
+            return migrated
+        last = docs[-1]
+
+        batch = db.batch()
+        writes = 0
+        for doc in docs:
+            post = {"id": doc.id, **(doc.to_dict() or {})}
+            persona_id = post.get("persona_id")
+            if persona_id and persona_id not in versions:
+                versions[persona_id] = persona_version(
+                    await get_persona_by_id(persona_id)
+                )
+
+            updates = slim_updates(post, versions.get(persona_id))
+            if updates is None:
+                continue
+            migrated += 1
+
+            _, record = split_raw_request(post)
+            if audit and record is not None:
+                audit_ref = doc.reference.collection(AUDIT_SUBCOLLECTION)
+                batch.set(audit_ref.document(RAW_REQUEST_DOCUMENT), record)
+                writes += 1
+            batch.update(doc.reference, updates)
+            writes += 1
+
+        if writes and not dry_run:
+            await batch.commit()
+        print(f"Scanned {len(docs)} posts, {migrated} migrated so far")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument(
+        "--audit",
+        action="store_true",
+        help="Keep each raw_request in the post's audit subcollection",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Count the posts without writing"
+    )
+    args = parser.parse_args()
+
+    migrated = asyncio.run(slim_posts(args.page_size, args.audit, args.dry_run))
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} posts")
+
+
+if __name__ == "__main__":
+    main()
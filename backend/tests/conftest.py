@@ -9,6 +9,7 @@ os.environ["OPENAI_API_KEY"] = "sk-test-key"
 os.environ["FIREBASE_CREDENTIALS_PATH"] = "test-firebase-credentials.json"
 os.environ["FIRECRAWL_API_KEY"] = "test-firecrawl-key"
 os.environ["TESTING"] = "1"
+os.environ["BLOG_CACHE_TTL"] = "0"
 
 # Set up Firebase mocks before importing app
 mock_firestore_client = MagicMock()
@@ -30,11 +31,42 @@ mock_firecrawl_app.extract.return_value = MagicMock(data={
 patch("firebase_admin.initialize_app", return_value=None).start()
 patch("firebase_admin.get_app", return_value=None).start()
 patch("firebase_admin.firestore.client", return_value=mock_firestore_client).start()
+patch(
+    "firebase_admin.firestore_async.client", return_value=mock_firestore_client
+).start()
 patch("firebase_admin.credentials.Certificate", return_value=None).start()
 patch("firecrawl.FirecrawlApp", return_value=mock_firecrawl_app).start()
 
 # Import app after setting up mocks and environment variables
-from app.main import app
+from app.main import app  # noqa: E402
+from app.utils import http, rate_limit  # noqa: E402
+from app.utils.db import persona_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_persona_cache():
+    """Keep cached personas from leaking between tests."""
+    persona_cache.clear()
+    yield
+    persona_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Start every test with closed circuits and no observed latencies."""
+    http._breakers.clear()
+    http._timeouts.clear()
+    yield
+    http._breakers.clear()
+    http._timeouts.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with full token buckets."""
+    rate_limit._limiter = None
+    yield
+    rate_limit._limiter = None
 
 
 @pytest.fixture
@@ -46,7 +78,7 @@ def client():
 @pytest.fixture
 def mock_firestore():
     """Mock the Firestore client for testing."""
-    with patch("app.utils.db.get_firestore_client") as mock_get_client:
+    with patch("app.utils.db.get_async_firestore_client") as mock_get_client:
         # Create a mock Firestore client
         mock_client = MagicMock()
         mock_collection = MagicMock()
@@ -1,17 +1,27 @@
+import asyncio
 import json
-import os
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from app.core.agents import (
+    BLOG_ANALYSIS_VERSION,
+    PREFETCH_READY,
+    PREFETCH_RUNNING,
+    PREFETCH_STARTED,
     BlogScrapper,
     ExtractSchema,
     PersonaCreatorTool,
     WebhookPersonaRequest,
     generate_persona,
+    get_firecrawl_app,
+    prefetch_blog_analysis,
 )
+from app.core.config import get_settings
 from app.models.persona import PersonaQuestionAnswer
+from app.utils.bulkhead import FIRECRAWL, Bulkhead, BulkheadFull, bulkheads
+from app.utils.scrape_cache import BlogAnalysisCache
 
 
 @pytest.fixture
@@ -40,19 +50,13 @@ def mock_firecrawl_app():
 
 @pytest.fixture
 def mock_firestore():
-    with patch("app.core.agents.db") as mock_db:
-        mock_collection = MagicMock()
-        mock_db.collection.return_value = mock_collection
-        
-        mock_doc_ref = MagicMock()
-        mock_collection.document.return_value = mock_doc_ref
-        
-        yield mock_db
+    with patch("app.core.agents.save_persona", new_callable=AsyncMock) as mock_save:
+        yield mock_save
 
 
 @pytest.fixture
 def mock_httpx():
-    with patch("app.core.agents.httpx") as mock_httpx:
+    with patch("app.core.agents.post_webhook", new_callable=AsyncMock) as mock_post:
         mock_response = MagicMock()
         mock_response.text = json.dumps({
             "goals": ["Thought Leadership", "Brand Awareness"],
@@ -63,8 +67,8 @@ def mock_httpx():
             "preferred_formats": ["Articles", "Case studies"],
             "persona_summary": "### John Doe\n**Tech Expert**"
         })
-        mock_httpx.post.return_value = mock_response
-        yield mock_httpx
+        mock_post.return_value = mock_response
+        yield mock_post
 
 
 @pytest.mark.asyncio
@@ -100,11 +104,80 @@ async def test_blog_scrapper_arun(mock_firecrawl_app, sample_blog_data):
     assert result == sample_blog_data
 
 
+def test_blog_scrapper_uses_cache(mock_firecrawl_app, sample_blog_data, tmp_path):
+    """Test a second analysis of the same blog is served from the cache."""
+    cache = BlogAnalysisCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+
+    with patch("app.core.agents.blog_analysis_cache", cache):
+        scrapper = BlogScrapper()
+        first = scrapper._run("https://Example.com/blog/")
+        second = scrapper._run("https://example.com/blog")
+
+    assert first == second == sample_blog_data
+    mock_firecrawl_app.extract.assert_called_once()
+    assert cache.get("https://example.com/blog", BLOG_ANALYSIS_VERSION) is not None
+
+
+@pytest.mark.asyncio
+async def test_cached_blog_analysis_skips_firecrawl_bulkhead(
+    mock_firecrawl_app, sample_blog_data, tmp_path
+):
+    """Test a cached analysis is served while every Firecrawl slot is taken."""
+    cache = BlogAnalysisCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.set("https://example.com/blog", BLOG_ANALYSIS_VERSION, sample_blog_data)
+    full = Bulkhead(FIRECRAWL, max_concurrent=1, max_queue=0)
+    full.active = 1
+
+    with (
+        patch("app.core.agents.blog_analysis_cache", cache),
+        patch.dict(bulkheads, {FIRECRAWL: full}),
+    ):
+        result = await BlogScrapper()._arun("https://example.com/blog")
+        with pytest.raises(BulkheadFull):
+            await BlogScrapper()._arun("https://example.com/other-blog")
+
+    assert result == sample_blog_data
+    mock_firecrawl_app.extract.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_persona_request_joins_blog_prefetch(
+    mock_firecrawl_app, sample_blog_data, tmp_path
+):
+    """Test a persona request waits for a running prefetch instead of re-extracting."""
+    cache = BlogAnalysisCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    release = threading.Event()
+    extract_response = mock_firecrawl_app.extract.return_value
+
+    def slow_extract(*args, **kwargs):
+        release.wait(5)
+        return extract_response
+
+    mock_firecrawl_app.extract.side_effect = slow_extract
+    url = "https://example.com/blog"
+
+    with patch("app.core.agents.blog_analysis_cache", cache):
+        assert await prefetch_blog_analysis(url) == PREFETCH_STARTED
+        assert await prefetch_blog_analysis(url) == PREFETCH_RUNNING
+
+        persona_request = asyncio.ensure_future(BlogScrapper()._arun(url))
+        await asyncio.sleep(0.05)
+        release.set()
+        result = await persona_request
+
+        assert await prefetch_blog_analysis(url) == PREFETCH_READY
+
+    assert result == sample_blog_data
+    mock_firecrawl_app.extract.assert_called_once()
+
+
 @pytest.mark.asyncio
-async def test_persona_creator_run_success(mock_httpx, mock_firestore):
-    """Test the PersonaCreatorTool._run method with successful API response."""
-    # Set up the environment variable
-    os.environ["MAKE_WEBHOOK_URL"] = "https://example.com/webhook"
+async def test_persona_creator_run_success(mock_httpx, mock_firestore, monkeypatch):
+    """Test the PersonaCreatorTool._arun method with successful API response."""
+    # Set up the webhook URL
+    monkeypatch.setattr(
+        get_settings(), "make_webhook_url", "https://example.com/webhook"
+    )
     
     # Create test data
     initial_data = [
@@ -128,17 +201,18 @@ async def test_persona_creator_run_success(mock_httpx, mock_firestore):
     
     # Test the tool
     persona_tool = PersonaCreatorTool()
-    result = persona_tool._run(initial_data, "test-user-id", blog_data)
+    result = await persona_tool._arun(initial_data, "test-user-id", blog_data)
     
     # Verify HTTP request
-    mock_httpx.post.assert_called_once()
-    call_args = mock_httpx.post.call_args[0]
-    assert call_args[0] == "https://example.com/webhook"
+    mock_httpx.assert_awaited_once()
+    call_args = mock_httpx.call_args[0]
+    assert call_args[1] == "https://example.com/webhook"
     
     # Verify Firestore operations
-    mock_firestore.collection.assert_called_with("personas")
-    mock_firestore.collection().document.assert_called_once()
-    mock_firestore.collection().document().set.assert_called_once()
+    mock_firestore.assert_awaited_once()
+    saved_persona = mock_firestore.await_args[0][0]
+    assert saved_persona["id"] == result["id"]
+    assert saved_persona["user_id"] == "test-user-id"
     
     # Verify result structure
     assert isinstance(result, dict)
@@ -151,7 +225,7 @@ async def test_persona_creator_run_success(mock_httpx, mock_firestore):
 
 
 @pytest.mark.asyncio
-@patch("app.core.agents.PersonaCreatorTool._run")
+@patch("app.core.agents.PersonaCreatorTool._arun")
 @patch("app.core.agents.BlogScrapper._arun")
 async def test_generate_persona_with_blog(mock_blog_scrapper, mock_persona_creator):
     """Test generate_persona with blog URL."""
@@ -198,7 +272,7 @@ async def test_generate_persona_with_blog(mock_blog_scrapper, mock_persona_creat
 
 
 @pytest.mark.asyncio
-@patch("app.core.agents.PersonaCreatorTool._run")
+@patch("app.core.agents.PersonaCreatorTool._arun")
 @patch("app.core.agents.BlogScrapper._arun")
 async def test_generate_persona_without_blog(mock_blog_scrapper, mock_persona_creator):
     """Test generate_persona without blog URL."""
@@ -232,7 +306,7 @@ async def test_generate_persona_without_blog(mock_blog_scrapper, mock_persona_cr
 
 
 @pytest.mark.asyncio
-@patch("app.core.agents.PersonaCreatorTool._run")
+@patch("app.core.agents.PersonaCreatorTool._arun")
 @patch("app.core.agents.BlogScrapper._arun")
 async def test_generate_persona_error(mock_blog_scrapper, mock_persona_creator):
     """Test generate_persona error handling."""
@@ -291,4 +365,17 @@ def test_webhook_persona_request():
     # Verify request properties
     assert len(request.questionaries) == 2
     assert request.questionaries[0]["question"] == "What is your email?"
-    assert request.questionaries[0]["answer"] == "test@example.com"
\ No newline at end of file
+    assert request.questionaries[0]["answer"] == "test@example.com"
+
+def test_firecrawl_app_uses_configured_api_url():
+    """Test FIRECRAWL_API_URL points the Firecrawl client elsewhere."""
+    with (
+        patch("app.core.agents.app", None),
+        patch.object(get_settings(), "firecrawl_api_url", "http://127.0.0.1:9100"),
+        patch("firecrawl.FirecrawlApp") as mock_class,
+    ):
+        assert get_firecrawl_app() is mock_class.return_value
+
+    mock_class.assert_called_once_with(
+        api_key=get_settings().firecrawl_api_key, api_url="http://127.0.0.1:9100"
+    )
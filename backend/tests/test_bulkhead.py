@@ -0,0 +1,144 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils import db
+from app.utils.bulkhead import (
+    POST_WEBHOOK_POOL,
+    STORAGE,
+    Bulkhead,
+    BulkheadFull,
+    bulkheads,
+)
+from app.utils.repository import InstrumentedRepository, MemoryRepository
+
+
+@pytest.mark.asyncio
+async def test_calls_wait_for_a_slot_then_are_shed():
+    """Test calls queue up to the limit and are rejected beyond it."""
+    bulkhead = Bulkhead("hook", max_concurrent=1, max_queue=1, retry_after=3)
+    await bulkhead.acquire()
+
+    waiting = asyncio.ensure_future(bulkhead.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(BulkheadFull) as error:
+        await bulkhead.acquire()
+
+    assert error.value.retry_after == 3
+    assert bulkhead.stats() == {
+        "active": 1,
+        "queued": 1,
+        "max_concurrent": 1,
+        "max_queue": 1,
+        "rejected": 1,
+    }
+
+    bulkhead.release()
+    await waiting
+    assert bulkhead.active == 1
+    assert bulkhead.queued == 0
+
+    bulkhead.release()
+    assert bulkhead.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    """Test a cancelled call neither keeps its place nor leaks a slot."""
+    bulkhead = Bulkhead("hook", max_concurrent=1, max_queue=2)
+    await bulkhead.acquire()
+    cancelled = asyncio.ensure_future(bulkhead.acquire())
+    handed_over = asyncio.ensure_future(bulkhead.acquire())
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+    bulkhead.release()
+    await handed_over
+    bulkhead.release()
+
+    assert bulkhead.active == 0
+    assert bulkhead.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_zero_concurrency_disables_the_limit():
+    """Test a pool without a limit never queues or sheds."""
+    bulkhead = Bulkhead("hook", max_concurrent=0, max_queue=0)
+
+    for _ in range(3):
+        await bulkhead.acquire()
+
+    assert bulkhead.active == 3
+
+
+def test_full_webhook_pool_returns_429(client):
+    """Test create_post is shed with Retry-After when the pool is saturated."""
+    full = Bulkhead(POST_WEBHOOK_POOL, max_concurrent=1, max_queue=0, retry_after=2)
+    full.active = 1
+
+    with (
+        patch.dict(bulkheads, {POST_WEBHOOK_POOL: full}),
+        patch.object(
+            get_settings(), "make_webhook_post_url", "https://example.com/webhook"
+        ),
+        patch("app.utils.http.get_http_client") as mock_get_client,
+    ):
+        response = client.post(
+            "/post",
+            json={"platform": "LinkedIn", "content_type": "Post", "tone": "Casual"},
+        )
+        metrics = client.get("/metrics").text
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert "post_webhook" in response.json()["detail"]
+    assert 'bulkhead_rejected_total{pool="post_webhook"} 1' in metrics
+    mock_get_client.return_value.post.assert_not_called()
+
+
+def test_full_storage_pool_returns_429_for_persona(client):
+    """Test a persona whose save is shed by storage gets 429, not an error body."""
+    full = Bulkhead(STORAGE, max_concurrent=1, max_queue=0, retry_after=3)
+    full.active = 1
+    repository = InstrumentedRepository(MemoryRepository(), "memory", full)
+    webhook_response = MagicMock()
+    webhook_response.text = json.dumps(
+        {
+            "goals": ["Thought Leadership"],
+            "target_audience": "Tech professionals",
+            "tone_of_voice": ["Professional"],
+            "key_topics": ["AI"],
+            "values": ["Innovation"],
+            "preferred_formats": ["Articles"],
+            "persona_summary": "### Jane Doe",
+        }
+    )
+
+    with (
+        patch.object(db, "_repository", repository),
+        patch(
+            "app.core.agents.post_webhook",
+            new_callable=AsyncMock,
+            return_value=webhook_response,
+        ),
+    ):
+        response = client.post(
+            "/persona/create-persona",
+            json={
+                "user_email": "test@example.com",
+                "initial_data": [
+                    {
+                        "question_id": "current_role",
+                        "answer": "Software Engineer",
+                        "question": "What is your current role?",
+                    }
+                ],
+            },
+        )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from app.utils.cache import TTLCache
+
+
+def test_get_and_set():
+    """Test a cached value is returned and counted as a hit."""
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    assert cache.get("a") is None
+    cache.set("a", {"id": "a"})
+
+    assert cache.get("a") == {"id": "a"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_lru_eviction():
+    """Test the least recently used entry is evicted when full."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Touch "a" so "b" becomes the least recently used entry
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test entries expire after the TTL."""
+    cache = TTLCache(maxsize=2, ttl=10)
+
+    with patch("app.utils.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.utils.cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") == 1
+    with patch("app.utils.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+
+    assert len(cache) == 0
+
+
+def test_invalidate_and_clear():
+    """Test entries can be dropped individually or all at once."""
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 0
+
+
+def test_disabled_cache():
+    """Test a zero-sized cache never stores anything."""
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
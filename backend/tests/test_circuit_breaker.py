@@ -0,0 +1,214 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.utils.bulkhead import POST_WEBHOOK_POOL, Bulkhead, BulkheadFull, bulkheads
+from app.utils.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveTimeout,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from app.utils.http import (
+    POST_WEBHOOK,
+    get_circuit_breaker,
+    get_upstream_timeout,
+    post_webhook,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_and_recovers():
+    """Test the closed, open, half-open, closed cycle."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        "hook", failure_threshold=2, recovery_timeout=10, clock=clock
+    )
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 10
+
+    clock.now += 10
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {
+        "state": CLOSED,
+        "failures": 0,
+        "rejected": 2,
+        "opened": 1,
+    }
+
+
+def test_failed_trial_reopens_circuit():
+    """Test a failing half-open trial opens the circuit again."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        "hook", failure_threshold=1, recovery_timeout=5, clock=clock
+    )
+    breaker.record_failure()
+    clock.now += 5
+    breaker.before_call()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+
+
+def test_adaptive_timeout_follows_latency_percentile():
+    """Test the timeout tracks observed latencies within its bounds."""
+    adaptive = AdaptiveTimeout(minimum=1.0, percentile=90, multiplier=2, min_samples=10)
+
+    for _ in range(9):
+        adaptive.observe(2.0)
+    assert adaptive.current(30.0) == 30.0
+
+    adaptive.observe(3.0)
+    assert adaptive.current(30.0) == 4.0
+    assert adaptive.current(3.0) == 3.0
+
+    for _ in range(100):
+        adaptive.observe(0.01)
+    assert adaptive.current(30.0) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_webhook_failures_open_the_circuit():
+    """Test 5xx responses and transport errors open the circuit."""
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(
+        side_effect=[
+            MagicMock(status_code=503),
+            httpx.ConnectError("refused"),
+            MagicMock(status_code=200),
+        ]
+    )
+
+    with (
+        patch.object(get_settings(), "webhook_breaker_failure_threshold", 2),
+        patch("app.utils.http.get_http_client", return_value=mock_client),
+    ):
+        await post_webhook(POST_WEBHOOK, "https://example.com", {})
+        with pytest.raises(httpx.ConnectError):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {})
+        with pytest.raises(CircuitOpenError):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {})
+
+    assert mock_client.post.await_count == 2
+    assert get_circuit_breaker(POST_WEBHOOK).state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_successful_calls_shorten_the_timeout():
+    """Test the webhook timeout adapts to fast responses."""
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+    with (
+        patch.object(get_settings(), "webhook_timeout_min", 2.0),
+        patch("app.utils.http.get_http_client", return_value=mock_client),
+    ):
+        for _ in range(20):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {})
+        timeout = get_upstream_timeout(POST_WEBHOOK)
+
+    assert timeout.read == 2.0
+
+
+@pytest.mark.asyncio
+async def test_timed_out_calls_lengthen_the_timeout():
+    """Test timeouts count at their timeout and variants learn separately."""
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+    with (
+        patch.object(get_settings(), "webhook_timeout_min", 2.0),
+        patch.object(get_settings(), "make_webhook_post_timeout", 30.0),
+        patch("app.utils.http.get_http_client", return_value=mock_client),
+    ):
+        for _ in range(20):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {}, "Post")
+        mock_client.post.side_effect = httpx.ReadTimeout("slow")
+        with pytest.raises(httpx.ReadTimeout):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {}, "Post")
+        post_timeout = get_upstream_timeout(POST_WEBHOOK, "Post")
+        article_timeout = get_upstream_timeout(POST_WEBHOOK, "Article")
+
+    # The timed out call was observed at 2s, doubled by the multiplier
+    assert post_timeout.read == 4.0
+    assert article_timeout.read == 30.0
+
+
+@pytest.mark.asyncio
+async def test_shed_call_does_not_take_the_trial():
+    """Test a call the bulkhead rejects leaves the half-open trial free."""
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+    breaker = get_circuit_breaker(POST_WEBHOOK)
+    breaker.record_failure()
+    breaker.state = OPEN
+    breaker._opened_at -= breaker.recovery_timeout
+    full = Bulkhead(POST_WEBHOOK_POOL, max_concurrent=1, max_queue=0)
+    full.active = 1
+
+    with (
+        patch.dict(bulkheads, {POST_WEBHOOK_POOL: full}),
+        patch("app.utils.http.get_http_client", return_value=mock_client),
+    ):
+        with pytest.raises(BulkheadFull):
+            await post_webhook(POST_WEBHOOK, "https://example.com", {})
+        full.active = 0
+        await post_webhook(POST_WEBHOOK, "https://example.com", {})
+
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_returns_503(client):
+    """Test create_post fails fast with Retry-After while the circuit is open."""
+    breaker = get_circuit_breaker(POST_WEBHOOK)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    with (
+        patch.object(
+            get_settings(), "make_webhook_post_url", "https://example.com/webhook"
+        ),
+        patch("app.utils.http.get_http_client") as mock_get_client,
+    ):
+        response = client.post(
+            "/post",
+            json={
+                "platform": "LinkedIn",
+                "content_type": "Post",
+                "tone": "Professional",
+                "core_message": "Hello",
+            },
+        )
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert "post_webhook is unavailable" in response.json()["detail"]
+    mock_get_client.return_value.post.assert_not_called()
@@ -1,12 +1,21 @@
-from unittest.mock import MagicMock
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from app.utils.db import (
     convert_to_serializable,
     get_persona_by_id,
+    get_post_by_id,
     list_personas,
+    list_posts,
+    list_posts_page,
+    persona_cache,
+    save_persona,
+    save_post,
+    save_posts,
 )
+from app.utils.pagination import decode_cursor, encode_cursor
 
 
 class TestConvertToSerializable:
@@ -45,7 +54,7 @@ async def test_get_persona_by_id(mock_firestore):
     
     # Setup mock document reference
     mock_doc_ref = MagicMock()
-    mock_doc_ref.get.return_value = mock_doc
+    mock_doc_ref.get = AsyncMock(return_value=mock_doc)
     
     # Setup mock collection reference
     mock_collection = MagicMock()
@@ -61,7 +70,7 @@ async def test_get_persona_by_id(mock_firestore):
     assert result == {"name": "Test Persona", "created_at": "2022-01-01"}
     mock_firestore.collection.assert_called_once_with("personas")
     mock_collection.document.assert_called_once_with("test-id")
-    mock_doc_ref.get.assert_called_once()
+    mock_doc_ref.get.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -73,7 +82,7 @@ async def test_get_persona_by_id_not_found(mock_firestore):
     
     # Setup mock document reference
     mock_doc_ref = MagicMock()
-    mock_doc_ref.get.return_value = mock_doc
+    mock_doc_ref.get = AsyncMock(return_value=mock_doc)
     
     # Setup mock collection reference
     mock_collection = MagicMock()
@@ -89,7 +98,36 @@ async def test_get_persona_by_id_not_found(mock_firestore):
     assert result is None
     mock_firestore.collection.assert_called_once_with("personas")
     mock_collection.document.assert_called_once_with("non-existing-id")
-    mock_doc_ref.get.assert_called_once()
+    mock_doc_ref.get.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_persona_by_id_uses_cache(mock_firestore):
+    """Test a second lookup of the same persona is served from the cache."""
+    mock_doc = MagicMock()
+    mock_doc.exists = True
+    mock_doc.to_dict.return_value = {"id": "test-id", "name": "Test Persona"}
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.get = AsyncMock(return_value=mock_doc)
+    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+
+    first = await get_persona_by_id("test-id")
+    second = await get_persona_by_id("test-id")
+
+    assert first == second == {"id": "test-id", "name": "Test Persona"}
+    mock_doc_ref.get.assert_awaited_once()
+    assert persona_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_save_persona_invalidates_cache(mock_firestore):
+    """Test writing a persona drops its cached copy."""
+    mock_firestore.collection.return_value.document.return_value.set = AsyncMock()
+    persona_cache.set("persona-1", {"id": "persona-1", "goals": []})
+
+    await save_persona({"id": "persona-1", "goals": ["Networking"]})
+
+    assert "persona-1" not in persona_cache
 
 
 @pytest.mark.asyncio
@@ -127,4 +165,203 @@ async def test_list_personas(mock_firestore):
         {"name": "Persona 2", "created_at": "2022-01-02"},
     ]
     mock_firestore.collection.assert_called_with("personas")
-    mock_collection.where.assert_called_once_with("user_id", "==", "test-user")
\ No newline at end of file
+    mock_collection.where.assert_called_once_with("user_id", "==", "test-user")
+
+
+@pytest.mark.asyncio
+async def test_save_persona(mock_firestore):
+    """Test save_persona stores the document under its own ID."""
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.set = AsyncMock()
+    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+
+    await save_persona({"id": "persona-1", "user_id": "test-user"})
+
+    mock_firestore.collection.assert_called_once_with("personas")
+    mock_firestore.collection().document.assert_called_once_with("persona-1")
+    mock_doc_ref.set.assert_awaited_once_with(
+        {"id": "persona-1", "user_id": "test-user"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_save_post(mock_firestore):
+    """Test save_post stores the document under its own ID."""
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.set = AsyncMock()
+    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+
+    await save_post({"id": "post-1", "suggestions": ["Post 1"]})
+
+    mock_firestore.collection.assert_called_once_with("posts")
+    mock_firestore.collection().document.assert_called_once_with("post-1")
+    mock_doc_ref.set.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_save_posts_uses_batched_writes(mock_firestore):
+    """Test save_posts commits one write batch per 500 documents."""
+    batches = [MagicMock(), MagicMock()]
+    for batch in batches:
+        batch.commit = AsyncMock()
+    mock_firestore.batch.side_effect = batches
+
+    await save_posts([{"id": f"post-{i}"} for i in range(501)])
+
+    assert batches[0].set.call_count == 500
+    assert batches[1].set.call_count == 1
+    batches[0].commit.assert_awaited_once()
+    batches[1].commit.assert_awaited_once()
+    mock_firestore.collection.assert_called_once_with("posts")
+
+
+@pytest.mark.asyncio
+async def test_save_posts_moves_raw_request_to_audit(mock_firestore):
+    """Test an audited raw_request is written to the post's audit subcollection."""
+    batch = MagicMock()
+    batch.commit = AsyncMock()
+    mock_firestore.batch.return_value = batch
+    post_ref = mock_firestore.collection.return_value.document.return_value
+    audit_ref = post_ref.collection.return_value.document.return_value
+
+    await save_posts([{"id": "post-1", "raw_request": {"request": {}}}])
+
+    batch.set.assert_any_call(post_ref, {"id": "post-1"})
+    batch.set.assert_any_call(
+        audit_ref, {"id": "post-1", "created_at": None, "raw_request": {"request": {}}}
+    )
+    post_ref.collection.assert_called_once_with("audit")
+    post_ref.collection.return_value.document.assert_called_once_with("raw_request")
+    batch.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_save_posts_empty(mock_firestore):
+    """Test save_posts does not touch Firestore without posts."""
+    await save_posts([])
+
+    mock_firestore.batch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_post_by_id_converts_timestamp(mock_firestore):
+    """Test get_post_by_id returns created_at as an ISO string."""
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    mock_doc = MagicMock()
+    mock_doc.exists = True
+    mock_doc.to_dict.return_value = {"id": "post-1", "created_at": created_at}
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.get = AsyncMock(return_value=mock_doc)
+    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+
+    result = await get_post_by_id("post-1")
+
+    assert result == {"id": "post-1", "created_at": created_at.isoformat()}
+    mock_firestore.collection.assert_called_once_with("posts")
+
+
+@pytest.mark.asyncio
+async def test_get_post_by_id_not_found(mock_firestore):
+    """Test get_post_by_id returns None for a missing post."""
+    mock_doc = MagicMock()
+    mock_doc.exists = False
+    mock_doc_ref = MagicMock()
+    mock_doc_ref.get = AsyncMock(return_value=mock_doc)
+    mock_firestore.collection.return_value.document.return_value = mock_doc_ref
+
+    assert await get_post_by_id("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_list_posts(mock_firestore):
+    """Test list_posts filters by user and streams documents asynchronously."""
+    mock_post = MagicMock()
+    mock_post.to_dict.return_value = {"id": "post-1", "created_at": None}
+
+    mock_query = MagicMock()
+    mock_query.where.return_value = mock_query
+    mock_query.order_by.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.stream.return_value.__aiter__.return_value = [mock_post]
+    mock_firestore.collection.return_value = mock_query
+
+    result = await list_posts(user_id="test-user", limit=5)
+
+    assert result == [{"id": "post-1", "created_at": None}]
+    mock_firestore.collection.assert_called_once_with("posts")
+    mock_query.where.assert_called_once_with("user_id", "==", "test-user")
+    mock_query.limit.assert_called_once_with(5)
+
+
+@pytest.mark.asyncio
+async def test_list_posts_page_with_cursor(mock_firestore):
+    """Test list_posts_page resumes after the cursor and returns the next one."""
+    created_at = [datetime(2024, 1, 2), datetime(2024, 1, 1)]
+    docs = []
+    for i, timestamp in enumerate(created_at):
+        doc = MagicMock()
+        doc.to_dict.return_value = {"id": f"post-{i}", "created_at": timestamp}
+        docs.append(doc)
+
+    mock_query = MagicMock()
+    mock_query.order_by.return_value = mock_query
+    mock_query.start_after.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.stream.return_value.__aiter__.return_value = docs
+    mock_firestore.collection.return_value = mock_query
+
+    cursor = encode_cursor(datetime(2024, 1, 3), "post-9")
+    posts, next_cursor = await list_posts_page(limit=2, cursor=cursor)
+
+    mock_query.start_after.assert_called_once_with(
+        {"created_at": datetime(2024, 1, 3), "__name__": "post-9"}
+    )
+    assert [post["id"] for post in posts] == ["post-0", "post-1"]
+    assert decode_cursor(next_cursor) == (datetime(2024, 1, 1), "post-1")
+
+
+@pytest.mark.asyncio
+async def test_list_posts_page_last_page(mock_firestore):
+    """Test a short page has no next cursor."""
+    mock_query = MagicMock()
+    mock_query.order_by.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.stream.return_value.__aiter__.return_value = []
+    mock_firestore.collection.return_value = mock_query
+
+    posts, next_cursor = await list_posts_page(limit=10)
+
+    assert posts == []
+    assert next_cursor is None
+    mock_query.start_after.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_list_posts_page_selects_fields(mock_firestore):
+    """Test a field selection is sent to Firestore, with created_at for the cursor."""
+    doc = MagicMock()
+    doc.to_dict.return_value = {
+        "id": "post-0",
+        "platform": "LinkedIn",
+        "created_at": datetime(2024, 1, 1),
+    }
+
+    mock_query = MagicMock()
+    mock_query.order_by.return_value = mock_query
+    mock_query.select.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.stream.return_value.__aiter__.return_value = [doc]
+    mock_firestore.collection.return_value = mock_query
+
+    posts, next_cursor = await list_posts_page(limit=1, fields=["id", "platform"])
+
+    mock_query.select.assert_called_once_with(["id", "platform", "created_at"])
+    assert posts == [{"id": "post-0", "platform": "LinkedIn"}]
+    assert decode_cursor(next_cursor) == (datetime(2024, 1, 1), "post-0")
+
+
+@pytest.mark.asyncio
+async def test_list_posts_page_invalid_cursor(mock_firestore):
+    """Test a malformed cursor raises ValueError."""
+    with pytest.raises(ValueError):
+        await list_posts_page(cursor="not-a-cursor")
@@ -0,0 +1,74 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.utils import http
+from app.utils.http import (
+    POST_WEBHOOK,
+    close_http_client,
+    get_http_client,
+    get_upstream_timeout,
+    post_webhook,
+    start_http_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_client():
+    """Make sure every test starts without a shared client."""
+    http._client = None
+    yield
+    http._client = None
+
+
+def test_get_upstream_timeout_default(monkeypatch):
+    """Test the default webhook timeout."""
+    monkeypatch.setattr(get_settings(), "make_webhook_post_timeout", 30.0)
+
+    timeout = get_upstream_timeout(POST_WEBHOOK)
+
+    assert timeout.read == 30.0
+    assert timeout.connect == 5.0
+
+
+def test_get_upstream_timeout_from_env(monkeypatch):
+    """Test a per-upstream timeout configured through the settings."""
+    monkeypatch.setattr(get_settings(), "make_webhook_post_timeout", 2.5)
+
+    timeout = get_upstream_timeout(POST_WEBHOOK)
+
+    assert timeout.read == 2.5
+    assert timeout.connect == 2.5
+
+
+@pytest.mark.asyncio
+async def test_start_and_close_http_client():
+    """Test the lifespan helpers create and release one shared client."""
+    client = await start_http_client()
+
+    assert isinstance(client, httpx.AsyncClient)
+    assert get_http_client() is client
+
+    await close_http_client()
+
+    assert client.is_closed
+    assert http._client is None
+
+
+@pytest.mark.asyncio
+async def test_post_webhook_uses_shared_client():
+    """Test post_webhook sends JSON through the shared client."""
+    response = MagicMock(status_code=200)
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=response)
+
+    with patch("app.utils.http.get_http_client", return_value=mock_client):
+        result = await post_webhook(POST_WEBHOOK, "https://example.com", {"a": 1})
+
+    assert result is response
+    call = mock_client.post.await_args
+    assert call.args == ("https://example.com",)
+    assert call.kwargs["json"] == {"a": 1}
+    assert isinstance(call.kwargs["timeout"], httpx.Timeout)
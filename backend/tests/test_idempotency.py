@@ -0,0 +1,268 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils.idempotency import (
+    REPLAYED_HEADER,
+    IdempotencyConflict,
+    IdempotencyGuard,
+    IdempotencyKeyReused,
+)
+from app.utils.singleflight import request_key
+
+
+class FakeIdempotencyStore:
+    """In-memory stand-in for the idempotency functions of app.utils.db."""
+
+    def __init__(self):
+        self.records = {}
+
+    async def claim_idempotency_key(self, record_id, fingerprint, lease_seconds):
+        record = self.records.get(record_id)
+        if record is not None and record["expires_at"] > time.time():
+            return dict(record)
+        self.records[record_id] = {
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "expires_at": time.time() + lease_seconds,
+        }
+        return None
+
+    async def complete_idempotency_key(self, record_id, response, ttl_seconds):
+        self.records[record_id].update(
+            status="completed", response=response, expires_at=time.time() + ttl_seconds
+        )
+
+    async def release_idempotency_key(self, record_id):
+        self.records.pop(record_id, None)
+
+
+@pytest.fixture
+def store():
+    store = FakeIdempotencyStore()
+    with (
+        patch(
+            "app.utils.idempotency.claim_idempotency_key", store.claim_idempotency_key
+        ),
+        patch(
+            "app.utils.idempotency.complete_idempotency_key",
+            store.complete_idempotency_key,
+        ),
+        patch(
+            "app.utils.idempotency.release_idempotency_key",
+            store.release_idempotency_key,
+        ),
+    ):
+        yield store
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_response(store):
+    """Test a retried key replays the first response without running again."""
+    guard = IdempotencyGuard()
+    handler = AsyncMock(return_value={"id": "post-1"})
+
+    first = await guard.run("post", "key-1", {"tone": "casual"}, handler)
+    second = await guard.run("post", "key-1", {"tone": "casual"}, handler)
+
+    assert first == {"id": "post-1"}
+    assert second.status_code == 200
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert json.loads(second.body) == {"id": "post-1"}
+    handler.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_other_body(store):
+    """Test a key cannot be reused for a different request."""
+    guard = IdempotencyGuard()
+    await guard.run("post", "key-1", {"tone": "casual"}, AsyncMock(return_value={}))
+
+    with pytest.raises(IdempotencyKeyReused):
+        await guard.run("post", "key-1", {"tone": "formal"}, AsyncMock())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_first_request(store):
+    """Test a duplicate handled by the same process waits and replays."""
+    guard = IdempotencyGuard()
+    release = asyncio.Event()
+    calls = 0
+
+    async def handler():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"id": "post-1"}
+
+    first = asyncio.create_task(guard.run("post", "key-1", {}, handler))
+    second = asyncio.create_task(guard.run("post", "key-1", {}, handler))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == {"id": "post-1"}
+    assert json.loads((await second).body) == {"id": "post-1"}
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_duplicate_running_elsewhere_conflicts(store):
+    """Test a key reserved by another process is rejected."""
+    guard = IdempotencyGuard()
+    handler = AsyncMock()
+
+    # Reserve the key as another replica would
+    await store.claim_idempotency_key(
+        guard.record_id("post", "key-1"), request_key("post", {}), 60
+    )
+
+    with pytest.raises(IdempotencyConflict):
+        await guard.run("post", "key-1", {}, handler)
+    handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_key(store):
+    """Test a failed request can be retried with the same key."""
+    guard = IdempotencyGuard()
+
+    with pytest.raises(RuntimeError):
+        await guard.run("post", "key-1", {}, AsyncMock(side_effect=RuntimeError))
+
+    assert store.records == {}
+    assert await guard.run("post", "key-1", {}, AsyncMock(return_value={})) == {}
+
+
+@pytest.mark.asyncio
+async def test_invalid_key(store):
+    """Test empty and oversized keys are rejected."""
+    guard = IdempotencyGuard()
+
+    with pytest.raises(ValueError):
+        await guard.run("post", "", {}, AsyncMock())
+    with pytest.raises(ValueError):
+        await guard.run("post", "k" * 256, {}, AsyncMock())
+
+
+def test_create_post_with_idempotency_key(client, store):
+    """Test a retried POST /post replays the stored post."""
+    webhook_response = MagicMock()
+    webhook_response.text = json.dumps({"post_suggestions": ["Post 1", "Post 2"]})
+    test_data = {"platform": "LinkedIn", "content_type": "Post", "tone": "Casual"}
+
+    with (
+        patch.object(
+            get_settings(), "make_webhook_post_url", "https://example.com/hook"
+        ),
+        patch("app.routes.post.save_post", new_callable=AsyncMock) as mock_save,
+        patch(
+            "app.routes.post.post_webhook",
+            new_callable=AsyncMock,
+            return_value=webhook_response,
+        ) as mock_webhook,
+    ):
+        headers = {"Idempotency-Key": "retry-1"}
+        first = client.post("/post", json=test_data, headers=headers)
+        second = client.post("/post", json=test_data, headers=headers)
+        other = client.post(
+            "/post", json={**test_data, "tone": "Formal"}, headers=headers
+        )
+
+    assert first.status_code == 200
+    assert REPLAYED_HEADER not in first.headers
+    assert second.status_code == 200
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert second.json()["id"] == first.json()["id"]
+    assert other.status_code == 422
+    mock_webhook.assert_awaited_once()
+    mock_save.assert_awaited_once()
+
+
+def test_create_persona_job_with_idempotency_key(client, store):
+    """Test a retried persona job submission replays the 202 response."""
+    test_data = {
+        "user_email": "test@example.com",
+        "initial_data": [
+            {
+                "question_id": "user_email",
+                "question": "What is your email?",
+                "answer": "test@example.com",
+            }
+        ],
+    }
+
+    with patch(
+        "app.routes.persona.persona_jobs.submit",
+        new_callable=AsyncMock,
+        return_value={"id": "job-1", "status": "queued"},
+    ) as mock_submit:
+        headers = {"Idempotency-Key": "retry-1"}
+        first = client.post(
+            "/persona/create-persona?mode=job", json=test_data, headers=headers
+        )
+        second = client.post(
+            "/persona/create-persona?mode=job", json=test_data, headers=headers
+        )
+
+    assert first.status_code == 202
+    assert second.status_code == 202
+    assert second.json() == first.json()
+    assert second.headers["Location"] == "/persona/jobs/job-1"
+    assert second.headers[REPLAYED_HEADER] == "true"
+    mock_submit.assert_awaited_once()
+
+
+def test_failed_persona_is_not_replayed(client, store):
+    """Test a persona whose generation failed is generated again on retry."""
+    test_data = {"user_email": "test@example.com", "initial_data": []}
+    failed = {"persona": {"error": "Webhook failed", "message": "500"}, "id": None}
+    created = {"persona": {"id": "persona-1"}, "id": "persona-1"}
+
+    with patch(
+        "app.routes.persona.generate_persona",
+        new_callable=AsyncMock,
+        side_effect=[failed, created],
+    ) as mock_generate:
+        headers = {"Idempotency-Key": "retry-1"}
+        first = client.post("/persona/create-persona", json=test_data, headers=headers)
+        second = client.post("/persona/create-persona", json=test_data, headers=headers)
+
+    assert first.json()["id"] is None
+    assert second.json()["id"] == "persona-1"
+    assert REPLAYED_HEADER not in second.headers
+    assert mock_generate.await_count == 2
+
+
+def test_replayed_persona_is_not_rate_limited(client, store):
+    """Test replays of a stored response do not take rate limit tokens."""
+    test_data = {"user_email": "test@example.com", "initial_data": []}
+    settings = get_settings()
+
+    with (
+        patch.object(settings, "rate_limit_enabled", True),
+        patch.object(settings, "rate_limit_persona_per_user", "1/minute"),
+        patch(
+            "app.routes.persona.generate_persona",
+            new_callable=AsyncMock,
+            return_value={"persona": {"id": "persona-1"}, "id": "persona-1"},
+        ),
+    ):
+        headers = {"Idempotency-Key": "retry-1"}
+        first = client.post("/persona/create-persona", json=test_data, headers=headers)
+        replayed = client.post(
+            "/persona/create-persona", json=test_data, headers=headers
+        )
+        limited = client.post(
+            "/persona/create-persona",
+            json=test_data,
+            headers={"Idempotency-Key": "retry-2"},
+        )
+
+    assert first.status_code == 200
+    assert replayed.status_code == 200
+    assert replayed.headers[REPLAYED_HEADER] == "true"
+    assert limited.status_code == 429
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Generous enough for slow CI machines; eager Firecrawl and langchain imports
+# alone used to add about a second
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+# Modules that must only be imported when they are first needed
+LAZY_MODULES = ("firecrawl", "langchain", "langchain_core", "langsmith")
+
+
+def import_times() -> Dict[str, int]:
+    """Import app.main in a fresh interpreter and return cumulative times (us)."""
+    command = [sys.executable, "-X", "importtime", "-c", "import app.main"]
+    # The first run writes bytecode caches, the second one is measured
+    for _ in range(2):
+        result = subprocess.run(
+            command,
+            cwd=BACKEND_DIR,
+            env={**os.environ, "TESTING": "1"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_time_budget():
+    """Test importing the application stays cheap and creates no clients."""
+    times = import_times()
+
+    assert times["app.main"] / 1000 <= IMPORT_TIME_BUDGET_MS
+    eager = [name for name in times if name.split(".")[0] in LAZY_MODULES]
+    assert eager == []
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.jobs import JobQueueFull, PersonaJobRunner
+from app.models.persona import PersonaQuestionAnswer
+
+INITIAL_DATA = [
+    PersonaQuestionAnswer(
+        question_id="user_email",
+        question="What is your email?",
+        answer="test@example.com",
+    )
+]
+
+
+class FakeJobStore:
+    """In-memory stand-in for the persona job functions of app.utils.db."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    async def save_job(self, job):
+        self.jobs[job["id"]] = dict(job)
+
+    async def update_job(self, job_id, updates):
+        self.jobs[job_id].update(updates)
+
+    async def claim_job(self, job_id, worker_id, lease_seconds):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        lease_expired = (job.get("lease_expires_at") or 0) <= time.time()
+        if job["status"] == "queued" or (job["status"] == "running" and lease_expired):
+            job.update(
+                status="running",
+                worker_id=worker_id,
+                lease_expires_at=time.time() + lease_seconds,
+                attempts=job["attempts"] + 1,
+            )
+            return dict(job)
+        return None
+
+    async def list_unfinished_jobs(self, limit=100):
+        return [
+            dict(job)
+            for job in self.jobs.values()
+            if job["status"] in ("queued", "running")
+        ][:limit]
+
+
+@pytest.fixture
+def store():
+    store = FakeJobStore()
+    with (
+        patch("app.core.jobs.save_job", store.save_job),
+        patch("app.core.jobs.update_job", store.update_job),
+        patch("app.core.jobs.claim_job", store.claim_job),
+        patch("app.core.jobs.list_unfinished_jobs", store.list_unfinished_jobs),
+    ):
+        yield store
+
+
+@pytest.fixture
+def mock_generate_persona():
+    with patch("app.core.jobs.generate_persona", new_callable=AsyncMock) as mock:
+        mock.return_value = {"persona": {"id": "persona-1"}, "id": "persona-1"}
+        yield mock
+
+
+async def wait_for_status(store, job_id, status):
+    for _ in range(100):
+        if store.jobs[job_id]["status"] == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+@pytest.mark.asyncio
+async def test_submit_runs_job_in_background(store, mock_generate_persona):
+    """Test a submitted job is persisted, run and marked as succeeded."""
+    runner = PersonaJobRunner(workers=1, sweep_interval=60)
+
+    job = await runner.submit("test@example.com", INITIAL_DATA)
+    assert store.jobs[job["id"]]["status"] in ("queued", "running", "succeeded")
+
+    await wait_for_status(store, job["id"], "succeeded")
+    await runner.stop()
+
+    stored = store.jobs[job["id"]]
+    assert stored["result"] == {"persona": {"id": "persona-1"}, "id": "persona-1"}
+    assert stored["attempts"] == 1
+    mock_generate_persona.assert_awaited_once_with(INITIAL_DATA, "test@example.com")
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_marks_job_failed(store, mock_generate_persona):
+    """Test errors reported in the persona result fail the job."""
+    mock_generate_persona.return_value = {
+        "persona": {"error": "Failed to generate persona", "message": "boom"},
+        "id": None,
+    }
+    runner = PersonaJobRunner(workers=1, sweep_interval=60)
+
+    job = await runner.submit("test@example.com", INITIAL_DATA)
+    await wait_for_status(store, job["id"], "failed")
+    await runner.stop()
+
+    assert store.jobs[job["id"]]["error"] == "Failed to generate persona: boom"
+
+
+@pytest.mark.asyncio
+async def test_recover_requeues_jobs_with_expired_leases(store):
+    """Test queued jobs and jobs of dead workers are recovered on startup."""
+    runner = PersonaJobRunner(workers=1)
+    runner._queue = asyncio.Queue()
+    base = {"attempts": 1, "initial_data": [], "user_email": "a@example.com"}
+    store.jobs = {
+        "queued": {**base, "id": "queued", "status": "queued"},
+        "dead": {
+            **base,
+            "id": "dead",
+            "status": "running",
+            "lease_expires_at": time.time() - 1,
+        },
+        "alive": {
+            **base,
+            "id": "alive",
+            "status": "running",
+            "lease_expires_at": time.time() + 60,
+        },
+        "done": {**base, "id": "done", "status": "succeeded"},
+    }
+
+    assert await runner.recover() == 2
+    assert runner._pending == {"queued", "dead"}
+
+    # Recovering again does not queue the same jobs twice
+    assert await runner.recover() == 0
+
+
+@pytest.mark.asyncio
+async def test_run_job_skips_jobs_claimed_elsewhere(store, mock_generate_persona):
+    """Test a job running under a live lease is not run twice."""
+    runner = PersonaJobRunner(workers=1)
+    store.jobs["job-1"] = {
+        "id": "job-1",
+        "status": "running",
+        "attempts": 1,
+        "lease_expires_at": time.time() + 60,
+    }
+
+    await runner.run_job("job-1")
+
+    mock_generate_persona.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stop_releases_running_jobs(store, mock_generate_persona):
+    """Test jobs interrupted by shutdown go back to the queued state."""
+    started = asyncio.Event()
+
+    async def slow_generation(*args):
+        started.set()
+        await asyncio.sleep(60)
+
+    mock_generate_persona.side_effect = slow_generation
+    runner = PersonaJobRunner(workers=1, sweep_interval=60)
+
+    job = await runner.submit("test@example.com", INITIAL_DATA)
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await runner.stop()
+
+    assert store.jobs[job["id"]]["status"] == "queued"
+    assert store.jobs[job["id"]]["lease_expires_at"] is None
+
+
+@pytest.mark.asyncio
+async def test_submit_when_queue_full(store):
+    """Test submissions are rejected once the queue is full."""
+    runner = PersonaJobRunner(workers=0, queue_size=1, sweep_interval=60)
+
+    await runner.submit("test@example.com", INITIAL_DATA)
+    with pytest.raises(JobQueueFull):
+        await runner.submit("test@example.com", INITIAL_DATA)
+
+    await runner.stop()
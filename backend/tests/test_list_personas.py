@@ -1,12 +1,13 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 
 import pytest
+from firebase_admin import firestore
 
 from app.utils.db import list_personas
 
 
 @pytest.mark.asyncio
-@patch("app.utils.db.get_firestore_client")
+@patch("app.utils.db.get_async_firestore_client")
 @patch("app.utils.db.convert_to_serializable")
 async def test_list_personas_with_user_id(mock_convert, mock_get_client):
     """Test list_personas function with a specific user_id."""
@@ -22,7 +23,7 @@ async def test_list_personas_with_user_id(mock_convert, mock_get_client):
     mock_query.where.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.limit.return_value = mock_query
-    mock_query.stream.return_value = [mock_doc1, mock_doc2]
+    mock_query.stream.return_value.__aiter__.return_value = [mock_doc1, mock_doc2]
     
     # Mock the collection
     mock_collection = MagicMock()
@@ -43,7 +44,10 @@ async def test_list_personas_with_user_id(mock_convert, mock_get_client):
     mock_get_client.assert_called_once()
     mock_collection.assert_called_once_with("personas")
     mock_query.where.assert_called_once_with("user_id", "==", "test-user")
-    mock_query.order_by.assert_called_once()
+    assert mock_query.order_by.call_args_list == [
+        call("created_at", direction=firestore.Query.DESCENDING),
+        call("__name__", direction=firestore.Query.DESCENDING),
+    ]
     mock_query.limit.assert_called_once_with(10)
     mock_query.stream.assert_called_once()
     
@@ -57,7 +61,7 @@ async def test_list_personas_with_user_id(mock_convert, mock_get_client):
 
 
 @pytest.mark.asyncio
-@patch("app.utils.db.get_firestore_client")
+@patch("app.utils.db.get_async_firestore_client")
 @patch("app.utils.db.convert_to_serializable")
 async def test_list_personas_without_user_id(mock_convert, mock_get_client):
     """Test list_personas function without user_id (no filtering)."""
@@ -72,7 +76,7 @@ async def test_list_personas_without_user_id(mock_convert, mock_get_client):
     mock_query = MagicMock()
     mock_query.order_by.return_value = mock_query
     mock_query.limit.return_value = mock_query
-    mock_query.stream.return_value = [mock_doc1, mock_doc2]
+    mock_query.stream.return_value.__aiter__.return_value = [mock_doc1, mock_doc2]
     
     # Mock the collection
     mock_collection = MagicMock()
@@ -93,7 +97,10 @@ async def test_list_personas_without_user_id(mock_convert, mock_get_client):
     mock_get_client.assert_called_once()
     mock_collection.assert_called_once_with("personas")
     mock_query.where.assert_not_called()  # Should not be called without user_id
-    mock_query.order_by.assert_called_once()
+    assert mock_query.order_by.call_args_list == [
+        call("created_at", direction=firestore.Query.DESCENDING),
+        call("__name__", direction=firestore.Query.DESCENDING),
+    ]
     mock_query.limit.assert_called_once_with(5)
     mock_query.stream.assert_called_once()
     
@@ -107,7 +114,7 @@ async def test_list_personas_without_user_id(mock_convert, mock_get_client):
 
 
 @pytest.mark.asyncio
-@patch("app.utils.db.get_firestore_client")
+@patch("app.utils.db.get_async_firestore_client")
 @patch("app.utils.db.convert_to_serializable")
 async def test_list_personas_empty_result(mock_convert, mock_get_client):
     """Test list_personas function returning empty list."""
@@ -116,7 +123,7 @@ async def test_list_personas_empty_result(mock_convert, mock_get_client):
     mock_query.where.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.limit.return_value = mock_query
-    mock_query.stream.return_value = []  # Empty result
+    mock_query.stream.return_value.__aiter__.return_value = []  # Empty result
     
     # Mock the collection
     mock_collection = MagicMock()
@@ -134,7 +141,10 @@ async def test_list_personas_empty_result(mock_convert, mock_get_client):
     mock_get_client.assert_called_once()
     mock_collection.assert_called_once_with("personas")
     mock_query.where.assert_called_once_with("user_id", "==", "nonexistent-user")
-    mock_query.order_by.assert_called_once()
+    assert mock_query.order_by.call_args_list == [
+        call("created_at", direction=firestore.Query.DESCENDING),
+        call("__name__", direction=firestore.Query.DESCENDING),
+    ]
     mock_query.limit.assert_called_once_with(10)
     mock_query.stream.assert_called_once()
     
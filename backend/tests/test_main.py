@@ -1,10 +1,12 @@
 import os
+from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 
 # Mock environment variables for testing
 os.environ["OPENAI_API_KEY"] = "sk-test-key"
 
+from app.core.config import get_settings
 from app.main import app
 
 client = TestClient(app)
@@ -25,29 +27,15 @@ def test_health_check():
 
 
 def test_health_check_missing_env_vars():
-    # Save the current environment variable
-    original_env = os.environ.get("OPENAI_API_KEY")
-    
-    try:
-        # Remove the required environment variable
-        if "OPENAI_API_KEY" in os.environ:
-            del os.environ["OPENAI_API_KEY"]
-            
+    # Remove the required setting
+    with patch.object(get_settings(), "openai_api_key", None):
         # Make the request
         response = client.get("/health")
-        
-        # Check for error response
-        assert response.status_code == 500
-        assert "Missing required environment variables" in response.json()["detail"]
-        assert "OPENAI_API_KEY" in response.json()["detail"]
-        
-    finally:
-        # Restore the environment variable
-        if original_env is not None:
-            os.environ["OPENAI_API_KEY"] = original_env
-        else:
-            # Make sure we set it to something for other tests
-            os.environ["OPENAI_API_KEY"] = "sk-test-key"
+
+    # Check for error response
+    assert response.status_code == 500
+    assert "Missing required environment variables" in response.json()["detail"]
+    assert "OPENAI_API_KEY" in response.json()["detail"]
 
 
 def test_api_info():
@@ -0,0 +1,87 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.utils.http import POST_WEBHOOK, post_webhook
+from app.utils.metrics import (
+    STORAGE_OPERATION_DURATION,
+    UPSTREAM_ERRORS,
+    MetricsRegistry,
+)
+from app.utils.repository import InstrumentedRepository, MemoryRepository
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test histograms follow the Prometheus text format."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "job_seconds", "Job time.", ("name",), buckets=(0.1, 1.0)
+    )
+
+    histogram.labels('say "hi"').observe(0.05)
+    histogram.labels('say "hi"').observe(0.5)
+    histogram.labels('say "hi"').observe(5)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP job_seconds Job time.", "# TYPE job_seconds histogram"]
+    assert 'job_seconds_bucket{name="say \\"hi\\"",le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{name="say \\"hi\\"",le="1"} 2' in lines
+    assert 'job_seconds_bucket{name="say \\"hi\\"",le="+Inf"} 3' in lines
+    assert 'job_seconds_sum{name="say \\"hi\\""} 5.55' in lines
+    assert 'job_seconds_count{name="say \\"hi\\""} 3' in lines
+
+
+def test_collectors_are_read_at_render_time():
+    """Test collector values are rendered with their labels."""
+    registry = MetricsRegistry()
+    registry.add_collector(
+        lambda: [("queue_depth", "gauge", "Queued items.", [({"queue": "a"}, 3)])]
+    )
+
+    assert 'queue_depth{queue="a"} 3' in registry.render()
+
+
+def test_metrics_endpoint_reports_routes(client):
+    """Test requests are timed by route template, not by raw path."""
+    client.get("/questions")
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/questions",'
+        'status="200"}' in body
+    )
+    assert 'route="unmatched",status="404"' in body
+    assert "http_requests_in_flight 1" in body
+    assert 'cache_hit_ratio{cache="persona"}' in body
+    assert 'singleflight_executions_total{group="post"}' in body
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_status_is_counted():
+    """Test error responses of a webhook are counted by status."""
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=MagicMock(status_code=502))
+    errors = UPSTREAM_ERRORS.labels(POST_WEBHOOK, "http_502")
+    before = errors.value
+
+    with patch("app.utils.http.get_http_client", return_value=mock_client):
+        await post_webhook(POST_WEBHOOK, "https://example.com", {})
+
+    assert errors.value == before + 1
+
+
+@pytest.mark.asyncio
+async def test_instrumented_repository_times_operations():
+    """Test storage operations are timed under their own name."""
+    repository = InstrumentedRepository(MemoryRepository(), "test")
+
+    await repository.save_post({"id": "p1"})
+    assert (await repository.get_post("p1"))["id"] == "p1"
+
+    timings = STORAGE_OPERATION_DURATION.labels("test", "get_post")
+    assert sum(timings.counts) == 1
@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils.pagination import (
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_cursor_round_trip():
+    """Test a cursor decodes to the timestamp and ID it was built from."""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(created_at, "post-1")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "post-1")
+
+
+def test_encode_cursor_accepts_iso_strings():
+    """Test timestamps that were already serialized can be encoded."""
+    cursor = encode_cursor("2024-05-01T12:30:15")
+
+    assert decode_cursor(cursor) == (datetime(2024, 5, 1, 12, 30, 15), None)
+
+
+def test_encode_cursor_without_timestamp():
+    """Test documents without a timestamp produce no cursor."""
+    assert encode_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["garbage!", "e30", "eyJjcmVhdGVkX2F0IjogMX0"])
+def test_decode_invalid_cursor(cursor):
+    """Test malformed cursors raise ValueError."""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_clamp_page_size():
+    """Test page sizes are kept within 1..MAX_PAGE_SIZE."""
+    assert clamp_page_size(0) == 1
+    assert clamp_page_size(25) == 25
+    assert clamp_page_size(10**6) == get_settings().max_page_size
+
+    with patch.object(get_settings(), "max_page_size", 10):
+        assert clamp_page_size(25) == 10
@@ -1,9 +1,11 @@
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.jobs import JobQueueFull
 from app.models.persona import PersonaQuestionAnswer
+from app.routes.persona import PERSONA_LIST_FIELDS
 
 
 @pytest.fixture
@@ -40,22 +42,25 @@ def mock_get_persona_by_id():
 @pytest.fixture
 def mock_list_personas():
     """Mock the list_personas function."""
-    with patch("app.routes.persona.db_list_personas") as mock_func:
+    with patch("app.routes.persona.list_personas_page") as mock_func:
         # Mock a successful personas list retrieval
-        mock_func.return_value = [
-            {
-                "id": "test-id-123",
-                "persona_summary": "### Test Persona 1\n**Software Engineer**",
-                "goals": ["Thought Leadership"],
-                "created_at": "2022-01-01T00:00:00.000000",
-            },
-            {
-                "id": "test-id-456",
-                "persona_summary": "### Test Persona 2\n**Product Manager**",
-                "goals": ["Networking"],
-                "created_at": "2022-01-02T00:00:00.000000",
-            },
-        ]
+        mock_func.return_value = (
+            [
+                {
+                    "id": "test-id-123",
+                    "persona_summary": "### Test Persona 1\n**Software Engineer**",
+                    "goals": ["Thought Leadership"],
+                    "created_at": "2022-01-01T00:00:00.000000",
+                },
+                {
+                    "id": "test-id-456",
+                    "persona_summary": "### Test Persona 2\n**Product Manager**",
+                    "goals": ["Networking"],
+                    "created_at": "2022-01-02T00:00:00.000000",
+                },
+            ],
+            None,
+        )
         yield mock_func
 
 
@@ -150,6 +155,24 @@ def test_get_persona(client: TestClient, mock_get_persona_by_id):
     mock_get_persona_by_id.assert_awaited_once_with("test-id-123")
 
 
+def test_get_persona_conditional(client: TestClient, mock_get_persona_by_id):
+    """Test a persona revalidated with its ETag is answered with 304."""
+    first = client.get("/persona/test-id-123")
+    etag = first.headers["ETag"]
+
+    cached = client.get("/persona/test-id-123", headers={"If-None-Match": etag})
+    mock_get_persona_by_id.return_value = {
+        **mock_get_persona_by_id.return_value,
+        "goals": ["Networking"],
+    }
+    changed = client.get("/persona/test-id-123", headers={"If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
 def test_get_persona_not_found(client: TestClient, mock_get_persona_by_id):
     """Test the get_persona endpoint when persona not found."""
     # Mock not found
@@ -183,4 +206,122 @@ def test_list_personas(client: TestClient, mock_list_personas):
     assert "persona_summary" in json_response[0]
     
     # Verify mock was called with correct parameters
-    mock_list_personas.assert_awaited_once_with("test-user", 10)
\ No newline at end of file
+    mock_list_personas.assert_awaited_once_with(
+        "test-user", 10, None, PERSONA_LIST_FIELDS
+    )
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_personas_with_cursor(client: TestClient, mock_list_personas):
+    """Test the cursor is forwarded and the next cursor returned in a header."""
+    mock_list_personas.return_value = (
+        mock_list_personas.return_value[0],
+        "next-cursor",
+    )
+
+    response = client.get("/persona?limit=1000&cursor=abc")
+
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == "next-cursor"
+    mock_list_personas.assert_awaited_once_with(
+        None, 100, "abc", PERSONA_LIST_FIELDS
+    )
+
+def test_list_personas_fields(client: TestClient, mock_list_personas):
+    """Test the fields parameter selects fields and rejects unknown ones."""
+    response = client.get("/persona?fields=persona_summary,goals")
+    invalid = client.get("/persona?fields=persona_summary,secret")
+
+    assert response.status_code == 200
+    mock_list_personas.assert_awaited_once_with(
+        None, 10, None, ["id", "persona_summary", "goals"]
+    )
+    assert invalid.status_code == 400
+    assert invalid.json()["detail"] == "Unknown fields: secret"
+
+
+def test_create_persona_job_mode(client: TestClient):
+    """Test job mode returns 202 with a job ID and status URL."""
+    with patch("app.routes.persona.persona_jobs") as mock_jobs:
+        mock_jobs.submit = AsyncMock(return_value={"id": "job-1", "status": "queued"})
+
+        response = client.post(
+            "/persona/create-persona?mode=job",
+            json={"user_email": "test@example.com", "initial_data": []},
+        )
+
+    assert response.status_code == 202
+    assert response.json() == {
+        "job_id": "job-1",
+        "status": "queued",
+        "status_url": "/persona/jobs/job-1",
+    }
+    assert response.headers["Location"] == "/persona/jobs/job-1"
+    mock_jobs.submit.assert_awaited_once_with("test@example.com", [])
+
+
+def test_create_persona_job_mode_queue_full(client: TestClient):
+    """Test job mode sheds load when the job queue is full."""
+    with patch("app.routes.persona.persona_jobs") as mock_jobs:
+        mock_jobs.submit = AsyncMock(side_effect=JobQueueFull("Too many"))
+
+        response = client.post(
+            "/persona/create-persona?mode=job",
+            json={"user_email": "test@example.com", "initial_data": []},
+        )
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_get_persona_job(client: TestClient):
+    """Test the job status endpoint returns the stored job."""
+    job = {
+        "id": "job-1",
+        "status": "succeeded",
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:30",
+        "attempts": 1,
+        "result": {"persona": {"id": "persona-1"}, "id": "persona-1"},
+        "error": None,
+        "initial_data": [],
+        "lease_expires_at": None,
+    }
+    with patch("app.routes.persona.get_job", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = job
+
+        response = client.get("/persona/jobs/job-1")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "succeeded"
+    assert body["result"]["id"] == "persona-1"
+    assert "initial_data" not in body
+
+
+def test_get_persona_job_not_found(client: TestClient):
+    """Test an unknown job ID returns 404."""
+    with patch("app.routes.persona.get_job", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = None
+
+        response = client.get("/persona/jobs/missing")
+
+    assert response.status_code == 404
+
+
+def test_prefetch_blog(client: TestClient):
+    """Test the blog prefetch endpoint starts the analysis in the background."""
+    with patch(
+        "app.routes.persona.prefetch_blog_analysis", new_callable=AsyncMock
+    ) as mock_prefetch:
+        mock_prefetch.return_value = "started"
+
+        response = client.post(
+            "/persona/blog-prefetch", json={"blog_url": "https://example.com/blog"}
+        )
+        empty = client.post("/persona/blog-prefetch", json={"blog_url": ""})
+
+    assert response.status_code == 202
+    assert response.json() == {"status": "started"}
+    mock_prefetch.assert_awaited_once_with("https://example.com/blog")
+    assert empty.status_code == 422
@@ -0,0 +1,153 @@
+import sqlite3
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils.rate_limit import (
+    MemoryRateLimitStore,
+    Rate,
+    RateLimitCostTooHigh,
+    RateLimiter,
+    RateLimitExceeded,
+    SQLiteRateLimitStore,
+    parse_rate,
+    take_tokens,
+)
+
+
+def test_parse_rate():
+    """Test rates are read as a count per period."""
+    rate = parse_rate("30/minute")
+
+    assert (rate.capacity, rate.period) == (30, 60)
+    assert parse_rate("0") is None
+    with pytest.raises(ValueError):
+        parse_rate("30/fortnight")
+
+
+def test_bucket_refills_over_time():
+    """Test a bucket allows a burst, then refills at its rate."""
+    rate = Rate(2, 10)
+
+    state, wait = take_tokens(None, rate, 1, now=0)
+    state, wait = take_tokens(state, rate, 1, now=0)
+    assert wait == 0
+    state, wait = take_tokens(state, rate, 1, now=1)
+    assert wait == pytest.approx(4)
+    state, wait = take_tokens(state, rate, 1, now=5)
+    assert wait == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_reports_the_exceeded_limit():
+    """Test the IP and user buckets are counted separately."""
+    limiter = RateLimiter(
+        MemoryRateLimitStore(), {"post": {"user": Rate(1, 60), "ip": Rate(5, 60)}}
+    )
+
+    await limiter.check("post", user="alice", client_ip="10.0.0.1")
+    await limiter.check("post", user="bob", client_ip="10.0.0.1")
+    await limiter.check("post", user="anonymous", client_ip="10.0.0.1")
+    with pytest.raises(RateLimitExceeded) as error:
+        await limiter.check("post", user="alice", client_ip="10.0.0.1")
+
+    assert error.value.scope == "user"
+    assert error.value.retry_after == 60
+
+
+@pytest.mark.asyncio
+async def test_rejected_request_takes_no_tokens():
+    """Test a request the user bucket rejects leaves the IP bucket untouched."""
+    limiter = RateLimiter(
+        MemoryRateLimitStore(), {"post": {"user": Rate(1, 60), "ip": Rate(2, 60)}}
+    )
+
+    await limiter.check("post", user="alice", client_ip="10.0.0.1")
+    with pytest.raises(RateLimitExceeded):
+        await limiter.check("post", user="alice", client_ip="10.0.0.1")
+    await limiter.check("post", user="bob", client_ip="10.0.0.1")
+    with pytest.raises(RateLimitExceeded) as error:
+        await limiter.check("post", user="carol", client_ip="10.0.0.1")
+
+    assert error.value.scope == "ip"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_take_all_is_all_or_nothing(tmp_path):
+    """Test SQLite buckets are only charged when every bucket has tokens."""
+    store = SQLiteRateLimitStore(str(tmp_path / "rate_limits.sqlite3"))
+    ip, user = ("post:ip:10.0.0.1", Rate(2, 60)), ("post:user:alice", Rate(1, 60))
+
+    assert await store.take_all([ip, user]) is None
+    rejection = await store.take_all([ip, user])
+
+    assert rejection[0] == 1
+    assert await store.take(*ip) == 0
+
+
+@pytest.mark.asyncio
+async def test_sqlite_buckets_are_shared(tmp_path):
+    """Test workers using the same file share one bucket."""
+    path = str(tmp_path / "rate_limits.sqlite3")
+    first, second = SQLiteRateLimitStore(path), SQLiteRateLimitStore(path)
+    rate = Rate(2, 60)
+
+    assert await first.take("post:user:alice", rate) == 0
+    assert await second.take("post:user:alice", rate) == 0
+    assert await first.take("post:user:alice", rate) == pytest.approx(30, abs=1)
+    assert await second.take("post:user:bob", rate) == 0
+
+
+@pytest.mark.asyncio
+async def test_sqlite_prunes_refilled_buckets(tmp_path):
+    """Test buckets that have refilled are removed from the file."""
+    path = tmp_path / "rate_limits.sqlite3"
+    store = SQLiteRateLimitStore(str(path))
+    rate = Rate(2, 60)
+
+    with patch("app.utils.rate_limit.time.time", return_value=0):
+        await store.take("post:user:alice", rate)
+    with patch("app.utils.rate_limit.time.time", return_value=80):
+        await store.take("post:user:bob", rate)
+    with patch("app.utils.rate_limit.time.time", return_value=90):
+        await store.take("post:user:carol", rate)
+
+    with sqlite3.connect(path) as conn:
+        keys = {row[0] for row in conn.execute("SELECT key FROM rate_limits")}
+    assert keys == {"post:user:bob", "post:user:carol"}
+
+
+@pytest.mark.asyncio
+async def test_cost_over_capacity_is_rejected():
+    """Test a batch bigger than the bucket is refused rather than capped."""
+    limiter = RateLimiter(MemoryRateLimitStore(), {"post": {"user": Rate(2, 60)}})
+
+    with pytest.raises(RateLimitCostTooHigh) as error:
+        await limiter.check("post", user="alice", client_ip="10.0.0.1", cost=3)
+    await limiter.check("post", user="alice", client_ip="10.0.0.1", cost=2)
+
+    assert (error.value.scope, error.value.capacity) == ("user", 2)
+
+
+def test_persona_creation_is_limited_per_user(client):
+    """Test a user over the limit gets 429 with Retry-After."""
+    body = {"user_email": "alice@example.com", "initial_data": []}
+
+    with (
+        patch.object(get_settings(), "rate_limit_persona_per_user", "1/hour"),
+        patch(
+            "app.routes.persona.generate_persona",
+            new=AsyncMock(return_value={"persona": {}, "id": "p1"}),
+        ),
+    ):
+        first = client.post("/persona/create-persona", json=body)
+        second = client.post("/persona/create-persona", json=body)
+        other = client.post(
+            "/persona/create-persona", json={**body, "user_email": "bob@example.com"}
+        )
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "3600"
+    assert other.status_code == 200
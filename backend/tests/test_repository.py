@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from firebase_admin import firestore
+
+from app.core.config import get_settings
+from app.utils import db
+from app.utils.db import list_posts_page, save_posts
+from app.utils.repository import (
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    InstrumentedRepository,
+    MemoryRepository,
+    Repository,
+    SQLiteRepository,
+)
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    """Return an empty repository of each local backend."""
+    if request.param == "sqlite":
+        return SQLiteRepository(str(tmp_path / "storage.sqlite3"))
+    return MemoryRepository()
+
+
+def make_post(number, user_id="alice@example.com"):
+    return {
+        "id": f"post-{number}",
+        "user_id": user_id,
+        "created_at": START + timedelta(minutes=number),
+        "suggestions": [f"Post {number}"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_list_newest_first_with_filter_and_limit(repository):
+    """Test listing matches the Firestore query used by list endpoints."""
+    await repository.save_posts([make_post(n) for n in range(5)])
+    await repository.save_post(make_post(9, user_id="bob@example.com"))
+    await repository.save_post({"id": "undated", "user_id": "alice@example.com"})
+
+    newest = await repository.list_posts(limit=3)
+    alice = await repository.list_posts(user_id="alice@example.com", limit=10)
+
+    assert [post["id"] for post in newest] == ["post-9", "post-4", "post-3"]
+    assert [post["id"] for post in alice] == [f"post-{n}" for n in (4, 3, 2, 1, 0)]
+    assert alice[0]["created_at"] == START + timedelta(minutes=4)
+
+
+@pytest.mark.asyncio
+async def test_pages_follow_cursor(repository):
+    """Test the cursor of a page continues with the next older documents."""
+    await repository.save_posts([make_post(n) for n in range(5)])
+
+    with patch.object(db, "_repository", repository):
+        first, cursor = await list_posts_page(limit=2)
+        second, cursor = await list_posts_page(limit=2, cursor=cursor)
+        last, cursor = await list_posts_page(limit=2, cursor=cursor)
+
+    assert [post["id"] for post in first + second + last] == [
+        f"post-{n}" for n in (4, 3, 2, 1, 0)
+    ]
+    assert cursor is None
+    assert first[0]["created_at"] == (START + timedelta(minutes=4)).isoformat()
+
+
+@pytest.mark.asyncio
+async def test_pages_keep_documents_with_equal_timestamps(repository):
+    """Test documents written in one commit are split across pages, not skipped."""
+    await repository.save_posts([{**make_post(0), "id": f"p{n}"} for n in range(5)])
+
+    with patch.object(db, "_repository", repository):
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = await list_posts_page(limit=2, cursor=cursor)
+            pages.append([post["id"] for post in page])
+            if cursor is None:
+                break
+
+    assert pages == [["p4", "p3"], ["p2", "p1"], ["p0"]]
+
+
+@pytest.mark.asyncio
+async def test_list_selects_fields(repository):
+    """Test a field selection returns only those fields of each document."""
+    await repository.save_posts([make_post(n) for n in range(2)])
+
+    posts = await repository.list_posts(fields=["id", "missing"])
+
+    assert posts == [{"id": "post-1"}, {"id": "post-0"}]
+
+
+@pytest.mark.asyncio
+async def test_raw_request_is_stored_apart(repository):
+    """Test an audited raw_request is kept out of the post document."""
+    raw_request = {"request": {"persona": {"id": "persona-1"}}}
+    await repository.save_post({**make_post(1), "raw_request": raw_request})
+    await repository.save_post(make_post(2))
+
+    post = await repository.get_post("post-1")
+    audit = await repository.get_post_request("post-1")
+
+    assert "raw_request" not in post
+    assert audit["raw_request"] == raw_request
+    assert await repository.get_post_request("post-2") is None
+
+
+@pytest.mark.asyncio
+async def test_server_timestamp_is_resolved(repository):
+    """Test SERVER_TIMESTAMP is stored as the write time."""
+    persona = {"id": "p1", "name": "Jane", "created_at": firestore.SERVER_TIMESTAMP}
+
+    await repository.save_persona(persona)
+    stored = await repository.get_persona("p1")
+
+    assert isinstance(stored["created_at"], datetime)
+    assert persona["created_at"] is firestore.SERVER_TIMESTAMP
+    assert [p["id"] for p in await repository.list_personas()] == ["p1"]
+
+
+@pytest.mark.asyncio
+async def test_returned_documents_are_copies(repository):
+    """Test changing a returned document does not change the stored one."""
+    await repository.save_post(make_post(1))
+
+    post = await repository.get_post("post-1")
+    post["suggestions"].append("changed")
+
+    assert (await repository.get_post("post-1"))["suggestions"] == ["Post 1"]
+    assert await repository.get_post("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_job_claims(repository):
+    """Test a job is claimed once and listed until it finishes."""
+    await repository.save_job({"id": "j1", "status": JOB_QUEUED, "attempts": 0})
+
+    claimed = await repository.claim_job("j1", "worker-1", 300)
+    again = await repository.claim_job("j1", "worker-2", 300)
+    unfinished = await repository.list_unfinished_jobs()
+    await repository.update_job("j1", {"status": JOB_SUCCEEDED})
+
+    assert claimed["status"] == JOB_RUNNING
+    assert claimed["attempts"] == 1
+    assert again is None
+    assert [job["id"] for job in unfinished] == ["j1"]
+    assert await repository.list_unfinished_jobs() == []
+    assert await repository.claim_job("missing", "worker-1", 300) is None
+
+
+@pytest.mark.asyncio
+async def test_idempotency_keys(repository):
+    """Test a key is reserved, completed and released."""
+    assert await repository.claim_idempotency_key("k1", "fp", 300) is None
+    running = await repository.claim_idempotency_key("k1", "fp", 300)
+    await repository.complete_idempotency_key("k1", {"status_code": 200}, 60)
+    completed = await repository.claim_idempotency_key("k1", "fp", 300)
+    await repository.release_idempotency_key("k1")
+
+    assert running["fingerprint"] == "fp"
+    assert completed["response"] == {"status_code": 200}
+    assert await repository.claim_idempotency_key("k1", "fp", 300) is None
+
+
+@pytest.mark.asyncio
+async def test_storage_backend_setting_selects_repository():
+    """Test STORAGE_BACKEND=memory keeps documents in process."""
+    with (
+        patch.object(get_settings(), "storage_backend", "memory"),
+        patch.object(db, "_repository", None),
+    ):
+        await save_posts([make_post(1)])
+        posts, _ = await list_posts_page()
+
+        assert isinstance(db.get_repository().repository, MemoryRepository)
+
+    assert [post["id"] for post in posts] == ["post-1"]
+
+
+def test_backend_must_implement_every_operation():
+    """Test an incomplete backend fails when created, not on first use."""
+
+    class PartialRepository(Repository):
+        async def get_persona(self, persona_id):
+            return None
+
+    with pytest.raises(TypeError, match="save_persona"):
+        PartialRepository()
+
+    instrumented = InstrumentedRepository(MemoryRepository(), "memory")
+    assert isinstance(instrumented, Repository)
+    assert callable(instrumented.release_idempotency_key)
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi import Response
+
+from app.core.config import get_settings
+from app.core.constants import PERSONA_CREATION_QUESTIONS
+from app.routes.post import PostResponse
+from app.utils.responses import (
+    FastJSONResponse,
+    dump_json,
+    etag_matches,
+    trusted_response,
+)
+
+POST = {
+    "id": "post-1",
+    "user_id": "test@example.com",
+    "created_at": "2025-01-01T12:00:00",
+    "platform": "LinkedIn",
+    "content_type": "Post",
+    "tone": "Professional",
+    "suggestions": ["Post 1"],
+    "raw_request": {"request": {}},
+}
+
+
+def test_dump_json_handles_datetimes_and_models():
+    """Test orjson output falls back to FastAPI encoding for unknown types."""
+    body = dump_json(
+        {"at": datetime(2025, 1, 1, 12, 0), "post": PostResponse(**POST), 1: "a"}
+    )
+
+    data = json.loads(body)
+    assert data["at"] == "2025-01-01T12:00:00"
+    assert data["post"]["id"] == "post-1"
+    assert data["1"] == "a"
+
+
+def test_trusted_response_is_passthrough_by_default():
+    """Test content is left to FastAPI unless fast responses are enabled."""
+    assert trusted_response([POST], model=PostResponse) == [POST]
+
+
+def test_trusted_response_projects_onto_model():
+    """Test the fast path keeps model fields, defaults and route headers."""
+    route_response = Response()
+    route_response.headers["X-Next-Cursor"] = "abc"
+
+    with patch.object(get_settings(), "fast_json_responses", True):
+        result = trusted_response([POST], route_response, model=PostResponse)
+
+    assert isinstance(result, FastJSONResponse)
+    assert result.headers["x-next-cursor"] == "abc"
+    [post] = json.loads(result.body)
+    assert "raw_request" not in post
+    assert post["persona_id"] is None
+    assert post["request_details"] is None
+    assert post == PostResponse(**POST).model_dump()
+
+
+def test_questions_body_matches_constants(client):
+    """Test the cached questions body holds the configured questions."""
+    response = client.get("/questions")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"questions": PERSONA_CREATION_QUESTIONS}
+
+
+def test_etag_matches_if_none_match_lists():
+    """Test If-None-Match lists, weak tags and the wildcard."""
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_questions_are_revalidated_with_etag(client):
+    """Test the questions catalog answers a matching If-None-Match with 304."""
+    first = client.get("/questions")
+    cached = client.get("/questions", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.headers["Cache-Control"].startswith("public")
+    assert cached.status_code == 304
+    assert cached.content == b""
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.utils.scrape_cache import BlogAnalysisCache, cache_key, normalize_url
+
+SAMPLE_ANALYSIS = {
+    "writing_style": "Professional",
+    "tone_of_voice": "Informative",
+    "values": ["Education"],
+    "preferred_formats": ["Articles"],
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BlogAnalysisCache(path=str(tmp_path / "nested" / "cache.sqlite3"), ttl=60)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://example.com/blog",
+        "HTTPS://Example.com/blog/",
+        "https://example.com:443/blog#latest",
+        "example.com/blog",
+    ],
+)
+def test_normalize_url_equivalent_spellings(url):
+    """Test equivalent spellings of a URL normalize to the same value."""
+    assert normalize_url(url) == "https://example.com/blog"
+
+
+def test_normalize_url_sorts_query():
+    """Test query parameters are sorted."""
+    assert (
+        normalize_url("https://example.com/?b=2&a=1") == "https://example.com?a=1&b=2"
+    )
+
+
+def test_cache_key_depends_on_version():
+    """Test a new extraction version gets a new cache key."""
+    assert cache_key("https://example.com", "v1") != cache_key(
+        "https://example.com", "v2"
+    )
+
+
+def test_set_and_get(cache):
+    """Test a stored analysis is found again under an equivalent URL."""
+    cache.set("https://example.com/blog", "v1", SAMPLE_ANALYSIS)
+
+    assert cache.get("https://EXAMPLE.com/blog/", "v1") == SAMPLE_ANALYSIS
+    assert cache.get("https://example.com/blog", "v2") is None
+
+
+def test_entries_survive_new_instances(cache):
+    """Test the cache is persistent and shared through the database file."""
+    cache.set("https://example.com/blog", "v1", SAMPLE_ANALYSIS)
+
+    other = BlogAnalysisCache(path=cache.path, ttl=60)
+
+    assert other.get("https://example.com/blog", "v1") == SAMPLE_ANALYSIS
+
+
+def test_expired_entries(cache):
+    """Test entries older than the TTL are ignored and purged."""
+    with patch("app.utils.scrape_cache.time.time", return_value=1000.0):
+        cache.set("https://example.com/blog", "v1", SAMPLE_ANALYSIS)
+
+    with patch("app.utils.scrape_cache.time.time", return_value=1061.0):
+        assert cache.get("https://example.com/blog", "v1") is None
+        assert cache.purge_expired() == 1
+
+
+def test_disabled_cache(tmp_path):
+    """Test a zero TTL disables the cache without creating a database."""
+    path = tmp_path / "cache.sqlite3"
+    cache = BlogAnalysisCache(path=str(path), ttl=0)
+
+    cache.set("https://example.com/blog", "v1", SAMPLE_ANALYSIS)
+
+    assert cache.get("https://example.com/blog", "v1") is None
+    assert not path.exists()
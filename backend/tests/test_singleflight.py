@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, request_key
+
+
+def test_request_key_ignores_key_order():
+    """Test equal bodies produce equal keys whatever their key order."""
+    first = request_key("post", {"platform": "linkedin", "tone": "casual"})
+    second = request_key("post", {"tone": "casual", "platform": "linkedin"})
+
+    assert first == second
+    assert first != request_key("persona", {"platform": "linkedin", "tone": "casual"})
+    assert first != request_key("post", {"platform": "x", "tone": "casual"})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test identical concurrent calls run once and receive the same result."""
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"value": 42}
+
+    tasks = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.in_flight == 1
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert results == [{"value": 42}] * 3
+    assert flight.stats() == {"executions": 1, "coalesced": 2, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_shared_and_not_cached():
+    """Test a failure reaches every waiter and the next call runs again."""
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise ValueError("boom")
+
+    tasks = [asyncio.create_task(flight.do("key", failing)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def succeeding():
+        return "ok"
+
+    assert await flight.do("key", succeeding) == "ok"
+    assert flight.executions == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """Test a disconnecting leader leaves the shared call running."""
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("key", work))
+    follower = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == "done"
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_generate_persona_coalesces_identical_requests():
+    """Test concurrent identical persona requests run generation once."""
+    from app.core import agents
+    from app.models.persona import PersonaQuestionAnswer
+
+    initial_data = [
+        PersonaQuestionAnswer(
+            question_id="user_email",
+            question="What is your email?",
+            answer="test@example.com",
+        )
+    ]
+    release = asyncio.Event()
+
+    async def slow_generation(*args):
+        await release.wait()
+        return {"persona": {"id": "persona-1"}, "id": "persona-1"}
+
+    with patch(
+        "app.core.agents._generate_persona", new_callable=AsyncMock
+    ) as mock_generate:
+        mock_generate.side_effect = slow_generation
+        tasks = [
+            asyncio.create_task(
+                agents.generate_persona(initial_data, "test@example.com")
+            )
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+    assert results[0] == results[1]
+    mock_generate.assert_awaited_once_with(initial_data, "test@example.com")
@@ -0,0 +1,76 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from firebase_admin import firestore
+
+from app.routes.post import persona_version
+from scripts.slim_posts import slim_posts
+
+PERSONA = {"id": "persona-1", "persona_summary": "### Jane"}
+
+
+def make_doc(doc_id, data):
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.to_dict.return_value = data
+    return doc
+
+
+@pytest.fixture
+def mock_posts():
+    """Mock a posts collection with one fat and one slim post."""
+    fat = make_doc(
+        "post-1",
+        {"persona_id": "persona-1", "raw_request": {"request": {"persona": PERSONA}}},
+    )
+    slim = make_doc(
+        "post-2",
+        {"persona_id": "persona-1", "persona_version": persona_version(PERSONA)},
+    )
+
+    db = MagicMock()
+    query = db.collection.return_value.select.return_value.limit.return_value
+    query.stream.return_value.__aiter__.return_value = [fat, slim]
+    query.start_after.return_value.stream.return_value.__aiter__.return_value = []
+    db.batch.return_value.commit = AsyncMock()
+
+    with (
+        patch("scripts.slim_posts.get_async_firestore_client", return_value=db),
+        patch(
+            "scripts.slim_posts.get_persona_by_id",
+            new_callable=AsyncMock,
+            return_value=PERSONA,
+        ),
+    ):
+        yield MagicMock(db=db, fat=fat, slim=slim)
+
+
+@pytest.mark.asyncio
+async def test_slim_posts_drops_raw_request(mock_posts):
+    """Test only fat posts are rewritten, with their raw_request kept for audit."""
+    batch = mock_posts.db.batch.return_value
+
+    migrated = await slim_posts(audit=True)
+
+    assert migrated == 1
+    batch.update.assert_called_once_with(
+        mock_posts.fat.reference,
+        {
+            "raw_request": firestore.DELETE_FIELD,
+            "persona_version": persona_version(PERSONA),
+        },
+    )
+    audit_record = batch.set.call_args[0][1]
+    assert audit_record["raw_request"] == {"request": {"persona": PERSONA}}
+    batch.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_slim_posts_dry_run_writes_nothing(mock_posts):
+    """Test a dry run counts the posts to migrate without committing."""
+    batch = mock_posts.db.batch.return_value
+
+    assert await slim_posts(dry_run=True) == 1
+
+    batch.set.assert_not_called()
+    batch.commit.assert_not_awaited()
@@ -0,0 +1,50 @@
+import json
+
+from app.utils.streaming import SuggestionStreamParser
+
+
+def feed_all(parser, chunks):
+    """Feed chunks and collect the suggestions completed by each one."""
+    return [parser.feed(chunk) for chunk in chunks]
+
+
+def test_suggestions_emitted_as_they_complete():
+    """Test each suggestion is returned by the chunk that completes it."""
+    parser = SuggestionStreamParser()
+
+    results = feed_all(
+        parser,
+        ['```json\n{"post_sugg', 'estions": ["First', ' post", "Sec', 'ond"]}\n```'],
+    )
+
+    assert results == [[], [], ["First post"], ["Second"]]
+    assert parser.done
+    assert not parser.failed
+
+
+def test_escaped_characters():
+    """Test escaped quotes and unicode escapes are decoded."""
+    parser = SuggestionStreamParser()
+    body = json.dumps({"post_suggestions": ['Say "hi"\nthere', "café"]})
+
+    # Split in the middle of every escape sequence
+    results = feed_all(parser, [body[i : i + 3] for i in range(0, len(body), 3)])
+
+    assert [s for chunk in results for s in chunk] == ['Say "hi"\nthere', "café"]
+
+
+def test_non_string_elements_fail():
+    """Test the parser gives up on arrays that do not hold strings."""
+    parser = SuggestionStreamParser()
+
+    assert parser.feed('{"post_suggestions": [{"text": "a"}]}') == []
+    assert parser.done
+    assert parser.failed
+
+
+def test_missing_key():
+    """Test nothing is returned when the key never appears."""
+    parser = SuggestionStreamParser()
+
+    assert parser.feed('{"other": ["a", "b"]}') == []
+    assert not parser.done
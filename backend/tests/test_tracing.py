@@ -0,0 +1,148 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.utils.http import POST_WEBHOOK, post_webhook
+from app.utils.tracing import (
+    OTLPJSONExporter,
+    Tracer,
+    TracingMiddleware,
+    get_request_id,
+    span,
+)
+
+
+def read_spans(tracer, path):
+    """Return the spans of every exported line, in export order."""
+    tracer.exporter.flush()
+    spans = []
+    with open(path) as exported:
+        for line in exported:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+    return spans
+
+
+def test_sampled_trace_is_exported_with_parents(tmp_path):
+    """Test child spans are exported with the root once it ends."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(OTLPJSONExporter(str(path)), sample_rate=1.0)
+
+    with tracer.trace("job") as root:
+        with span("stage", step=2):
+            pass
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+
+    stage, failing, exported_root = read_spans(tracer, path)
+    assert exported_root["spanId"] == root.span_id
+    assert stage["parentSpanId"] == root.span_id
+    assert stage["traceId"] == exported_root["traceId"]
+    assert stage["attributes"] == [{"key": "step", "value": {"intValue": "2"}}]
+    assert failing["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_unsampled_trace_creates_no_spans(tmp_path):
+    """Test spans are skipped outside sampled traces."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(OTLPJSONExporter(str(path)), sample_rate=0.0)
+
+    with tracer.trace("job") as root, span("stage") as stage:
+        pass
+
+    tracer.exporter.flush()
+    assert root is None
+    assert stage is None
+    assert not path.exists()
+
+
+def test_incoming_traceparent_joins_the_callers_trace(tmp_path):
+    """Test a caller's trace is continued while the sampling stays local."""
+    path = tmp_path / "traces.jsonl"
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    sampled = f"00-{trace_id}-00f067aa0ba902b7-01"
+    unsampled = f"00-{trace_id}-00f067aa0ba902b7-00"
+
+    untrusted = Tracer(OTLPJSONExporter(str(path)), sample_rate=0.0)
+    with untrusted.trace("job", traceparent=sampled) as root:
+        assert root is None
+
+    tracer = Tracer(OTLPJSONExporter(str(path)), sample_rate=1.0)
+    with tracer.trace("job", traceparent=unsampled):
+        pass
+
+    (root,) = read_spans(tracer, path)
+    assert root["traceId"] == trace_id
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+
+
+def test_trusted_traceparent_decides_sampling(tmp_path):
+    """Test a trusted caller's sampled flag overrides the sample rate."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(OTLPJSONExporter(str(path)), sample_rate=0.0, trust_parent=True)
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    with tracer.trace("job", traceparent=f"00-{trace_id}-00f067aa0ba902b7-01"):
+        pass
+    with tracer.trace("job", traceparent=f"00-{trace_id}-00f067aa0ba902b7-00"):
+        pass
+
+    (root,) = read_spans(tracer, path)
+    assert root["traceId"] == trace_id
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+
+
+@pytest.mark.asyncio
+async def test_webhooks_receive_request_id_and_traceparent(tmp_path):
+    """Test outbound webhook calls carry the request and trace context."""
+    path = tmp_path / "traces.jsonl"
+    mock_client = MagicMock()
+    mock_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["request_id"] = get_request_id()
+        await post_webhook(POST_WEBHOOK, "https://hook.example.com/secret", {})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    tracer = Tracer(OTLPJSONExporter(str(path)), sample_rate=1.0)
+    middleware = TracingMiddleware(app, tracer)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/posts",
+        "headers": [(b"x-request-id", b"req-123")],
+    }
+    with patch("app.utils.http.get_http_client", return_value=mock_client):
+        await middleware(scope, AsyncMock(), send)
+
+    headers = mock_client.post.await_args.kwargs["headers"]
+    webhook, root = read_spans(tracer, path)
+    assert seen["request_id"] == "req-123"
+    assert headers["X-Request-ID"] == "req-123"
+    assert headers["traceparent"] == f"00-{root['traceId']}-{webhook['spanId']}-01"
+    assert (b"x-request-id", b"req-123") in sent[0]["headers"]
+    assert {"key": "server.address", "value": {"stringValue": "hook.example.com"}} in (
+        webhook["attributes"]
+    )
+    assert get_request_id() is None
+
+
+def test_request_id_is_generated_when_missing(client):
+    """Test responses carry a request ID even when none was sent."""
+    generated = client.get("/questions")
+    invalid = client.get("/questions", headers={"X-Request-ID": "bad id\x7f"})
+    given = client.get("/questions", headers={"X-Request-ID": "abc-1"})
+
+    assert len(generated.headers["X-Request-ID"]) == 32
+    assert invalid.headers["X-Request-ID"] != "bad id\x7f"
+    assert given.headers["X-Request-ID"] == "abc-1"
@@ -0,0 +1,109 @@
+import pytest
+
+from app.utils.webhook_decoder import (
+    WebhookDecodeError,
+    decode_json,
+    decode_persona_output,
+    decode_post_output,
+    strip_trailing_commas,
+)
+
+
+def test_decode_plain_json():
+    """Test a well-formed body is decoded directly."""
+    assert decode_json('{"post_suggestions": ["a", "b"]}') == {
+        "post_suggestions": ["a", "b"]
+    }
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '```json\n{"post_suggestions": ["a"]}\n```',
+        '```\n{"post_suggestions": ["a"]}\n```\n',
+        'Here are your posts:\n{"post_suggestions": ["a"]}\nEnjoy!',
+        '[Note] generated\n{"post_suggestions": ["a"]}',
+    ],
+)
+def test_decode_json_surrounded_by_text(body):
+    """Test the payload is found behind fences and prose."""
+    assert decode_json(body) == {"post_suggestions": ["a"]}
+
+
+def test_strip_trailing_commas_ignores_strings():
+    """Test commas inside strings are kept."""
+    assert strip_trailing_commas('{"a": [1, 2,], "b": ",]",}') == (
+        '{"a": [1, 2], "b": ",]"}'
+    )
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        ('{"post_suggestions": ["one", "tw', {"post_suggestions": ["one"]}),
+        ('{"post_suggestions": ["one",', {"post_suggestions": ["one"]}),
+        ('{"post_suggestions": ["tw', {"post_suggestions": []}),
+        ('{"summary": "x", "goals":', {"summary": "x"}),
+        ('{"summary": "x", "goa', {"summary": "x"}),
+        ('{"summary": "x", "flag": tru', {"summary": "x"}),
+        ('{"summary": "x", "nested": {"text": "cut', {"summary": "x", "nested": {}}),
+        ('{"text": "ends with escape \\', {}),
+    ],
+)
+def test_decode_truncated_json(body, expected):
+    """Test bodies cut off mid-value are trimmed to their complete members."""
+    assert decode_json(body) == expected
+
+
+def test_decode_without_json():
+    """Test bodies without any JSON raise a decode error."""
+    with pytest.raises(WebhookDecodeError):
+        decode_json("Sorry, I cannot help with that.")
+
+
+def test_decode_post_output_accepts_bare_array():
+    """Test a bare array is read as the list of suggestions."""
+    assert decode_post_output('["a", "b"]').post_suggestions == ["a", "b"]
+
+
+def test_decode_post_output_skips_bracketed_prose():
+    """Test JSON in the prose before the payload does not shadow it."""
+    output = decode_post_output('Note [1]: {"post_suggestions": ["a", "b"]}')
+
+    assert output.post_suggestions == ["a", "b"]
+
+
+def test_decode_post_output_skips_unrelated_objects():
+    """Test an object without any expected field does not shadow the payload."""
+    output = decode_post_output('See {"ref": 1} below: {"post_suggestions": ["real"]}')
+
+    assert output.post_suggestions == ["real"]
+
+
+@pytest.mark.parametrize(
+    "decode", [decode_post_output, decode_persona_output], ids=["post", "persona"]
+)
+def test_decode_rejects_payload_without_expected_fields(decode):
+    """Test an error object is not mistaken for an empty result."""
+    with pytest.raises(WebhookDecodeError, match="none of the fields"):
+        decode('{"error": "Scenario failed"}')
+
+
+def test_decode_post_output_rejects_wrong_types():
+    """Test schema violations raise a decode error."""
+    with pytest.raises(WebhookDecodeError):
+        decode_post_output('{"post_suggestions": [{"text": "a"}]}')
+
+
+def test_decode_persona_output_normalizes_fields():
+    """Test persona fields are coerced to the stored types."""
+    output = decode_persona_output(
+        'Persona:\n```json\n{"goals": "Grow", "target_audience": ["CTOs", "VPs"],'
+        ' "values": null, "persona_summary": "Summary",}\n```'
+    )
+
+    assert output.goals == ["Grow"]
+    assert output.target_audience == "CTOs, VPs"
+    assert output.values == []
+    assert output.tone_of_voice == []
+    assert output.persona_summary == "Summary"
@@ -0,0 +1,204 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.utils.write_behind import WriteBehindQueue
+
+
+def make_post(post_id):
+    return {"id": post_id, "suggestions": ["Post"]}
+
+
+async def wait_until(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+@pytest.mark.asyncio
+async def test_enqueue_refused_until_started():
+    """Test callers write directly while the queue is not running."""
+    queue = WriteBehindQueue(AsyncMock())
+
+    assert queue.enqueue(make_post("p1")) is False
+    assert queue.get("p1") is None
+
+
+@pytest.mark.asyncio
+async def test_flush_when_batch_is_full():
+    """Test a full batch is written without waiting for the interval."""
+    flush = AsyncMock()
+    queue = WriteBehindQueue(flush, batch_size=2, flush_interval=60)
+    await queue.start()
+
+    assert queue.enqueue(make_post("p1"))
+    assert queue.enqueue(make_post("p2"))
+    await wait_until(lambda: queue.written == 2)
+    await queue.stop()
+
+    flush.assert_awaited_once_with([make_post("p1"), make_post("p2")])
+
+
+@pytest.mark.asyncio
+async def test_flush_after_interval():
+    """Test a partial batch is written once the interval elapsed."""
+    flush = AsyncMock()
+    queue = WriteBehindQueue(flush, batch_size=100, flush_interval=0.01)
+    await queue.start()
+
+    queue.enqueue(make_post("p1"))
+    assert queue.get("p1") == make_post("p1")
+    assert queue.queued_at("p1") is not None
+    await wait_until(lambda: queue.written == 1)
+
+    assert queue.get("p1") is None
+    assert queue.queued_at("p1") is None
+    assert queue.stats() == {
+        "pending": 0,
+        "written": 1,
+        "failed": 0,
+        "dead_letters": 0,
+        "batches": 1,
+    }
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_pending_documents():
+    """Test shutdown writes documents that were still queued."""
+    flush = AsyncMock()
+    queue = WriteBehindQueue(flush, batch_size=100, flush_interval=60)
+    await queue.start()
+
+    queue.enqueue(make_post("p1"))
+    queue.enqueue(make_post("p2"))
+    await asyncio.sleep(0)
+    await queue.stop()
+
+    flush.assert_awaited_once_with([make_post("p1"), make_post("p2")])
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_refuses_documents():
+    """Test documents beyond max_pending are handed back to the caller."""
+    queue = WriteBehindQueue(AsyncMock(), flush_interval=60, max_pending=1)
+    await queue.start()
+
+    assert queue.enqueue(make_post("p1"))
+    # The flusher holds p1 while it waits for more documents
+    await asyncio.sleep(0)
+    assert queue.enqueue(make_post("p2"))
+    assert queue.enqueue(make_post("p3")) is False
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_kept_as_dead_letters():
+    """Test a failing batch is retried, then kept readable instead of dropped."""
+    flush = AsyncMock(side_effect=RuntimeError("unavailable"))
+    queue = WriteBehindQueue(flush, flush_interval=0, max_attempts=2, retry_delay=0)
+    await queue.start()
+
+    queue.enqueue(make_post("p1"))
+    await wait_until(lambda: queue.failed == 1)
+
+    assert flush.await_count == 2
+    assert queue.dead_letters == 1
+    assert queue.get("p1") == make_post("p1")
+
+    await queue.stop()
+
+    # The shutdown drain tries once more and the document is still kept
+    assert flush.await_count == 4
+    assert queue.get("p1") == make_post("p1")
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_written_after_next_success():
+    """Test dead letters are written again once a batch succeeds."""
+    flush = AsyncMock(side_effect=[RuntimeError("unavailable"), None, None])
+    queue = WriteBehindQueue(flush, flush_interval=0, max_attempts=1)
+    await queue.start()
+
+    queue.enqueue(make_post("p1"))
+    await wait_until(lambda: queue.dead_letters == 1)
+    queue.enqueue(make_post("p2"))
+    await wait_until(lambda: queue.written == 2)
+    await queue.stop()
+
+    assert flush.await_args_list[-1].args == ([make_post("p1")],)
+    assert queue.stats() == {
+        "pending": 0,
+        "written": 2,
+        "failed": 1,
+        "dead_letters": 0,
+        "batches": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_full_dead_letters_refuse_documents():
+    """Test callers write directly once max_pending dead letters are kept."""
+    flush = AsyncMock(side_effect=RuntimeError("unavailable"))
+    queue = WriteBehindQueue(flush, flush_interval=0, max_pending=1, max_attempts=1)
+    await queue.start()
+
+    queue.enqueue(make_post("p1"))
+    await wait_until(lambda: queue.dead_letters == 1)
+
+    assert queue.enqueue(make_post("p2")) is False
+    await queue.stop()
+
+
+def test_get_post_reads_pending_write(client):
+    """Test a post is readable while its write is still queued."""
+    pending = {
+        "id": "pending-post",
+        "user_id": "test@example.com",
+        "created_at": object(),
+        "platform": "LinkedIn",
+        "content_type": "Post",
+        "tone": "Professional",
+        "suggestions": ["Post 1"],
+    }
+
+    with (
+        patch("app.routes.post.post_writes.get", return_value=pending),
+        patch("app.routes.post.get_post_by_id", new_callable=AsyncMock) as mock_get,
+    ):
+        response = client.get("/post/pending-post")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == "pending-post"
+    assert isinstance(response.json()["created_at"], str)
+    mock_get.assert_not_awaited()
+
+
+def test_get_pending_post_not_modified(client):
+    """Test a queued post keeps its ETag and answers If-None-Match with 304."""
+    pending = {
+        "id": "pending-post",
+        "user_id": "test@example.com",
+        "created_at": object(),
+        "platform": "LinkedIn",
+        "content_type": "Post",
+        "tone": "Professional",
+        "suggestions": ["Post 1"],
+    }
+    queue = WriteBehindQueue(AsyncMock())
+    queue._pending["pending-post"] = pending
+    queue._queued_at["pending-post"] = datetime(2024, 1, 1, 12, 0)
+
+    with patch("app.routes.post.post_writes", queue):
+        first = client.get("/post/pending-post")
+        second = client.get(
+            "/post/pending-post", headers={"If-None-Match": first.headers["ETag"]}
+        )
+
+    assert first.json()["created_at"] == "2024-01-01T12:00:00"
+    assert second.status_code == 304
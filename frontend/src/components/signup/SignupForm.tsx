@@ -1,6 +1,6 @@
 import { useToast } from "@/hooks/use-toast";
 import { useQuestions } from "@/hooks/useQuestions";
-import { submitSignupAnswers } from "@/services/signupService";
+import { prefetchBlogAnalysis, submitSignupAnswers } from "@/services/signupService";
 import { SignupFormData } from "@/types/signup";
 import { AnimatePresence, motion } from "framer-motion";
 import { ArrowLeft, ArrowRight } from "lucide-react";
@@ -59,6 +59,12 @@ const SignupForm = () => {
       return;
     }
 
+    // Start the blog analysis now so it is ready when the persona is created
+    const blogUrl = formData["blog_url"];
+    if (questions[currentStep]?.id === "blog_url" && typeof blogUrl === "string" && blogUrl.trim()) {
+      prefetchBlogAnalysis(blogUrl.trim());
+    }
+
     if (currentStep < questions.length - 1) {
       setCurrentStep((current) => current + 1);
     } else if (currentStep === questions.length - 1) {
@@ -93,3 +93,20 @@ export const submitSignupAnswers = async (data: SignupData): Promise<SignupRespo
     throw error;
   }
 };
+
+/**
+ * Ask the backend to start analysing the blog while the rest of the
+ * questionnaire is answered. Fire-and-forget: failures only mean the
+ * analysis runs when the persona is created.
+ */
+export const prefetchBlogAnalysis = (blogUrl: string): void => {
+  fetch("https://segmint-ujsx.onrender.com/persona/blog-prefetch", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ blog_url: blogUrl }),
+  }).catch((error) => {
+    console.warn("Blog prefetch failed:", error);
+  });
+};